@@ -7,11 +7,15 @@ LABEL com.suse.tcsc.stack="cmd"
 COPY src/* /
 
 # Install requirements.
-RUN pip3 install docker termcolor defusedxml
+RUN pip3 install docker termcolor defusedxml pyyaml pyarrow
+
+# Precompile the tcsc modules, since the container user cannot write the bytecode cache.
+RUN python3 -m compileall -q /*.py
+ENV PYTHONPATH=/
 
 # Install dbus-uuidgen and uuidgen.
 RUN apt-get update 
 RUN apt-get -y install dbus-bin uuid-runtime
 
-ENTRYPOINT [ "./tcsc.py" ]
+ENTRYPOINT [ "python3", "-m", "tcsc" ]
 #CMD [ "/bin/bash", "-c", "./tcsc.py ${ARGS}" ]
\ No newline at end of file
@@ -43,6 +43,13 @@ Changelog:
 06.01.2024      v1.2        - Bug fix: wrong output in environment error messages
                             - Support for environment key `hana_scenario'.
                             - Dependency check between environment keys added.
+19.10.2026      v1.3        - Rabbiteer.execute_checks() accepts the group id of the executions and
+                              Rabbiteer.list_executions() can filter by group id, so executions of an
+                              interrupted caller can be found again.
+19.10.2026      v1.4        - A running Rabbiteer.execute_checks() can be cancelled from another thread by setting
+                              `cancelled`, which raises RabbiteerCancelled with the next poll.
+                            - Rabbiteer.execute_checks() accepts an absolute `deadline` (epoch time), which
+                              limits the timeout of each execution call
 """
 
 import argparse
@@ -58,7 +65,7 @@ import uuid
 from typing import List, Dict, Any
 
 
-__version__ = '1.2'
+__version__ = '1.4'
 __author__ = 'soeren.schmidt@suse.com'
 
 
@@ -69,6 +76,7 @@ class Rabbiteer():
         self.baseurl = baseurl
         self.access_key = access_key
         self.trento_credential = credential
+        self.cancelled = False
 
     def make_request(self, endpoint: str, post_data: dict = None) -> None:
         """Makes a request to the endpoint and expects a JSON response.
@@ -121,10 +129,10 @@ class Rabbiteer():
         if not self.response.ok:
             raise RabbiteerConnectionError(f'Failed with status code: {self.response.status_code}\n{self.response.text}')
 
-    def list_executions(self) -> dict:
-        """Returns executions from Wanda."""
+    def list_executions(self, group_id: str = None) -> dict:
+        """Returns executions from Wanda (only the ones of the group, if `group_id` is given)."""
 
-        self.make_request('/api/checks/executions')
+        self.make_request(f'/api/checks/executions?group_id={group_id}&limit=100' if group_id else '/api/checks/executions')
         self._http_status_err() 
         return self.response.json()
 
@@ -154,15 +162,27 @@ class Rabbiteer():
                        environment: Dict[str, str], 
                        check_ids: List[str], 
                        timeout: int = None,
-                       running_dots: bool = True
+                       running_dots: bool = True,
+                       group_id: str = None,
+                       deadline: float = None
                       ) -> List[Any]:
         """Execute checks on agents and returns the results as list.
         Raises exceptions if anything goes wrong or the result is not as expected. 
         Each check is treated separately and depending on the expectation type one 
         (`expect_same`) or multiple execution calls (`expect` and `expect_enum`)
-        get fired.
+        get fired. The execution calls of a check share a group id, which is random
+        unless `group_id` is given. The `timeout` applies to each execution call, a
+        `deadline` (epoch time) limits it to the time left for all calls.
         """
 
+        def call_timeout() -> float:
+            if not deadline:
+                return timeout
+            left = deadline - time.time()
+            if left <= 0:
+                raise RabbiteerTimeOut('Deadline reached before all executions finished!')
+            return min(timeout, left) if timeout else left
+
         # Get check catalog.
         catalog = self.list_catalog()['items']
 
@@ -189,7 +209,7 @@ class Rabbiteer():
         for check_id in check_ids:
             data = {'env': environment,
                 'execution_id': None,
-                'group_id': str(uuid.uuid4()),
+                'group_id': group_id or str(uuid.uuid4()),
                 'targets': []
                }
             data.update(checks_metadata[check_id])
@@ -200,13 +220,13 @@ class Rabbiteer():
                 for agent_id in agent_ids:
                     data['targets'].append({'agent_id': agent_id, 'checks': [check_id]})
                 data['execution_id'] = str(uuid.uuid4())                    
-                responses.append(self._call_execute(data, timeout=timeout, running_dots=running_dots))
+                responses.append(self._call_execute(data, timeout=call_timeout(), running_dots=running_dots))
             # ... otherwise one call per agent.
             else:
                 for agent_id in agent_ids:
                     data['targets'] = [{'agent_id': agent_id, 'checks': [check_id]}]
                     data['execution_id'] = str(uuid.uuid4())
-                    responses.append(self._call_execute(data, timeout=timeout, running_dots=running_dots))
+                    responses.append(self._call_execute(data, timeout=call_timeout(), running_dots=running_dots))
              
         return responses
 
@@ -235,6 +255,8 @@ class Rabbiteer():
         running = True
         first_dot = False
         while running:
+            if self.cancelled:
+                raise RabbiteerCancelled(f'Execution {execution_id} has been cancelled.')
             self.make_request(endpoint)
 
             # Check if execution might not yet exist.
@@ -300,6 +322,10 @@ class RabbiteerTimeOut(Exception):
     pass
 
 
+class RabbiteerCancelled(Exception):
+    pass
+
+
 class ArgParser(argparse.ArgumentParser):
 
     def format_help(self) -> str:
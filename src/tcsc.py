@@ -14,6 +14,8 @@ Exit Codes:
     4   A problem with Wanda occurred.
     5   A problem with a host container occurred.
     6   Something is wrong with the check.
+    7   A problem with the tcsc daemon occurred.
+    8   A problem with the run history, a checkpoint or the export occurred.
     9   An unknown error occurred.
    10   Feature not yet implemented.
    12   A problem with the command line arguments occurred.
@@ -49,26 +51,125 @@ Changelog:
                             - `checks run` reworked
 07.01.2025      v1.4        - added -p|--plain to disable terminal codes for color and formatting
 13.01.2025      v1.5        - added -w|--wait-on-failure to wait on non-passing checks for user interaction
+19.10.2026      v1.6        - host containers are retrieved only once per invocation with a single sparse
+                              Docker list call (server-side filtered by host group or name if possible)
+                            - manifests are read concurrently as archive instead of executing `cat`
+                            - optional pool of idle, pre-started host containers (`pool_size`)
+                            - optional cache of processed host containers as images per supportconfig
+                              (`image_cache_size`)
+                            - hosts start|stop|remove operate concurrently on all containers of a host
+                              group with one combined wait and report each container
+                            - fixed bug: hosts start returned after the first running container
+                            - added -m|--multi-host to hosts create to run all hosts of a group in one
+                              container to reduce the memory footprint
+                            - the Wanda and the hosts stack are created only if the command needs them
+                              and share one pooled Docker client
+                            - added -t|--timings to print startup and command latencies
+                            - an operational Wanda status is cached for `status_cache_ttl` seconds
+                              unless a Docker event occurred on the Wanda containers, added
+                              -n|--no-status-cache to bypass the cache
+                            - Wanda containers are started concurrently in dependency order with
+                              a dedicated readiness probe each and report their ready times
+                            - introduce `daemon` command: a running daemon executes all commands
+                              in a forked worker with everything imported, tcsc falls back to 
+                              in-process execution otherwise
+                            - added -i|--idle-timeout to `daemon run`, the `tcsc` script can keep a
+                              persistent cmd container running the daemon (TCSC_PERSISTENT)
+                            - modules requiring docker, requests or defusedxml are imported only
+                              if the command needs them
+                            - hosts logs requests only the last N lines from Docker and parses log 
+                              lines with a regular expression, added -f|--follow
+                            - checks whose gatherers need data the supportfiles do not provide
+                              (manifest) are skipped with the reason instead of being executed,
+                              single checks only for the hosts lacking the data
+                            - check results are cached for unchanged checks, hosts and environments
+                              (`result_cache_ttl`), added --no-cache to `checks run`
+                            - gathered facts are stored per host and gatherer (`fact_store_ttl`) and
+                              checks are evaluated locally if all their facts are stored
+                            - introduce `checks evaluate` to evaluate checks locally with facts gathered
+                              directly from the supportfiles for the gatherers tcsc implements itself
+                            - the check catalog is read from the YAML files of the checks volume (cached
+                              by file hash), so `checks list|show|evaluate` work with Wanda stopped
+                            - introduce `fleet run` to create, check and remove host groups for all
+                              supportconfigs of a directory (grouped by cluster) concurrently
+                              (`fleet_parallel`) and write a consolidated JSON report
+                            - added -r|--run-checks to hosts create to create the hosts while the
+                              supportfiles are still parsed and run the checks as soon as the hosts
+                              (single-host checks) or all hosts (multi-host checks) are ready
+                            - results of `checks run` and `fleet run` are recorded in a SQLite database
+                              (`history_ttl`), introduce `results query|diff` to query and compare runs
+                            - added -x|--export to `checks run` and `fleet run` and introduce `results export`
+                              to append results with a flat schema to a Parquet, Arrow IPC or CSV dataset
+                              (`export_format`)
+                            - `checks run` journals each check to a checkpoint (`checkpoint_ttl`), added
+                              --resume to continue an interrupted run, taking over executions in flight
+                            - Wanda executions taking `hedge_margin` seconds longer than the 95th percentile
+                              of the run history get hedged with a duplicate, the first one finishing wins
+                            - the timeout of a Wanda execution is derived from the run history per check
+                              and gatherer (`check_timeout_factor`, `check_timeout_max`), added --deadline
+                              to `checks run` and `fleet run` to limit the run and schedule long-running
+                              checks first
 """
 
+from __future__ import annotations   # type hints must not require the deferred modules
+
+import time
+_start_time = time.perf_counter()   # to measure the imports for --timings
+
+import sys
+import tcsc_daemon
+if __name__ == '__main__':   # a running daemon executes the command without importing everything else
+    _exit_code = tcsc_daemon.forward(sys.argv[1:])
+    if _exit_code is not None:
+        sys.exit(_exit_code)
+
 import argparse
+import atexit
 import collections
+import concurrent.futures
+import datetime
+import importlib
 import os
-import docker
-import sys
-from collections import Counter
-from rabbiteer import Rabbiteer
 from typing import List, Dict, Tuple
 import signal
 import textwrap
+import threading
+import uuid
 from tcsc_config import *
 from tcsc_cli import *
-from tcsc_wanda import *
-from tcsc_hosts import *
-from tcsc_supportfiles import *
+from tcsc_daemon import DaemonException
+from tcsc_results import ResultCache, FactStore, RunCheckpoint, CheckpointException
+_import_time = time.perf_counter() - _start_time
+
+# The modules talking to Docker and Wanda pull in docker, requests and defusedxml.
+# They get imported by `import_modules()` only when a command needs them.
 
 
-__version__ = '1.5'
+def import_modules(*modules: str) -> None:
+    """Imports the given modules like `from MODULE import *` into the global namespace."""
+    
+    for name in modules:
+        with Timings.measure(f'import {name}'):
+            module = importlib.import_module(name)
+        public = getattr(module, '__all__', [attribute for attribute in vars(module) if not attribute.startswith('_')])
+        globals().update({attribute: getattr(module, attribute) for attribute in public})
+
+
+def loaded(module: str, name: str) -> type:
+    """Returns the exception `name` of `module`, if the module has been imported already,
+    otherwise an exception class never raised. Used to catch exceptions of deferred modules."""
+    
+    try:
+        return getattr(sys.modules[module], name)
+    except KeyError:
+        return NotImportedException
+
+
+class NotImportedException(Exception):
+    pass
+
+
+__version__ = '1.6'
 __author__ = 'Sören Schmidt'
 __email__ = 'soren.schmidt@suse.com'
 __maintainer__ = __author__
@@ -84,18 +185,26 @@ class ArgParser(argparse.ArgumentParser):
         prog = os.path.basename(sys.argv[0])
         text = f'''
                 Usage:  {prog} -h|--help
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] wanda start|status|stop
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] hosts create GROUPNAME [-e|--env KEY=VALUE...] SUPPORTFILE ...
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] hosts start GROUPNAME
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] hosts rescan GROUPNAME
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] hosts stop GROUPNAME
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] hosts status [-d|--details] GROUPNAME]
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] hosts remove GROUPNAME
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] hosts logs [-l|--lines N] CONTAINERNAME
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] checks list [-d|--details] [-a|--all]
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] checks show CHECK
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] checks run [-e|--env KEY=VALUE...] [-s|--show-skipped] [-f|--failure-only] [-w|--wait-on-failure] -g|--group GROUP... GROUPNAME
-                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] checks run [-e|--env KEY=VALUE...] [-s|--show-skipped] [-f|--failure-only] [-w|--wait-on-failure] -c|--check CHECK... GROUPNAME
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] wanda start|status|stop
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] hosts create GROUPNAME [-e|--env KEY=VALUE...] [-m|--multi-host|-r|--run-checks [-f|--failure-only]] SUPPORTFILE ...
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] hosts start GROUPNAME
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] hosts rescan GROUPNAME
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] hosts stop GROUPNAME
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] hosts status [-d|--details] GROUPNAME]
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] hosts remove GROUPNAME
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] hosts logs [-l|--lines N] [-f|--follow] CONTAINERNAME
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] checks list [-d|--details] [-a|--all]
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] checks show CHECK
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] checks run [-e|--env KEY=VALUE...] [-s|--show-skipped] [-f|--failure-only] [-w|--wait-on-failure] [--no-cache] [-x|--export DIRECTORY] [--deadline SECONDS] -g|--group GROUP... GROUPNAME
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] checks run [-e|--env KEY=VALUE...] [-s|--show-skipped] [-f|--failure-only] [-w|--wait-on-failure] [--no-cache] [-x|--export DIRECTORY] [--deadline SECONDS] -c|--check CHECK... GROUPNAME
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] checks run [-s|--show-skipped] [-f|--failure-only] [-w|--wait-on-failure] [--no-cache] [-x|--export DIRECTORY] [--deadline SECONDS] --resume CHECKPOINT GROUPNAME
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] checks evaluate [-e|--env KEY=VALUE...] [-s|--show-skipped] [-f|--failure-only] [-g|--group GROUP...|-c|--check CHECK...] SUPPORTFILE ...
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] fleet run [-e|--env KEY=VALUE...] [-f|--failure-only] [-k|--keep] [--no-cache] [-x|--export DIRECTORY] [-P|--parallel N] [--deadline SECONDS] [-o|--output REPORT] [-g|--group GROUP...|-c|--check CHECK...] DIRECTORY
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] results query [-c|--check CHECK] [-r|--result RESULT] [--run RUN_ID] [--since DATE] [--until DATE] [-l|--limit N] [--runs] [GROUPNAME]
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] results diff RUN_ID [OTHER_RUN_ID]
+                        {prog} [-j|--json] [-p|--plain] [-t|--timings] [-n|--no-status-cache] [-c|--config CONFIG] results export [--since DATE] [--until DATE] DIRECTORY [GROUPNAME]
+                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] daemon run [-i|--idle-timeout SECONDS]
+                        {prog} [-j|--json] [-p|--plain] [-c|--config CONFIG] daemon status|stop
 
                 v{__version__}
             
@@ -106,6 +215,8 @@ class ArgParser(argparse.ArgumentParser):
                     -h, --help              print this help text
                     -j, --json              output in JSON
                     -p, --plain             no terminal sequences for color and formatting
+                    -t, --timings           prints the startup and command latencies to stderr
+                    -n, --no-status-cache   always queries the Wanda status instead of using the cache
                     -c, --config CONFIG     alternative config file (default: ~/.config/tcsc/config) 
 
                 Arguments: 
@@ -113,6 +224,9 @@ class ArgParser(argparse.ArgumentParser):
                     wanda           manages the Wanda containers
                     hosts           manages the supportconfig host containers
                     checks          manages Trento checks
+                    fleet           runs checks for a directory of supportconfigs
+                    results         queries the recorded check runs
+                    daemon          manages the tcsc daemon
 
                 Command Options and Arguments:
 
@@ -144,7 +258,15 @@ class ArgParser(argparse.ArgumentParser):
                                             ensa_version, mixed_versions, filesystem_type,
                                             hana_scenario
                         -d, --details       prints more details about the container
+                        -m, --multi-host    runs all hosts of the group in one container
+                        -r, --run-checks    runs the checks while the hosts get created: each 
+                                            host starts as soon as its supportfile is parsed
+                                            and runs the single-host checks without environment
+                                            requirements once ready, all other checks run when
+                                            all hosts are up
+                        -f, --failure-only  print only checks which did not pass (with -r)
                         -l, --lines N       limits log output to the last N lines
+                        -f, --follow        prints new log lines as they come in
                         
                     checks:
                     
@@ -153,8 +275,11 @@ class ArgParser(argparse.ArgumentParser):
                         list        lists all available checks
                         show        shows check
                         run         execute supported checks
+                        evaluate    evaluate checks locally with the facts gathered from the
+                                    supportfiles (no host containers, agents or executions)
                         
                         GROUPNAME                arbitrary name for the hostgroup
+                        SUPPORTFILE              a supportfile (e.g. supportconfig)
                         -d, --details            prints more details about the check
                         -a, --all                shows all checks 
                         -s, --show-skipped       shows also skipped checks
@@ -164,11 +289,86 @@ class ArgParser(argparse.ArgumentParser):
                                                  hana_scenario
                         -f, --failure-only       print only checks which did not pass
                         -w, --wait-on-failure    wait on check failure for user interaction
+                        --no-cache               execute all checks instead of using cached results
+                                                 or stored facts
+                        -x, --export DIRECTORY   appends the results to the dataset in DIRECTORY
+                                                 (see `export_format`)
+                        --deadline SECONDS       no check executions after SECONDS (checks fail),
+                                                 the long-running checks of a group come first
                         -g, --group GROUP        run only checks from that Trento check group
                         -c, --check CHECK        run only this check
+                        --resume CHECKPOINT      resumes an interrupted run (or retries its failed
+                                                 checks) with the environment and checks of the run:
+                                                 completed checks are taken from the checkpoint and
+                                                 executions still in flight are taken over from Wanda
 
                         Providers can be one of: default, kvm, vmware, azure, aws, gcp
                         
+                    fleet:
+                    
+                        Runs the checks for all supportconfigs (tarballs and directories) found
+                        below a directory. Supportconfigs of the nodes of a cluster (same cluster
+                        name and nodes in the CIB) form a host group, every other supportconfig
+                        a host group of its own. Each host group gets created, checked and removed.
+                        Several host groups are processed concurrently while the remaining
+                        supportconfigs are still being parsed.
+
+                        run         runs the checks and writes a JSON report
+
+                        DIRECTORY                directory with the supportconfigs
+                        -e, --env KEY=VALUE      environment entry key-value pair (see checks)
+                        -f, --failure-only       report only checks which did not pass
+                        -k, --keep               keep the host groups instead of removing them
+                        --no-cache               execute all checks instead of using cached results
+                                                 or stored facts
+                        -x, --export DIRECTORY   appends the results to the dataset in DIRECTORY
+                                                 (see checks)
+                        -P, --parallel N         host groups processed concurrently 
+                                                 (default: `fleet_parallel` from the config)
+                        --deadline SECONDS       no host groups and check executions after SECONDS
+                                                 (see checks)
+                        -o, --output REPORT      file for the JSON report (default: fleet-report.json)
+                        -g, --group GROUP        run only checks from that Trento check group
+                        -c, --check CHECK        run only this check
+
+                    results:
+
+                        Queries the results of `checks run` and `fleet run`, which are recorded
+                        in ~/.local/state/tcsc/history.db (see `history_ttl`).
+
+                        query       lists the recorded results (newest run first)
+                        diff        lists the checks whose results differ between two runs
+                        export      appends the recorded runs to the dataset in DIRECTORY
+
+                        GROUPNAME                only results of this host group
+                        RUN_ID                   id of a recorded run
+                        DIRECTORY                dataset directory: one Parquet or Arrow IPC file
+                                                 per run or a `results.csv` the rows get appended
+                                                 to (see `export_format`)
+                        OTHER_RUN_ID             run to compare with (default: the previous run
+                                                 of the host group is compared with RUN_ID)
+                        -c, --check CHECK        only results of this check
+                        -r, --result RESULT      only results of this type (passing, warning,
+                                                 critical, error)
+                        --run RUN_ID             only results of this run
+                        --since DATE             only runs started at or after DATE (ISO 8601)
+                        --until DATE             only runs started before DATE (ISO 8601)
+                        -l, --limit N            at most N entries (default: 100)
+                        --runs                   lists the runs with a summary instead of the results
+
+                    daemon:
+
+                        Manages the tcsc daemon. If it is running, tcsc forwards all commands 
+                        to it over a Unix socket (default: ~/.local/state/tcsc/tcsc.sock, can
+                        be changed with TCSC_SOCKET) to save the startup time.
+
+                        start       starts the daemon in a detached container (`tcsc` script only)
+                        run         runs the daemon in the foreground
+                        status      prints the status of the daemon
+                        stop        stops the daemon
+                        
+                        -i, --idle-timeout SECONDS  terminates after SECONDS without any command
+                        
                 Exit codes:
 
                      0   Everything went fine.
@@ -178,6 +378,8 @@ class ArgParser(argparse.ArgumentParser):
                      4   A problem with Wanda occurred.
                      5   A problem with a host container occurred.
                      6   Something is wrong with the check.
+                     7   A problem with the tcsc daemon occurred.
+                     8   A problem with the run history, a checkpoint or the export occurred.
                      9   An unknown error occurred.
                     10   Feature not yet implemented.
                     12   A problem with the command line arguments occurred.
@@ -188,6 +390,10 @@ class ArgParser(argparse.ArgumentParser):
                     Start two fresh hosts:                        {prog} hosts start ACME scc_vmhana01_231011_1528.txz scc_vmhana02_231011_1533.txz
                     List all available checks (JSON dump):        {prog} -j checks list
                     Execute all checks and for (aws) hosts:       {prog} checks run -p aws ACME
+                    Check all supportconfigs of a directory:      {prog} fleet run -o report.json /data/supportconfigs
+                    Resume an interrupted check run:              {prog} checks run --resume 3f9a1c2e ACME
+                    Changes of run 42 since the previous run:     {prog} results diff 42
+                    Export the results of this year:              {prog} results export --since 2025-01-01 /data/results
 
                 '''
         return textwrap.dedent(text)
@@ -222,6 +428,18 @@ def argument_parse() -> dict:
                         required=False,
                         help='output is done without formatting and color codes')
     
+    parser.add_argument('-t', '--timings',
+                        dest='timings',
+                        action='store_true',
+                        required=False,
+                        help='prints the duration of startup and command phases')
+    
+    parser.add_argument('-n', '--no-status-cache',
+                        dest='no_status_cache',
+                        action='store_true',
+                        required=False,
+                        help='always query the Wanda status instead of using the cached one')
+    
     parser.add_argument('-c', '--config',
                         dest='config_file',
                         action='store',
@@ -229,7 +447,7 @@ def argument_parse() -> dict:
                         default='${HOME}/.config/tcsc/config',
                         help='path to the config file')  
      
-    selectors = parser.add_subparsers(dest='selectors', metavar='wanda|hosts|checks')
+    selectors = parser.add_subparsers(dest='selectors', metavar='wanda|hosts|checks|fleet|results|daemon')
     selectors.required = True
     
     # Selector: wanda
@@ -275,6 +493,24 @@ def argument_parse() -> dict:
                               default=[],
                               help='environment entry key-value pair')
  
+    create_exclusive = hosts_create.add_mutually_exclusive_group()
+    create_exclusive.add_argument('-m', '--multi-host',
+                                  dest='multi_host',
+                                  action='store_true',
+                                  required=False,
+                                  help='runs all hosts in one container')
+    create_exclusive.add_argument('-r', '--run-checks',
+                                  dest='run_checks',
+                                  action='store_true',
+                                  required=False,
+                                  help='runs the checks while the hosts get created')
+    
+    hosts_create.add_argument('-f', '--failure-only',
+                              dest='failure_only',
+                              action='store_true',
+                              required=False,
+                              help='returns only results that have not passed')
+ 
     hosts_status.add_argument('-d', '--details',
                               dest='host_details',
                               action='store_true',
@@ -290,10 +526,32 @@ def argument_parse() -> dict:
                               type=int,
                               required=False,
                               help='show only the last N lines')  
+    hosts_logs.add_argument('-f', '--follow',
+                            dest='follow',
+                            action='store_true',
+                            required=False,
+                            help='print new log lines as they come in')
         
+    # Selector: daemon
+    daemon = selectors.add_parser('daemon', help='Manages the tcsc daemon.')
+    daemon_commands = daemon.add_subparsers(dest='daemon_commands', metavar='run|status|stop')
+    daemon_commands.required = True
+    
+    daemon_run = daemon_commands.add_parser('run', help='Runs the daemon in the foreground.')
+    daemon_status = daemon_commands.add_parser('status', help='Prints status of the daemon.')
+    daemon_stop = daemon_commands.add_parser('stop', help='Stops the daemon.')
+    
+    daemon_run.add_argument('-i', '--idle-timeout',
+                            metavar='SECONDS',
+                            dest='idle_timeout',
+                            type=int,
+                            default=0,
+                            required=False,
+                            help='terminate after SECONDS without any command')
+    
     # Selector: checks
     checks = selectors.add_parser('checks',  help='Manages checks.')
-    checks_commands = checks.add_subparsers(dest='checks_commands', metavar='list|show|run')
+    checks_commands = checks.add_subparsers(dest='checks_commands', metavar='list|show|run|evaluate')
     checks_commands.required = True
     
     checks_list = checks_commands.add_parser('list', help='Lists available checks.')
@@ -341,6 +599,23 @@ def argument_parse() -> dict:
                             required=False,
                             help='wait on check failure for user interaction')
     
+    checks_run.add_argument('--no-cache',
+                            dest='no_cache',
+                            action='store_true',
+                            required=False,
+                            help='execute all checks instead of using cached results or stored facts')
+    checks_run.add_argument('-x', '--export',
+                            metavar='DIRECTORY',
+                            dest='export',
+                            required=False,
+                            help='appends the results to the dataset in DIRECTORY')
+    checks_run.add_argument('--deadline',
+                            metavar='SECONDS',
+                            dest='deadline',
+                            type=int,
+                            required=False,
+                            help='no check executions after SECONDS, long-running checks first')
+    
     run_exclusive = checks_run.add_mutually_exclusive_group()
     run_exclusive.add_argument('-g', '--group',
                                metavar='GROUP',
@@ -356,8 +631,202 @@ def argument_parse() -> dict:
                                required=False,
                                dest='requested_checks',
                                help='use only the check with this ID')
+    run_exclusive.add_argument('--resume',
+                               metavar='CHECKPOINT',
+                               dest='resume',
+                               required=False,
+                               help='resumes the interrupted run with this checkpoint')
+    
+    checks_evaluate = checks_commands.add_parser('evaluate', help='Evaluates Trento checks locally.')
+    
+    checks_evaluate.add_argument(metavar='SUPPORTFILE',
+                                 dest='supportfiles',
+                                 nargs='+',
+                                 help='supportfiles (e.g. supportconfig) to gather the facts from')
+    checks_evaluate.add_argument('-e', '--env',
+                                 action='append',
+                                 dest='envpairs',
+                                 default=[],
+                                 help='environment entry key-value pair')
+    checks_evaluate.add_argument('-f', '--failure-only',
+                                 dest='failure_only',
+                                 action='store_true',
+                                 required=False,
+                                 help='returns only results that have not passed')
+    checks_evaluate.add_argument('-s', '--show-skipped',
+                                 dest='show_skipped',
+                                 action='store_true',
+                                 required=False,
+                                 help='shows skipped checks too')
+    
+    evaluate_exclusive = checks_evaluate.add_mutually_exclusive_group()
+    evaluate_exclusive.add_argument('-g', '--group',
+                                    metavar='GROUP',
+                                    dest='check_groups',
+                                    action='append',
+                                    type=str,
+                                    required=False,
+                                    help='use only checks of that group')
+    evaluate_exclusive.add_argument('-c', '--check',
+                                    metavar='CHECK',
+                                    action='append',
+                                    type=str,
+                                    required=False,
+                                    dest='requested_checks',
+                                    help='use only the check with this ID')
     
-    try:  
+    # Selector: fleet
+    fleet = selectors.add_parser('fleet', help='Runs checks for a directory of supportconfigs.')
+    fleet_commands = fleet.add_subparsers(dest='fleet_commands', metavar='run')
+    fleet_commands.required = True
+    
+    fleet_run = fleet_commands.add_parser('run', help='Creates, checks and removes the host groups.')
+    
+    fleet_run.add_argument(metavar='DIRECTORY',
+                           dest='directory',
+                           help='directory with the supportconfigs')
+    fleet_run.add_argument('-e', '--env',
+                           action='append',
+                           dest='envpairs',
+                           default=[],
+                           help='environment entry key-value pair')
+    fleet_run.add_argument('-f', '--failure-only',
+                           dest='failure_only',
+                           action='store_true',
+                           required=False,
+                           help='reports only results that have not passed')
+    fleet_run.add_argument('-k', '--keep',
+                           dest='keep',
+                           action='store_true',
+                           required=False,
+                           help='keeps the host groups')
+    fleet_run.add_argument('--no-cache',
+                           dest='no_cache',
+                           action='store_true',
+                           required=False,
+                           help='execute all checks instead of using cached results or stored facts')
+    fleet_run.add_argument('-x', '--export',
+                           metavar='DIRECTORY',
+                           dest='export',
+                           required=False,
+                           help='appends the results to the dataset in DIRECTORY')
+    fleet_run.add_argument('-P', '--parallel',
+                           metavar='N',
+                           dest='parallel',
+                           type=int,
+                           required=False,
+                           help='host groups processed concurrently')
+    fleet_run.add_argument('--deadline',
+                           metavar='SECONDS',
+                           dest='deadline',
+                           type=int,
+                           required=False,
+                           help='no host groups and check executions after SECONDS, long-running checks first')
+    fleet_run.add_argument('-o', '--output',
+                           metavar='REPORT',
+                           dest='report_file',
+                           default='fleet-report.json',
+                           required=False,
+                           help='file for the JSON report')
+    
+    fleet_exclusive = fleet_run.add_mutually_exclusive_group()
+    fleet_exclusive.add_argument('-g', '--group',
+                                 metavar='GROUP',
+                                 dest='check_groups',
+                                 action='append',
+                                 type=str,
+                                 required=False,
+                                 help='use only checks of that group')
+    fleet_exclusive.add_argument('-c', '--check',
+                                 metavar='CHECK',
+                                 action='append',
+                                 type=str,
+                                 required=False,
+                                 dest='requested_checks',
+                                 help='use only the check with this ID')
+    
+    # Selector: results
+    results = selectors.add_parser('results', help='Queries the recorded check runs.')
+    results_commands = results.add_subparsers(dest='results_commands', metavar='query|diff|export')
+    results_commands.required = True
+
+    results_query = results_commands.add_parser('query', help='Lists the recorded results or runs.')
+    results_diff = results_commands.add_parser('diff', help='Lists the differences between two runs.')
+    results_export = results_commands.add_parser('export', help='Exports the recorded results.')
+
+    results_query.add_argument(metavar='GROUPNAME',
+                               nargs='?',
+                               dest='hostgroup',
+                               help='name of the host group')
+    results_query.add_argument('-c', '--check',
+                               metavar='CHECK',
+                               dest='check',
+                               required=False,
+                               help='only results of this check')
+    results_query.add_argument('-r', '--result',
+                               metavar='RESULT',
+                               dest='result',
+                               choices=['passing', 'warning', 'critical', 'error'],
+                               required=False,
+                               help='only results of this type')
+    results_query.add_argument('--run',
+                               metavar='RUN_ID',
+                               dest='run_id',
+                               type=int,
+                               required=False,
+                               help='only results of this run')
+    results_query.add_argument('--since',
+                               metavar='DATE',
+                               dest='since',
+                               required=False,
+                               help='only runs started at or after DATE (ISO 8601)')
+    results_query.add_argument('--until',
+                               metavar='DATE',
+                               dest='until',
+                               required=False,
+                               help='only runs started before DATE (ISO 8601)')
+    results_query.add_argument('-l', '--limit',
+                               metavar='N',
+                               dest='limit',
+                               type=int,
+                               default=100,
+                               required=False,
+                               help='at most N entries')
+    results_query.add_argument('--runs',
+                               dest='runs',
+                               action='store_true',
+                               required=False,
+                               help='lists the runs instead of the results')
+
+    results_diff.add_argument(metavar='RUN_ID',
+                              dest='run_id',
+                              type=int,
+                              help='run to compare')
+    results_diff.add_argument(metavar='OTHER_RUN_ID',
+                              nargs='?',
+                              dest='other_run_id',
+                              type=int,
+                              help='run to compare with')
+
+    results_export.add_argument(metavar='DIRECTORY',
+                                dest='directory',
+                                help='dataset directory')
+    results_export.add_argument(metavar='GROUPNAME',
+                                nargs='?',
+                                dest='hostgroup',
+                                help='name of the host group')
+    results_export.add_argument('--since',
+                                metavar='DATE',
+                                dest='since',
+                                required=False,
+                                help='only runs started at or after DATE (ISO 8601)')
+    results_export.add_argument('--until',
+                                metavar='DATE',
+                                dest='until',
+                                required=False,
+                                help='only runs started before DATE (ISO 8601)')
+
+    try:
         args_parsed = parser.parse_args()
     except SystemExit:
         sys.exit(12)
@@ -386,6 +855,27 @@ def argument_parse() -> dict:
             entries[key] = value
         args_parsed.envpairs = entries
     
+    # Convert dates into timestamps.
+    for attribute in 'since', 'until':
+        if getattr(args_parsed, attribute, None):
+            try:
+                setattr(args_parsed, attribute, datetime.datetime.fromisoformat(getattr(args_parsed, attribute)).timestamp())
+            except ValueError:
+                print(f'Invalid date "{getattr(args_parsed, attribute)}" (use e.g. 2025-01-31 or 2025-01-31T12:00).', file=sys.stderr)
+                sys.exit(1)
+
+    if getattr(args_parsed, 'parallel', None) is not None and args_parsed.parallel < 1:
+        print('The amount of parallel host groups must be greater 0.', file=sys.stderr)
+        sys.exit(1)
+
+    if getattr(args_parsed, 'deadline', None) is not None and args_parsed.deadline < 1:
+        print('The deadline must be greater 0.', file=sys.stderr)
+        sys.exit(1)
+
+    if getattr(args_parsed, 'host_commands', None) == 'create' and args_parsed.failure_only and not args_parsed.run_checks:
+        print('Option "-f|--failure-only" requires "-r|--run-checks".', file=sys.stderr)
+        sys.exit(1)
+    
     try:
         if args_parsed.last_lines < 0:
             print('The amount of lines must be greater 0.', file=sys.stderr)
@@ -408,7 +898,9 @@ def wanda_start(wanda: WandaStack) -> bool:
     else:
         if started:
             CLI.print_info(f'''Started containers: {', '.join(started)}''')
-        CLI.print_json({'success': True, 'started_containers': started})
+            for name, ready_time in sorted(wanda.ready_times.items(), key=lambda item: item[1]):
+                CLI.print_info(f'{name} ready after {ready_time:.1f}s')
+        CLI.print_json({'success': True, 'started_containers': started, 'ready_times': wanda.ready_times})
         CLI.print_ok('Wanda completely started.')
     return True
  
@@ -463,14 +955,66 @@ def wanda_status(wanda: WandaStack) -> bool:
     return True if wanda.status and volumes_ok else False
     
     
-def hosts_create(hosts: HostsStack, hostgroup: str, envpairs: Dict[str,str], supportfiles: List[str]) -> bool:
-    """Creates and starts a host container with the given supportfiles as member of the given host group."""
+def daemon_run(idle_timeout: int, config_file: str) -> bool:
+    """Runs the daemon until it gets stopped or idles for `idle_timeout` seconds
+    and returns the success."""
+    
+    # The forked workers inherit the modules, so the commands do not import them again.
+    import_modules('tcsc_docker', 'tcsc_wanda', 'tcsc_hosts', 'tcsc_supportfiles', 'tcsc_gatherers', 'tcsc_fleet', 'tcsc_history', 'tcsc_export')
+    
+    # They also inherit the Docker client, the Wanda stack and the parsed check catalog,
+    # if the command uses the same configuration (see `Backends.for_config()`). Without 
+    # the Wanda containers the workers create the backends themselves.
+    try:
+        Backends.prebuilt = Backends(Config(config_file))
+        Backends.prebuilt.wanda.catalog()
+    except Exception:
+        Backends.prebuilt = None
+    release_connections()
+    CLI.print_info(f'Daemon listening on {tcsc_daemon.socket_path()}.')
+    try:
+        tcsc_daemon.serve(daemon_main, idle_timeout)
+    except (DaemonException, OSError) as err:
+        CLI.print_json({'success': False, 'error': str(err)})
+        CLI.print_fail(err)
+        return False
+    return True
+
+
+def daemon_status() -> bool:
+    """Prints the status of the daemon and returns if it is running."""
+    
+    status = tcsc_daemon.status()
+    if status:
+        CLI.print_ok(f"Daemon (pid {status['pid']}) is running for {status['uptime']}s and listening on {status['socket']}.")
+    else:
+        CLI.print_fail('Daemon is not running.')
+    CLI.print_json({'running': bool(status), 'daemon': status})
+    return bool(status)
+
+
+def daemon_stop() -> bool:
+    """Stops the daemon and returns the success."""
+    
+    if tcsc_daemon.stop():
+        CLI.print_ok('Daemon stopped.')
+        CLI.print_json({'success': True})
+        return True
+    CLI.print_fail('Daemon is not running.')
+    CLI.print_json({'success': False, 'error': 'Daemon is not running.'})
+    return False
+
+
+def hosts_create(hosts: HostsStack, hostgroup: str, envpairs: Dict[str,str], supportfiles: List[str], multi_host: bool = False) -> bool:
+    """Creates and starts a host container with the given supportfiles as member of the given host group.
+    With `multi_host` one container gets created for all hosts."""
 
     if hostgroup in hosts.hostgroups:
         CLI.print_fail(f'Host group "{hostgroup}" already exists!')
         CLI.print_json({'success': False})
         return False
     else:
+        import_modules('tcsc_supportfiles')
         sf = SupportFiles(supportfiles)
         if sf.issues:
             for issue in sf.issues:
@@ -479,6 +1023,12 @@ def hosts_create(hosts: HostsStack, hostgroup: str, envpairs: Dict[str,str], sup
             return False
 
         json_obj = {'success': True, 'started': [], 'failed': []}
+        if multi_host:
+            hostname = hosts.create_multi(hostgroup, sf.result, envpairs)
+            CLI.print_ok(f'''Host container "{hostname}" for {', '.join(sf.result)} started!''')
+            json_obj['started'].append(hostname)
+            CLI.print_json(json_obj)
+            return True
         for host in sf.result:
             hostname = hosts.create(hostgroup, host, sf.result[host], envpairs)   # ADD ENV RO OVERWRITE
             if hostname:
@@ -489,28 +1039,181 @@ def hosts_create(hosts: HostsStack, hostgroup: str, envpairs: Dict[str,str], sup
                 json_obj['failed'].append(hostname)
         if json_obj['failed']:
             json_obj['success'] = False
+        json_obj['cached'] = hosts.cache_hostgroup(hostgroup)
+        if json_obj['cached']:
+            CLI.print_info(f'''Processed supportfiles cached for: {', '.join(json_obj['cached'])}''')
         CLI.print_json(json_obj)
+        hosts_pool_maintain(hosts)
         
     return True
 
 
+def hosts_create_run_checks(wanda: WandaStack,
+                            hosts: HostsStack,
+                            results_cache: ResultCache,
+                            fact_store: FactStore,
+                            hostgroup: str,
+                            envpairs: Dict[str, str],
+                            supportfiles: List[str],
+                            failure_only: bool) -> bool:
+    """Creates the host group like `hosts_create()` and runs the checks like `checks_run()`,
+    but pipelined: the supportfiles get parsed in worker processes and each host container 
+    is created as soon as its supportfile is parsed. Single-host checks without environment
+    requirements (metadata, `when` or value conditions referring to `env`) run on a host as 
+    soon as it has processed its supportfiles. Multi-host checks
+    and checks depending on the environment of the host group wait for all hosts.
+    
+    As the hosts are created one by one, the ENSA version (only detectable on the node running
+    the ERS instance) is not aligned in the host labels. The environment of the host group
+    gets it nevertheless from that node."""
+
+    if hostgroup in hosts.hostgroups:
+        CLI.print_fail(f'Host group "{hostgroup}" already exists!')
+        CLI.print_json({'success': False})
+        return False
+
+    checks2run = checks_select(wanda, None, None, 
+                               ['id', 'description', 'group', 'metadata.provider', 'metadata.cluster_type',
+                                'metadata.architecture_type', 'metadata.ensa_version', 'metadata.filesystem_type',
+                                'metadata.hana_scenario', 'expectations[].type', 'facts[].gatherer', 'remediation'])
+    checks = [check for checks in checks2run.values() for check in checks]
+    early_checks = [check for check in checks if check.check_type != 'multi' and 
+                    not any((check.provider, check.cluster_type, check.architecture_type, check.ensa_version, check.filesystem_type, check.hana_scenario)) and
+                    not check.refers_to_environment()]
+    gated_checks = [check for check in checks if check not in early_checks]
+
+    # The hosts run checks concurrently, so everything iterating over the cache entries is done before.
+    results_cache.prune({check.id: check.digest for check in checks})
+    fact_store.load()
+
+    json_obj = {'success': True, 'started': [], 'failed': [], 'checks': collections.defaultdict(list)}
+    lock = threading.Lock()   # serializes the output of the hosts
+
+    def report(check: Check, check_results: str, err: bool, agent2host: Dict[str, str]) -> None:
+        results, _ = checks_results(check, str(check_results) if err else check_results, err, agent2host, hostgroup, failure_only)
+        if results:
+            with lock:
+                CLI.print_status(results)
+                json_obj['checks'][check.group].append(results)
+
+    def provision(hostname: str, host: Dict[str, Any]) -> None:
+        try:
+            name = hosts.create(hostgroup, hostname, host, envpairs)
+            target = hosts.filter_containers({'hostgroup': hostgroup, 'name': name})[0]
+            if not hosts.wait4manifest(target):
+                raise HostsException(f'Host container "{name}" did not finish processing the supportfiles.')
+        except (docker.errors.DockerException, HostsException, IndexError) as err:
+            with lock:
+                CLI.print_fail(f'Could not start host container for host "{hostname}": {err}')
+                json_obj['failed'].append(hostname)
+            return
+        with lock:
+            CLI.print_ok(f'Host container "{name}" started!')
+            json_obj['started'].append(name)
+
+        host_env = {env: envpairs.get(env, host[env]) for env in ('provider', 'cluster_type', 'architecture_type', 'ensa_version', 'filesystem_type', 'hana_scenario')
+                    if envpairs.get(env, host[env])}
+        target['manifest'] = hosts.get_manifest(target['container'], target['root'])[1]
+        unsatisfiable, _ = checks_preflight(early_checks, [target])
+        for check in early_checks:
+            if check.id not in unsatisfiable:
+                report(check, *checks_execute(wanda, check, host_env, [target], results_cache, fact_store)[:2], {target['agent_id']: hostname})
+
+    # Create each host as soon as its supportfile has been parsed.
+    provider = None
+    with concurrent.futures.ProcessPoolExecutor() as parsers, \
+         concurrent.futures.ThreadPoolExecutor(max_workers=HostsStack.parallel_operations) as provisioners:
+        futures = {parsers.submit(SupportFiles.identify, supportfile, len(supportfiles) > 1): supportfile for supportfile in supportfiles}
+        parsed, provisionings = [], []
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                hostname, host = future.result()
+                if hostname in parsed:
+                    raise SupportFileException(f'{hostname} already present. Is "{futures[future]}" used twice?')
+                if provider and host['provider'] != provider:
+                    raise SupportFileException(f'''Mixing providers is not allowed. Previous supportconfigs have "{provider}", but "{futures[future]}" has "{host['provider']}".''')
+            except SupportFileException as err:
+                with lock:
+                    CLI.print_fail(f'Error reading support files: {err}')
+                    json_obj['failed'].append(futures[future])
+                continue
+            provider = host['provider']
+            parsed.append(hostname)
+            provisionings.append(provisioners.submit(provision, hostname, host))
+    for provisioning in provisionings:
+        provisioning.result()   # raises unexpected errors of a host
+
+    # Run the checks which need all hosts.
+    hosts.invalidate()
+    targets, hostgroup_env, errors = checks_targets(hosts, hostgroup, envpairs)
+    for err_text in errors:
+        CLI.print_fail(err_text)
+    if targets:
+        agent2host = {target['agent_id']: target['hostname'] for target in targets}
+        unsatisfiable, excluded = checks_preflight(gated_checks, targets)
+        for check in gated_checks:
+            if unsatisfiable.get(check.id) or checks_skip_reasons(check, hostgroup_env, len(targets)):
+                continue
+            check_targets = [target for target in targets if target['agent_id'] not in excluded.get(check.id, {})]
+            report(check, *checks_execute(wanda, check, hostgroup_env, check_targets, results_cache, fact_store)[:2], agent2host)
+    results_cache.save()
+    fact_store.save()
+
+    if json_obj['failed'] or errors:
+        json_obj['success'] = False
+    json_obj['cached'] = hosts.cache_hostgroup(hostgroup)
+    if json_obj['cached']:
+        CLI.print_info(f'''Processed supportfiles cached for: {', '.join(json_obj['cached'])}''')
+    CLI.print_json(json_obj)
+    hosts_pool_maintain(hosts)
+    return json_obj['success']
+
+
+def hosts_pool_maintain(hosts: HostsStack) -> None:
+    """Refills the pool of idle host containers and removes expired ones.
+    A failure is reported, but does not fail the command."""
+
+    try:
+        hosts.pool.maintain()
+    except (docker.errors.DockerException, HostsException) as err:
+        CLI.print_warn(f'Maintaining the host container pool failed: {err}')
+
+
 def hosts_start(hosts: HostsStack, hostgroup: str) -> bool:
     """Starts existing host containers of the given host group."""
 
     if hostgroup in hosts.hostgroups:
 
-        if hosts.start_hostgroup(hostgroup):
-            CLI.print_ok(f'Host group "{hostgroup}" started.')
-            CLI.print_json({'success': True})
-            return True        
+        json_obj = {'success': True, 'started': [], 'failed': [], 'errors': {}}
+        json_obj['started'], json_obj['failed'], json_obj['errors'] = hosts_outcomes(hosts.start_hostgroup(hostgroup), 'Starting')
+        if json_obj['started']:
+            CLI.print_info(f'''Started containers: {', '.join(json_obj['started'])}''')
+        if json_obj['failed']:
+            CLI.print_fail(f'Could not start host group "{hostgroup}"!')
+            json_obj['success'] = False
         else:
-            CLI.print_fail(f'Could not start host group "{hostgroup}!')
-            CLI.print_json({'success': False})
-            return False
+            CLI.print_ok(f'Host group "{hostgroup}" started.')
+        CLI.print_json(json_obj)
+        return json_obj['success']
         
     CLI.print_fail(f'Unknown host group "{hostgroup}!')
     CLI.print_json({'success': False})
     return False
+
+
+def hosts_outcomes(outcomes: Dict[str, Tuple[bool, str]], action: str) -> Tuple[List[str], List[str], Dict[str, str]]:
+    """Prints the failures of a host group operation and returns a tuple with the list 
+    of successful containers, the list of failed ones and a dictionary with their errors."""
+
+    succeeded, failed, errors = [], [], {}
+    for name, (success, error) in sorted(outcomes.items()):
+        if success:
+            succeeded.append(name)
+        else:
+            CLI.print_fail(f'{action} "{name}" failed: {error}')
+            failed.append(name)
+            errors[name] = error
+    return succeeded, failed, errors
         
 
 def hosts_status(hosts: HostsStack, hostgroup: str, details: bool = False) -> bool:
@@ -531,7 +1234,9 @@ def hosts_status(hosts: HostsStack, hostgroup: str, details: bool = False) -> bo
         json_obj[group] = []
         output = []
 
-        for host in hosts.filter_containers(filter={'hostgroup': group}, sortkey='hostgroup'):
+        group_hosts = hosts.filter_containers(filter={'hostgroup': group}, sortkey='hostgroup')
+        manifests = hosts.get_manifests(group_hosts) if details else {}
+        for host in group_hosts:
             
             host_status = {'name': host['name'], 
                         'status': CLI.ok if host['status'] == 'running' else CLI.error,
@@ -547,7 +1252,7 @@ def hosts_status(hosts: HostsStack, hostgroup: str, details: bool = False) -> bo
                     if isinstance(value, list):
                         value = '\n\t'.join(value.split())
                     host_status['details'][key] = value
-                manifest = hosts.get_manifest(host['container'])[1]
+                manifest = manifests[host['name']][1]
                 host_json['details']['manifest'] = manifest
                 if isinstance(manifest, dict):
                         manifest = '\n'.join([f'{k}: {v}' for k, v in manifest.items()])
@@ -571,26 +1276,20 @@ def hosts_stop(hosts: HostsStack, hostgroup: str) -> bool:
         CLI.print_json({'success': False, 'error': f'Host group "{hostgroup}" does not exist!.'})
         return False
 
-    success = True
-    json_obj = {'success': True, 'stopped': [], 'failed': []}
-    try:
-        stopped = hosts.stop_hostgroup(hostgroup)
-    except HostsException as err:
-        CLI.print_fail(err)
+    json_obj = {'success': True, 'stopped': [], 'failed': [], 'errors': {}}
+    json_obj['stopped'], json_obj['failed'], json_obj['errors'] = hosts_outcomes(hosts.stop_hostgroup(hostgroup), 'Stopping')
+    if json_obj['stopped']:
+        CLI.print_info(f'''Stopped containers: {', '.join(json_obj['stopped'])}''')
+    if json_obj['failed']:
         json_obj['success'] = False
-        json_obj['failed'] = stopped
-        success = False
     else:
-        if stopped:
-            CLI.print_info(f'''Stopped containers: {', '.join(stopped)}''')
-            json_obj['stopped'] = stopped
         CLI.print_ok(f'Host group "{hostgroup}" completely stopped.')
     CLI.print_json(json_obj)
     
-    return success
+    return json_obj['success']
 
 
-def hosts_rescan(hosts: HostsStack, hostgroup: str) -> bool:
+def hosts_rescan(hosts: HostsStack, hostgroup: str, results_cache: ResultCache, fact_store: FactStore) -> bool:
     """Triggers a reload of the supportfiles of all host containers of a given hostgroup."""
 
     if hostgroup not in hosts.hostgroups:
@@ -603,6 +1302,11 @@ def hosts_rescan(hosts: HostsStack, hostgroup: str) -> bool:
     json_obj = {'success': True, 'failed': {}}
     try:
         results = hosts.rescan_hostgroup(hostgroup)
+        container_ids = [host['container_id'] for host in hosts.filter_containers({'hostgroup': hostgroup})]
+        results_cache.invalidate(container_ids)
+        results_cache.save()
+        fact_store.invalidate(container_ids)
+        fact_store.save()
         for name, result in results.items():
             if not result[0]:
                 CLI.print_fail(f'Reloading supportfiles of "{name}" failed: {result[1]}')
@@ -627,42 +1331,40 @@ def hosts_remove(hosts: HostsStack, hostgroup: str) -> bool:
         CLI.print_fail(f'Host group "{hostgroup}" does not exist!.')
         CLI.print_json({'success': False, 'error': f'Host group "{hostgroup}" does not exist!.'})
         return False
-    hostgroups = [hostgroup]
    
-    success = True
-    json_obj = {'success': True, 'removed': [], 'failed': []}
-    try:
-        removed = hosts.remove_hostgroup(hostgroup)
-    except HostsException as err:
-        CLI.print_fail(err)
+    json_obj = {'success': True, 'removed': [], 'failed': [], 'errors': {}}
+    json_obj['removed'], json_obj['failed'], json_obj['errors'] = hosts_outcomes(hosts.remove_hostgroup(hostgroup), 'Removing')
+    if json_obj['removed']:
+        CLI.print_info(f'''Removed containers: {', '.join(json_obj['removed'])}''')
+    if json_obj['failed']:
         json_obj['success'] = False
-        json_obj['failed'] = removed
-        success = False
     else:
-        if removed:
-            CLI.print_info(f'''Removed containers: {', '.join(removed)}''')
-            json_obj['removed'] = removed
         CLI.print_ok(f'Host group "{hostgroup}" completely removed.')
     CLI.print_json(json_obj)
+    hosts_pool_maintain(hosts)
         
-    return success
+    return json_obj['success']
 
 
-def hosts_logs(hosts: HostsStack, containername: str, last_lines: int) -> None:
-    """Prints logs of given container."""
+def hosts_logs(hosts: HostsStack, containername: str, last_lines: int, follow: bool = False) -> None:
+    """Prints logs of given container. With `follow` new log lines are printed
+    as they come in (in JSON one line per log line)."""
     
-    if containername not in [e['name'] for e in hosts.containers]:
+    loglines = hosts.logs(containername, last_lines, follow)
+    if loglines is None:
         CLI.print_fail(f'Container "%{containername}" does not exist!')
         CLI.print_json({'success': False, 'error': f'Container "%{containername}" does not exist!'})
         return False
     
-    if last_lines:
-        CLI.print_logline(hosts.logs(containername)[-last_lines:])
-        json_obj = hosts.logs(containername)[-last_lines:]
-    else:
-        CLI.print_logline(hosts.logs(containername))
-        json_obj = hosts.logs(containername)
-    CLI.print_json(json_obj)
+    if follow:
+        for logline in loglines:
+            CLI.print_logline([logline])
+            CLI.print_json(logline)
+            sys.stdout.flush()
+        return True
+    loglines = list(loglines)
+    CLI.print_logline(loglines)
+    CLI.print_json(loglines)
     
 
 def checks_list(wanda: WandaStack, details: bool = False, show_all: bool = False) -> None:
@@ -772,165 +1474,801 @@ def checks_show(wanda: WandaStack, check: str) -> None:
     CLI.print_json(json_obj) 
 
 
-def checks_run(wanda: WandaStack, 
-               hosts: HostsStack,
-               hostgroup: str, 
-               envpairs: Dict[str, str], 
-               check_groups: List[str],
-               requested_checks: List[str],
-               show_skipped: bool,
-               failure_only: bool,
-               wait_on_failure: bool) -> bool:
-    """Executed the requested checks."""
+def checks_preflight(checks: List[Check], hosts: List[Host]) -> Tuple[Dict[str, List[str]], Dict[str, Dict[str, str]]]:
+    """Determines for which hosts the supportfiles do not provide the data the gatherers
+    of a check require (manifest entry failed). Multi checks compare the hosts and cannot
+    be satisfied if one host lacks data, single checks only if all hosts lack data.
+    Returns a dictionary with the check id as key and the list of reasons as value for
+    the checks which cannot be satisfied and a dictionary with the check id as key and 
+    a dictionary of the agent ids of the hosts to leave out and their reason as value
+    for the single checks which can run on the other hosts. Hosts without a valid 
+    manifest are not taken into account."""
     
+    unsatisfiable = collections.defaultdict(list)
+    excluded = collections.defaultdict(dict)
+    for check in checks:
+        for host in hosts:
+            if not isinstance(host['manifest'], dict):
+                continue
+            missing = check.missing_data(host['manifest'])
+            if missing:
+                excluded[check.id][host['agent_id']] = f'''Supportfiles of host "{host['hostname']}" do not provide: {', '.join(missing)}.'''
+        if check.id in excluded and (check.check_type.startswith('multi') or len(excluded[check.id]) == len(hosts)):
+            unsatisfiable[check.id] = list(excluded.pop(check.id).values())
+    return unsatisfiable, excluded
+
+
+def checks_skip_reasons(check: Check, hostgroup_env: Dict[str, str], host_count: int) -> List[str]:
+    """Returns the reasons why the check does not fit a host group with the given
+    environment and amount of hosts. An empty list means the check can be run."""
+
+    reasons = []
+
+    # Skip multi checks if only one host is there.
+    if host_count == 1 and check.check_type.startswith('multi'):
+        reasons.append('Multi check, but only one host.')
+
+    # Skip checks when environment does not match.        
+    for env_name, check_env in ('provider', check.provider), ('cluster_type', check.cluster_type), ('architecture_type', check.architecture_type), ('ensa_version', check.ensa_version), ('filesystem_type', check.filesystem_type), ('hana_scenario', check.hana_scenario): 
+        if check_env:   # check has a requirement
+            if env_name not in hostgroup_env:
+                reasons.append(f'''Hostgroup does not have "{env_name}" set, but check requires one of: {' '.join(check_env)}.''')
+            elif hostgroup_env[env_name] not in check_env:
+                reasons.append(f'''Hostgroup has "{hostgroup_env[env_name]}" for "{env_name}", but check requires one of: {' '.join(check_env)}.''')
+    return reasons
+
+
+def checks_results(check: Check, 
+                   check_results: str, 
+                   err: bool, 
+                   agent2host: Dict[str, str], 
+                   hostgroup: str, 
+                   failure_only: bool,
+                   skipped: Dict[str, str] = None) -> Tuple[List[Dict[str, Any]], bool]:
+    """Converts the results of `WandaStack.execute_check()` or `WandaStack.evaluate_check()`
+    into the entries for `CLI.print_status()`. The hosts left out by `checks_preflight()`
+    are added as skipped, if their agent ids and reasons are given in `skipped`.
+    Returns the entries and if a check did not pass."""
+
     status_codes = {'passing': CLI.ok,
                     'warning': CLI.warn,
                     'error': CLI.error,
                     'critical': CLI.error
                     }
-    json_obj = {}
+    failure = False
+
+    if err:
+        return [{'name': f'{check.id} - {check.description}',
+                 'status': CLI.error,
+                 'status_text': 'error',
+                 'details': {'error': check_results}}], failure
     
-    # Build host target list, a mapping from agent id to host name
-    # and the environment entry dict for the entire hostgroup.
+    results = []
+    for check_result in json.loads(check_results):
+        
+        # For the paranoid. This should never happen.
+        if check.id != check_result['check']:
+            results = [{'name': f'{check.id} - {check.description}',
+                        'status': CLI.error,
+                        'status_text': 'error',
+                        'details': {'error': f'''The check id from the call ("{check.id}") and the result ("{check_result['check']}") differ. You found a bug!'''}}]
+        else:             
+            details = {'hostname': agent2host[check_result['agent_id']],
+                    'hostgroup': hostgroup,
+                    'agent id': check_result['agent_id']}
+            if not hostgroup:   # evaluated locally
+                del details['hostgroup'], details['agent id']
+            if 'messages' in check_result:
+                details['messages'] = check_result['messages']
+            if status_codes[check_result['result']] != CLI.ok:
+                details['remediation'] = check.remediation
+
+            if failure_only and status_codes[check_result['result']] == CLI.ok:
+                continue
+            
+            if not failure and check_result['result'] != 'passing':
+                failure = True
+            
+            results.append({'name': f'{check.id} - {check.description}',
+                            'status': status_codes[check_result['result']],
+                            'status_text': check_result['result'],
+                            'details': details})
+    for agent_id, reason in (skipped or {}).items():
+        results.append({'name': f'{check.id} - {check.description}',
+                        'status': CLI.warn,
+                        'status_text': 'skipped',
+                        'details': {'hostname': agent2host[agent_id],
+                                    'hostgroup': hostgroup,
+                                    'agent id': agent_id,
+                                    'reason': reason}})
+    return results, failure
+
+
+def checks_select(wanda: WandaStack, 
+                  check_groups: List[str], 
+                  requested_checks: List[str], 
+                  attributes: List[str] = None) -> Dict[str, List[Check]]:
+    """Returns the supported checks, limited to the requested check groups or checks,
+    with the check group as key."""
+
+    checks2run = collections.defaultdict(list)
+    for check in wanda.checks(attributes):
+        if check.tcsc_support != 'yes':  # skip unsupported checks
+            continue
+        if check_groups and check.group not in check_groups:  # skip checks not part of the requested group
+            continue
+        if requested_checks and check.id not in requested_checks:  # skip checks not among the requested checks
+            continue 
+        checks2run[check.group].append(check)   
+    return checks2run
+
+
+def checks_targets(hosts: HostsStack, hostgroup: str, envpairs: Dict[str, str]) -> Tuple[List[Host], Dict[str, str], List[str]]:
+    """Returns the hosts of the host group with their manifests, the environment entries
+    of the entire host group and the problems found. If a host is not running or the 
+    host group has no hosts, no hosts are returned."""
+
     targets = []
-    agent2host = {}
     hostgroup_env = {}
-    for host in hosts.filter_containers({'hostgroup': hostgroup}):
+    errors = []
+    group_hosts = hosts.filter_containers({'hostgroup': hostgroup})
+    for host in group_hosts:
         if host['status'] != 'running':
-            err_text = f'''Host "{host['hostname']}" is not running, but has status "{host['status']}".'''
-            CLI.print_fail(err_text)
-            CLI.print_json({'success': False, 'error': err_text})
-            return False
-        err, result = hosts.get_manifest(host['container'])
+            return [], {}, [f'''Host "{host['hostname']}" is not running, but has status "{host['status']}".''']
+    manifests = hosts.get_manifests(group_hosts)
+    for host in group_hosts:
+        err, result = manifests[host['name']]
         if err:
-            err_text = f'''Could not retrieve manifest from host "{host['hostname']}": {result}".'''
-            CLI.print_fail(err_text)
-            CLI.print_json({'success': False, 'error': err_text})       
+            errors.append(f'''Could not retrieve manifest from host "{host['hostname']}": {result}".''')
         host['manifest'] = result
         for env in 'provider', 'cluster_type', 'architecture_type', 'ensa_version', 'filesystem_type', 'hana_scenario':
             value = envpairs[env] if env in envpairs else host[env]
             if value:  # only environments which are set
                 if env in hostgroup_env:
                     if hostgroup_env[env] != value:
-                        err_text = f'''Value of "{env}" differs for host "{host['hostname']} from previous hosts": {value}!={hostgroup_env[env]}".'''
-                        CLI.print_fail(err_text)
-                        CLI.print_json({'success': False, 'error': err_text})      
+                        errors.append(f'''Value of "{env}" differs for host "{host['hostname']} from previous hosts": {value}!={hostgroup_env[env]}".''')
                 else:
                     hostgroup_env[env] = value           
         targets.append(host)
-        agent2host[host['agent_id']] = host['hostname'] 
     if not targets:
-        err_text = f'No hosts for host group "{hostgroup}" found.'
+        errors.append(f'No hosts for host group "{hostgroup}" found.')
+    return targets, hostgroup_env, errors
+
+
+def checks_execute(wanda: WandaStack,
+                   check: Check,
+                   hostgroup_env: Dict[str, str],
+                   targets: List[Host],
+                   results_cache: ResultCache,
+                   fact_store: FactStore,
+                   group_id: str = None,
+                   in_flight: str = None,
+                   expected_duration: float = None,
+                   deadline: float = None,
+                   timeout_duration: float = None) -> Tuple[str, bool, str]:
+    """Returns the results of the check for the hosts like `WandaStack.execute_check()` 
+    and their source: 'cache' (result cache), 'facts' (evaluated with stored facts) or
+    'wanda' (executed). `group_id`, `in_flight`, `expected_duration`, `deadline` and
+    `timeout_duration` are passed to `WandaStack.execute_check()`."""
+
+    target_identities = [ResultCache.host_identity(host) for host in targets]
+    agent2identity = {host['agent_id']: ResultCache.host_identity(host) for host in targets}
+    cache_key = ResultCache.key(check.id, check.digest, target_identities, hostgroup_env)
+    check_results, err = results_cache.get(cache_key), False
+    if check_results is not None:
+        return check_results, err, 'cache'
+
+    # Evaluate locally if all facts are stored, otherwise let Wanda gather them.
+    source = 'facts'
+    facts = {agent_id: fact_store.facts(check.definition, identity) for agent_id, identity in agent2identity.items()}
+    if None not in facts.values():
+        check_results, err = wanda.evaluate_check(hostgroup_env, facts, check)
+    if check_results is None or err:
+        source = 'wanda'
+        responses = []
+        check_results, err = wanda.execute_check(hostgroup_env, [h['agent_id'] for h in targets], check.id, responses, 
+                                                 group_id, in_flight, expected_duration, deadline, timeout_duration)
+        if not err:
+            fact_store.capture(check.definition, responses, agent2identity)
+    if not err:
+        results_cache.store(cache_key, check.id, check.digest, target_identities, check_results)
+    return check_results, err, source
+
+
+def checks_expected(history: RunHistory, checks: List[Check]) -> Dict[str, Tuple[float, float]]:
+    """Returns the expected durations of the Wanda executions per check as tuple of the
+    duration used for hedging and the one used for the timeout (see `RunHistory.latencies()`,
+    either may be None). A check without enough executions of its own gets the longest
+    durations of the checks using one of its gatherers (the gatherers dominate the duration).
+    Without a usable history no duration is known."""
+
+    try:
+        statistics = history.latencies()
+    except HistoryException:
+        return {}
+    completed = []
+    for latencies in statistics:
+        gatherer_latencies = {}
+        for check in checks:
+            if check.id in latencies:
+                for gatherer in check.gatherer or []:
+                    gatherer = gatherer.split('@')[0]
+                    gatherer_latencies[gatherer] = max(gatherer_latencies.get(gatherer, 0), latencies[check.id])
+        for check in checks:
+            if check.id not in latencies:
+                fallback = max([gatherer_latencies.get(gatherer.split('@')[0], 0) for gatherer in check.gatherer or []], default=0)
+                if fallback:
+                    latencies[check.id] = fallback
+        completed.append(latencies)
+    percentiles, limits = completed
+    return {check_id: (percentiles.get(check_id), limits[check_id]) for check_id in limits}
+
+
+def checks_schedule(checks2run: Dict[str, List[Check]], expected: Dict[str, Tuple[float, float]]) -> Dict[str, List[Check]]:
+    """Returns the checks of each check group ordered by their expected duration, longest
+    first, so the long-running checks are not the ones left over when the deadline of a
+    run is reached. Checks without an expected duration might be long and come first."""
+
+    return {check_group: sorted(checks, key=lambda check: -expected.get(check.id, (None, float('inf')))[1])
+            for check_group, checks in checks2run.items()}
+
+
+def checks_run(wanda: WandaStack, 
+               hosts: HostsStack,
+               results_cache: ResultCache,
+               fact_store: FactStore,
+               history: RunHistory,
+               export: ResultExport,
+               checkpoint: RunCheckpoint,
+               hostgroup: str, 
+               envpairs: Dict[str, str], 
+               check_groups: List[str],
+               requested_checks: List[str],
+               show_skipped: bool,
+               failure_only: bool,
+               wait_on_failure: bool,
+               deadline: int = None) -> bool:
+    """Executed the requested checks. If the checkpoint has been loaded, the run
+    gets resumed with the environment and checks of the interrupted run. With a
+    `deadline` (seconds) the run gets no Wanda executions after it has passed and
+    the long-running checks are executed first."""
+    
+    deadline = time.time() + deadline if deadline else None
+    json_obj = {}
+    resume = checkpoint.header
+    if resume:
+        if resume['hostgroup'] != hostgroup:
+            err_text = f'''Run "{checkpoint.run_id}" belongs to host group "{resume['hostgroup']}".'''
+            CLI.print_fail(err_text)
+            CLI.print_json({'success': False, 'error': err_text})
+            return False
+        envpairs, check_groups, requested_checks = resume['envpairs'], None, resume['checks']
+    
+    # Build host target list, a mapping from agent id to host name
+    # and the environment entry dict for the entire hostgroup.
+    targets, hostgroup_env, errors = checks_targets(hosts, hostgroup, envpairs)
+    for err_text in errors:
+        CLI.print_fail(err_text)
+        CLI.print_json({'success': False, 'error': err_text})
+    if not targets:
+        return False
+    agent2host = {host['agent_id']: host['hostname'] for host in targets}
+    if resume and (resume['environment'] != hostgroup_env or resume['agents'] != agent2host):
+        err_text = f'Hosts or environment of host group "{hostgroup}" have changed since run "{checkpoint.run_id}".'
         CLI.print_fail(err_text)
         CLI.print_json({'success': False, 'error': err_text})
         return False
 
     # Build effective checks list.
-    checks2run = collections.defaultdict(list)
-    for check in wanda.checks(['id', 'description', 'group', 'metadata.provider', 'metadata.cluster_type',
-                               'metadata.architecture_type', 'metadata.ensa_version', 'metadata.filesystem_type',
-                               'metadata.hana_scenario', 'expectations[].type', 'facts[].gatherer', 'remediation']):
-        if check.tcsc_support != 'yes':  # skip unsupported checks
-            continue
-        if check_groups and check.group not in check_groups:  # skip checks not part of the requested group
-            continue
-        if requested_checks and check.id not in requested_checks:  # skip checks not among the requested checks
-            continue 
-        checks2run[check.group].append(check)   
+    checks2run = checks_select(wanda, check_groups, requested_checks, 
+                               ['id', 'description', 'group', 'metadata.provider', 'metadata.cluster_type',
+                                'metadata.architecture_type', 'metadata.ensa_version', 'metadata.filesystem_type',
+                                'metadata.hana_scenario', 'expectations[].type', 'facts[].gatherer', 'remediation'])
     if not checks2run:
         err_text = 'No checks to run.'
         CLI.print_fail(err_text)
         CLI.print_json({'success': False, 'error': err_text})
         return False
+    
+    # Checks whose gatherers lack data are not sent to Wanda, single checks
+    # are sent for the hosts which have the data.
+    unsatisfiable, excluded = checks_preflight([check for checks in checks2run.values() for check in checks], targets)
+    
+    # Drop cached results of changed check definitions.
+    results_cache.prune({check.id: check.digest for checks in checks2run.values() for check in checks})
+    run = history.begin('checks run', hostgroup, hostgroup_env, targets)
+    expected = checks_expected(history, [check for checks in checks2run.values() for check in checks])
+    if deadline:
+        checks2run = checks_schedule(checks2run, expected)
+    cached_results = 0
+    evaluated_results = 0
+    failed_checks = 0
+    if resume:
+        CLI.print_info(f'Resuming run "{checkpoint.run_id}": {len(checkpoint.completed)} checks completed, {len(checkpoint.in_flight)} to reconcile with Wanda.')
+    else:
+        checkpoint.begin(hostgroup, envpairs, hostgroup_env, [check.id for checks in checks2run.values() for check in checks], agent2host)
 
     # Walk through check groups and their checks and run them.
     output = []
+    try:
+        for check_group in checks2run:
+            CLI.print()
+            CLI.print_header(check_group)
+            check_group_json = []
+            for check in checks2run[check_group]:
+                failure = False
+
+                # Skip checks the supportfiles cannot satisfy or which do not fit the host group.
+                skip_reason = unsatisfiable.get(check.id, []) + checks_skip_reasons(check, hostgroup_env, len(agent2host))
+                skip = bool(skip_reason)
+                            
+                if skip:
+                    if show_skipped:
+                        results = [{'name': f'{check.id} - {check.description}',
+                                        'status': CLI.warn,
+                                        'status_text': 'skipped',
+                                        'details': {'reason': '\n'.join(skip_reason)}}]
+                    else:
+                        continue       
+                else:
+                    # Completed checks of an interrupted run are taken from the journal, executions
+                    # still in flight are reconciled with Wanda by their group id.
+                    if check.id in checkpoint.completed:
+                        record = checkpoint.completed[check.id]
+                        check_results, err, source, duration = record['results'], False, 'checkpoint', record['duration']
+                    else:
+                        start = time.perf_counter()
+                        group_id = str(uuid.uuid4())
+                        checkpoint.start(check.id, group_id)
+                        check_targets = [target for target in targets if target['agent_id'] not in excluded.get(check.id, {})]
+                        expected_duration, timeout_duration = expected.get(check.id, (None, None))
+                        check_results, err, source = checks_execute(wanda, check, hostgroup_env, check_targets, results_cache, fact_store,
+                                                                    group_id, checkpoint.in_flight.get(check.id), expected_duration, deadline,
+                                                                    timeout_duration)
+                        duration = time.perf_counter() - start
+                        if err:
+                            checkpoint.fail(check.id, str(check_results))
+                        else:
+                            checkpoint.complete(check.id, check_results, duration, source)
+                    history.add(run, check.id, check.group, check_results, err, duration, source, agent2host,
+                                isinstance(check_results, loaded('rabbiteer', 'RabbiteerTimeOut')))
+                    cached_results += source == 'cache'
+                    evaluated_results += source == 'facts'
+                    failed_checks += err
+                    results, failure = checks_results(check, check_results, err, agent2host, hostgroup, failure_only,
+                                                      excluded.get(check.id) if show_skipped else None)
+
+                CLI.print_status(results)
+                if wait_on_failure and failure:
+                    input('Press <ENTER> to continue!')
+                    
+                if results:
+                    check_group_json.append(results)
+            if check_group_json:
+                json_obj[check_group] = check_group_json
+    except (KeyboardInterrupt, SystemExit):
+        if checkpoint.ttl:
+            CLI.print_info(f'Run interrupted, resume it with `checks run --resume {checkpoint.run_id} {hostgroup}`.', file=sys.stderr)
+        raise
+    results_cache.save()
+    fact_store.save()
+    try:
+        run_id = history.save(run)
+    except HistoryException as err:
+        CLI.print_warn(f'Run could not be recorded: {err}')
+        run_id = None
+    export_file = None
+    if export:
+        try:
+            export_file = export.write(run, run_id)
+        except ExportException as err:
+            CLI.print_warn(f'Results could not be exported: {err}')
+    if cached_results or evaluated_results or run_id or export_file or failed_checks:
+        CLI.print()
+    if cached_results:
+        CLI.print_info(f'{cached_results} check results have been taken from the cache (see --no-cache).')
+    if evaluated_results:
+        CLI.print_info(f'{evaluated_results} checks have been evaluated with stored facts (see --no-cache).')
+    if run_id:
+        CLI.print_info(f'Results have been recorded as run {run_id} (see `results query`).')
+    if export_file:
+        CLI.print_info(f'Results have been exported to "{export_file}".')
+    if failed_checks and checkpoint.ttl:
+        CLI.print_info(f'{failed_checks} checks failed, retry them with `checks run --resume {checkpoint.run_id} {hostgroup}`.')
+    else:
+        checkpoint.remove()
+    CLI.print_json(json_obj)
+
+
+def checks_evaluate(wanda: WandaStack,
+                    supportfiles: List[str],
+                    envpairs: Dict[str, str],
+                    check_groups: List[str],
+                    requested_checks: List[str],
+                    show_skipped: bool,
+                    failure_only: bool) -> bool:
+    """Evaluates the requested checks locally with the facts gathered directly
+    from the supportfiles. Each supportfile represents a host, the hostname 
+    serves as agent id. Checks using a gatherer which cannot run locally or 
+    something the local evaluator does not support are skipped."""
+
+    json_obj = {}
+
+    # Detect the environment and prepare the gatherers of each host.
+    supportfiles_data = SupportFiles(supportfiles)
+    if supportfiles_data.issues:
+        for issue in supportfiles_data.issues:
+            CLI.print_fail(issue)
+        CLI.print_json({'success': False, 'error': [str(issue) for issue in supportfiles_data.issues]})
+        return False
+    hostgroup_env = {}
+    local_facts = {}
+    for hostname, data in supportfiles_data.result.items():
+        for env in 'provider', 'cluster_type', 'architecture_type', 'ensa_version', 'filesystem_type', 'hana_scenario':
+            value = envpairs[env] if env in envpairs else data[env]
+            if value:  # only environments which are set
+                if env in hostgroup_env and hostgroup_env[env] != value:
+                    err_text = f'''Value of "{env}" differs for host "{hostname}" from previous hosts: {value}!={hostgroup_env[env]}".'''
+                    CLI.print_fail(err_text)
+                    CLI.print_json({'success': False, 'error': err_text})
+                    return False
+                hostgroup_env[env] = value
+        local_facts[hostname] = LocalFacts(Supportconfig(data['supportconfig']))
+    agent2host = {hostname: hostname for hostname in local_facts}
+
+    # Build effective checks list.
+    checks2run = checks_select(wanda, check_groups, requested_checks)
+    if not checks2run:
+        err_text = 'No checks to run.'
+        CLI.print_fail(err_text)
+        CLI.print_json({'success': False, 'error': err_text})
+        return False
+
+    # Walk through check groups and their checks and evaluate them.
+    evaluated = 0
+    start = time.perf_counter()
     for check_group in checks2run:
         CLI.print()
         CLI.print_header(check_group)
         check_group_json = []
         for check in checks2run[check_group]:
-            failure = False
-            skip = False
-            skip_reason = []
-            
-            # Skip multi checks if only one host is there.
-            if len(agent2host) == 1 and check.check_type.startswith('multi'):
-                skip = True 
-                skip_reason.append('Multi check, but only one host.')
-
-            # Skip checks when environment does not match.        
-            for env_name, check_env in ('provider', check.provider), ('cluster_type', check.cluster_type), ('architecture_type', check.architecture_type), ('ensa_version', check.ensa_version), ('filesystem_type', check.filesystem_type), ('hana_scenario', check.hana_scenario): 
-                if check_env:   # check has a requirement
-                    if env_name not in hostgroup_env:
-                        skip = True 
-                        skip_reason.append(f'''Hostgroup does not have "{env_name}" set, but check requires one of: {' '.join(check_env)}.''')
-                    elif hostgroup_env[env_name] not in check_env:
-                        skip = True 
-                        skip_reason.append(f'''Hostgroup has "{hostgroup_env[env_name]}" for "{env_name}", but check requires one of: {' '.join(check_env)}.''')
-                        
-            if skip:
-                if show_skipped:
-                    results = [{'name': f'{check.id} - {check.description}',
-                                    'status': CLI.warn,
-                                    'status_text': 'skipped',
-                                    'details': {'reason': '\n'.join(skip_reason)}}]
-                else:
-                    continue       
+            skip_reason = [f'Gatherer "{gatherer}" cannot be run locally.' for gatherer in sorted(set(check.gatherer)) if not LocalFacts.supports(gatherer)]
+            skip_reason += checks_skip_reasons(check, hostgroup_env, len(agent2host))
+            if skip_reason:
+                if not show_skipped:
+                    continue
+                results = [{'name': f'{check.id} - {check.description}',
+                            'status': CLI.warn,
+                            'status_text': 'skipped',
+                            'details': {'reason': '\n'.join(skip_reason)}}]
             else:
-                
-                check_results, err = wanda.execute_check(hostgroup_env, [h['agent_id'] for h in targets], check.id)
-                if err:
+                facts = {hostname: {fact['name']: gatherers.fact(fact['gatherer'], fact.get('argument')) for fact in check.definition.get('facts') or []}
+                         for hostname, gatherers in local_facts.items()}
+                check_results, err = wanda.evaluate_check(hostgroup_env, facts, check)
+                if err:   # the check uses something the local evaluator does not support
+                    if not show_skipped:
+                        continue
                     results = [{'name': f'{check.id} - {check.description}',
-                                'status': CLI.error,
-                                'status_text': 'error',
-                                'details': {'error': check_results}}]
-                else:   
-                    results = []
-                    for check_result in json.loads(check_results):
-                        
-                        # For the paranoid. This should never happen.
-                        if check.id != check_result['check']:
-                            results = [{'name': f'{check.id} - {check.description}',
-                                        'status': CLI.error,
-                                        'status_text': 'error',
-                                        'details': {'error': f'''The check id from the call ("{check.id}") and the result ("{check_result['check']}") differ. You found a bug!'''}}]
-                        else:             
-                            details = {'hostname': agent2host[check_result['agent_id']],
-                                    'hostgroup': hostgroup,
-                                    'agent id': check_result['agent_id']}
-                            if 'messages' in check_result:
-                                details['messages'] = check_result['messages']
-                            if status_codes[check_result['result']] != CLI.ok:
-                                details['remediation'] = check.remediation
-
-                            if failure_only and status_codes[check_result['result']] == CLI.ok:
-                                continue
-                            
-                            if not failure and check_result['result'] != 'passing':
-                                failure = True
-                            
-                            results.append({'name': f'{check.id} - {check.description}',
-                                            'status': status_codes[check_result['result']],
-                                            'status_text': check_result['result'],
-                                            'details': details})
-
+                                'status': CLI.warn,
+                                'status_text': 'skipped',
+                                'details': {'reason': check_results}}]
+                else:
+                    evaluated += 1
+                    results, _ = checks_results(check, check_results, err, agent2host, None, failure_only)
             CLI.print_status(results)
-            if wait_on_failure and failure:
-                input('Press <ENTER> to continue!')
-                
             if results:
                 check_group_json.append(results)
         if check_group_json:
             json_obj[check_group] = check_group_json
+    duration = time.perf_counter() - start
+    CLI.print()
+    CLI.print_info(f'{evaluated} checks have been evaluated locally in {duration:.2f}s.')
     CLI.print_json(json_obj)
+    return True
+
+
+def fleet_hostgroup(wanda: WandaStack,
+                    hosts: HostsStack,
+                    results_cache: ResultCache,
+                    fact_store: FactStore,
+                    history: RunHistory,
+                    export: ResultExport,
+                    checks2run: Dict[str, List[Check]],
+                    expected: Dict[str, Tuple[float, float]],
+                    group: FleetGroup,
+                    envpairs: Dict[str, str],
+                    failure_only: bool,
+                    keep: bool,
+                    deadline: float = None) -> Dict[str, Any]:
+    """Creates the host containers of a fleet host group, runs the checks and removes
+    the host group again (unless `keep` is set). Returns the report of the host group.
+    The `expected` durations and the `deadline` (epoch time) are passed to `checks_execute()`,
+    a host group is not created anymore once the deadline has passed."""
+
+    report = {'success': True,
+              'cluster': group.cluster,
+              'hosts': {hostname: host['supportconfig'] for hostname, host in group.hosts.items()},
+              'missing_nodes': group.missing,
+              'environment': {},
+              'errors': [],
+              'summary': collections.Counter(),
+              'checks': {},
+              'timings': {}}
+
+    def create(hostname: str, host: Dict[str, Any]) -> str:
+        try:
+            name = hosts.create(group.name, hostname, host, envpairs)
+            if not hosts.wait4manifest(hosts.filter_containers({'hostgroup': group.name, 'name': name})[0]):
+                return f'Host container "{name}" did not finish processing the supportfiles.'
+        except (docker.errors.DockerException, HostsException, IndexError) as err:
+            return f'Could not start host container for host "{hostname}": {err}'
+        return None
+
+    if deadline and time.time() >= deadline:
+        report['success'] = False
+        report['errors'].append('Deadline of the run has been reached.')
+        report['summary'] = {}
+        return report
+
+    try:
+        # Create all host containers concurrently and wait for the processed supportfiles.
+        start = time.perf_counter()
+        host_descriptions = group.host_descriptions()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(host_descriptions), HostsStack.parallel_operations)) as executor:
+            report['errors'] += [err for err in executor.map(create, host_descriptions.keys(), host_descriptions.values()) if err]
+        report['timings']['provision'] = round(time.perf_counter() - start, 2)
+        if report['errors']:
+            report['success'] = False
+            return report
+
+        # Run the checks like `checks run` does.
+        start = time.perf_counter()
+        targets, report['environment'], errors = checks_targets(hosts, group.name, envpairs)
+        report['errors'] += errors
+        if not targets:
+            report['success'] = False
+            return report
+        agent2host = {host['agent_id']: host['hostname'] for host in targets}
+        unsatisfiable, excluded = checks_preflight([check for checks in checks2run.values() for check in checks], targets)
+        run = history.begin('fleet run', group.name, report['environment'], targets)
+        for check_group, checks in checks2run.items():
+            check_group_json = []
+            for check in checks:
+                if unsatisfiable.get(check.id) or checks_skip_reasons(check, report['environment'], len(targets)):
+                    report['summary']['skipped'] += 1
+                    continue
+                check_start = time.perf_counter()
+                check_targets = [target for target in targets if target['agent_id'] not in excluded.get(check.id, {})]
+                expected_duration, timeout_duration = expected.get(check.id, (None, None))
+                check_results, err, source = checks_execute(wanda, check, report['environment'], check_targets, results_cache, fact_store,
+                                                            expected_duration=expected_duration, deadline=deadline,
+                                                            timeout_duration=timeout_duration)
+                history.add(run, check.id, check.group, check_results, err, time.perf_counter() - check_start, source, agent2host,
+                            isinstance(check_results, loaded('rabbiteer', 'RabbiteerTimeOut')))
+                if err:
+                    check_results = str(check_results)
+                    report['summary']['error'] += 1
+                else:
+                    report['summary'].update(result['result'] for result in json.loads(check_results))
+                report['summary']['skipped'] += len(excluded.get(check.id, {}))
+                results, _ = checks_results(check, check_results, err, agent2host, group.name, failure_only, excluded.get(check.id))
+                if results:
+                    check_group_json.append(results)
+            if check_group_json:
+                report['checks'][check_group] = check_group_json
+        report['timings']['checks'] = round(time.perf_counter() - start, 2)
+        try:
+            report['run'] = history.save(run)
+        except HistoryException as err:
+            report['errors'].append(f'Run could not be recorded: {err}')
+        if export:
+            try:
+                export.write(run, report.get('run'))
+            except ExportException as err:
+                report['errors'].append(f'Results could not be exported: {err}')
+
+    finally:
+        if not keep:
+            start = time.perf_counter()
+            try:
+                report['errors'] += [f'Removing "{name}" failed: {err}' for name, (success, err) in hosts.remove_hostgroup(group.name).items() if not success]
+            except (docker.errors.DockerException, HostsException) as err:
+                report['errors'].append(f'Removing host group "{group.name}" failed: {err}')
+            report['timings']['teardown'] = round(time.perf_counter() - start, 2)
+        report['summary'] = dict(report['summary'])
+    
+    return report
+
+
+def fleet_run(wanda: WandaStack,
+              hosts: HostsStack,
+              results_cache: ResultCache,
+              fact_store: FactStore,
+              history: RunHistory,
+              export: ResultExport,
+              directory: str,
+              envpairs: Dict[str, str],
+              check_groups: List[str],
+              requested_checks: List[str],
+              parallel: int,
+              report_file: str,
+              failure_only: bool,
+              keep: bool,
+              deadline: int = None) -> bool:
+    """Runs the checks for all supportconfigs below the directory. The supportconfigs get 
+    grouped into host groups by their cluster and each host group is created, checked and 
+    removed. Up to `parallel` host groups are processed at the same time while the remaining
+    supportconfigs are still being parsed. The results are written as JSON report. With a
+    `deadline` (seconds) no host group gets created and no Wanda execution started after
+    it has passed and the long-running checks are executed first."""
+
+    deadline = time.time() + deadline if deadline else None
+
+    checks2run = checks_select(wanda, check_groups, requested_checks, 
+                               ['id', 'description', 'group', 'metadata.provider', 'metadata.cluster_type',
+                                'metadata.architecture_type', 'metadata.ensa_version', 'metadata.filesystem_type',
+                                'metadata.hana_scenario', 'expectations[].type', 'facts[].gatherer', 'remediation'])
+    if not checks2run:
+        err_text = 'No checks to run.'
+        CLI.print_fail(err_text)
+        CLI.print_json({'success': False, 'error': err_text})
+        return False
+
+    fleet = Fleet(directory, parallel, hosts.hostgroups)
+    supportfiles = fleet.supportfiles()
+    if not supportfiles:
+        err_text = f'No supportconfigs found in "{directory}".'
+        CLI.print_fail(err_text)
+        CLI.print_json({'success': False, 'error': err_text})
+        return False
+    CLI.print_info(f'{len(supportfiles)} supportconfigs found in "{directory}".')
+
+    # The host groups use the caches concurrently, so everything iterating
+    # over the entries is done before.
+    results_cache.prune({check.id: check.digest for checks in checks2run.values() for check in checks})
+    fact_store.load()
+    expected = checks_expected(history, [check for checks in checks2run.values() for check in checks])
+    if deadline:
+        checks2run = checks_schedule(checks2run, expected)
+
+    report = {'directory': directory,
+              'started': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+              'supportconfigs': len(supportfiles),
+              'hostgroups': {},
+              'issues': fleet.issues}
+    start = time.perf_counter()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=parallel) as executor:
+        futures = {executor.submit(fleet_hostgroup, wanda, hosts, results_cache, fact_store, history, export, checks2run, expected,
+                                   group, envpairs, failure_only, keep, deadline): group for group in fleet.groups(supportfiles)}
+        for future in concurrent.futures.as_completed(futures):
+            group = futures[future]
+            try:
+                group_report = future.result()
+            except Exception as err:
+                group_report = {'success': False, 'cluster': group.cluster, 'errors': [str(err)]}
+            report['hostgroups'][group.name] = group_report
+            if group_report['success']:
+                summary = ', '.join(f'{count} {result}' for result, count in sorted(group_report['summary'].items())) or 'no checks'
+                duration = sum(group_report['timings'].values())
+                CLI.print_ok(f'Host group "{group.name}" ({len(group.hosts)} hosts): {summary} ({duration:.1f}s)')
+            else:
+                CLI.print_fail(f'''Host group "{group.name}" ({len(group.hosts)} hosts): {' '.join(group_report['errors'])}''')
+    for issue in fleet.issues:
+        CLI.print_warn(f'''Supportconfig "{issue['supportfile']}" skipped: {issue['error']}''')
+    report['hostgroups'] = dict(sorted(report['hostgroups'].items()))
+    report['duration'] = round(time.perf_counter() - start, 2)
+    results_cache.save()
+    fact_store.save()
+
+    try:
+        with open(Config.hostfs_path(report_file), 'w') as f:
+            json.dump(report, f, indent=4)
+    except OSError as err:
+        CLI.print_fail(f'Could not write report "{report_file}": {err}')
+        CLI.print_json({'success': False, 'error': str(err)})
+        return False
+    CLI.print_info(f'''Report of {len(report['hostgroups'])} host groups written to "{report_file}" ({report['duration']:.1f}s).''')
+    if export:
+        CLI.print_info(f'Results have been exported to "{export.directory}" ({export.format}).')
+    CLI.print_json(report)
+    return all(group_report['success'] for group_report in report['hostgroups'].values())
+
+
+def results_query(history: RunHistory,
+                  hostgroup: str,
+                  check: str,
+                  result: str,
+                  run_id: int,
+                  since: float,
+                  until: float,
+                  limit: int,
+                  runs: bool) -> None:
+    """Prints the recorded results (or with `runs` the recorded runs) matching the filters."""
+
+    status_codes = {'passing': CLI.ok, 'warning': CLI.warn, 'critical': CLI.error, 'error': CLI.error}
+    entries = []
+    if runs:
+        rows = history.runs(hostgroup, since, until, limit)
+        for row in rows:
+            worst = next((result for result in ('critical', 'error', 'warning', 'passing') if result in row['results']), None)
+            summary = ', '.join(f'{count} {result}' for result, count in sorted(row['results'].items()))
+            entries.append({'name': f'''run {row['run']:<6} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(row['started']))}  {row['hostgroup']}''',
+                            'status': status_codes.get(worst, CLI.warn),
+                            'status_text': worst or 'empty',
+                            'details': {'command': row['command'], 'hosts': row['hosts'], 'results': summary or 'none'}})
+    else:
+        rows = history.query(check, result, hostgroup, run_id, since, until, limit)
+        for row in rows:
+            entry = {'name': f'''run {row['run']:<6} {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(row['started']))}  {row['hostgroup']}  {row['hostname']}  {row['check_id']}''',
+                     'status': status_codes.get(row['result'], CLI.error),
+                     'status_text': row['result']}
+            if row['messages']:
+                entry['details'] = {'messages': '\n'.join(row['messages'])}
+            entries.append(entry)
+    if entries:
+        CLI.print_status(entries)
+    else:
+        CLI.print_info('No recorded results match.')
+    CLI.print_json(rows)
+
+
+def results_diff(history: RunHistory, run_id: int, other_run_id: int) -> None:
+    """Prints the checks whose results differ between two runs. Without `other_run_id`
+    the run gets compared with the previous run of its host group."""
+
+    status_codes = {'passing': CLI.ok, 'warning': CLI.warn, 'critical': CLI.error, 'error': CLI.error}
+    run_id, other_run_id, differences = history.diff(run_id, other_run_id)
+    CLI.print_info(f'Differences between run {run_id} and run {other_run_id}:')
+    if differences:
+        CLI.print_status([{'name': f'''{difference['check_id']}  {difference['hostname']}''',
+                           'status': status_codes.get(difference['after'], CLI.warn),
+                           'status_text': f'''{difference['before'] or 'none'} -> {difference['after'] or 'none'}'''} for difference in differences])
+    else:
+        CLI.print_ok('No differences.')
+    CLI.print_json({'run': run_id, 'other_run': other_run_id, 'differences': differences})
+
+
+def results_exporter(config: Config, directory: str) -> ResultExport:
+    """Returns the export for the dataset directory (None without directory)."""
+
+    if not directory:
+        return None
+    export = ResultExport(directory, config.export_format)
+    if export.fallback:
+        CLI.print_warn(f'Python module "pyarrow" is not available, the results are exported as CSV instead of {config.export_format}.')
+    return export
+
+
+def results_export(history: RunHistory,
+                   export: ResultExport,
+                   hostgroup: str,
+                   since: float,
+                   until: float) -> None:
+    """Appends the recorded runs matching the filters to the export (oldest first).
+    Runs already present in the dataset are skipped, so an export can be repeated.
+    All rows get written at once, which keeps the amount of part files low."""
+
+    runs = history.load(hostgroup, since, until)
+    exported = export.exported_runs()
+    skipped = [run_id for run_id in runs if run_id in exported]
+    runs = {run_id: recorded for run_id, recorded in runs.items() if run_id not in exported}
+    rows = [row for run_id, recorded in runs.items() for row in ResultExport.rows(recorded, run_id)]
+    files = export.write_rows(rows)
+    if runs:
+        CLI.print_ok(f'{len(runs)} runs ({len(rows)} results) exported to "{export.directory}" ({export.format}, {len(files)} file(s)).')
+    elif not skipped:
+        CLI.print_info('No recorded runs match.')
+    if skipped:
+        CLI.print_info(f'{len(skipped)} runs are already present in "{export.directory}" and have been skipped.')
+    CLI.print_json({'directory': export.directory, 'format': export.format, 'runs': list(runs), 'rows': len(rows),
+                    'files': files, 'skipped': skipped})
 
 
 def wanda_must_run(wanda: WandaStack, autostart: bool) -> None:
     """If requested, starts the Wanda stack and terminates with an error message,
     if Wanda is not operational."""
     
-    if not wanda.status:
+    if not wanda.operational:
         if autostart:
             if wanda_start(wanda):
                 return
@@ -938,6 +2276,231 @@ def wanda_must_run(wanda: WandaStack, autostart: bool) -> None:
         sys.exit(4)
                 
                 
+class Backends():
+    """Creates the Wanda and the hosts stack on first use, so commands only
+    touch the backends they need.
+    
+        - self._config (Config):  The tcsc configuration.
+        - self._wanda (WandaStack):  The Wanda stack (None until first use).
+        - self._hosts (HostsStack):  The hosts stack (None until first use).
+    """
+    
+    # Backends built by the daemon before it forks the workers (see `daemon_run()`).
+    prebuilt: Backends = None
+    
+    def __init__(self, config: Config) -> None:
+        self._config = config
+        self._wanda: WandaStack = None
+        self._hosts: HostsStack = None
+
+    @classmethod
+    def for_config(cls, config: Config) -> Backends:
+        """Returns the prebuilt backends, if they were built with the same configuration,
+        and new ones otherwise."""
+        
+        if cls.prebuilt and vars(cls.prebuilt._config) == vars(config):
+            return cls.prebuilt
+        return cls(config)
+
+    @property
+    def wanda(self) -> WandaStack:
+        if not self._wanda:
+            import_modules('tcsc_wanda')
+            with Timings.measure('wanda stack'):
+                self._wanda = WandaStack(self._config)
+        return self._wanda
+
+    @property
+    def hosts(self) -> HostsStack:
+        if not self._hosts:
+            import_modules('tcsc_hosts')
+            with Timings.measure('hosts stack'):
+                self._hosts = HostsStack(self._config)
+        return self._hosts
+
+
+def run_command(arguments: argparse.Namespace, config: Config, backends: Backends) -> None:
+    """Executes the requested command and terminates with the appropriate exit code."""
+
+    if arguments.selectors == 'wanda':
+        
+        # tcsc wanda start
+        if arguments.wanda_commands == 'start':
+            sys.exit(0) if wanda_start(backends.wanda) else sys.exit(4)
+
+        # tcsc wanda stop                
+        elif arguments.wanda_commands == 'stop':
+            sys.exit(0) if wanda_stop(backends.wanda) else sys.exit(4)
+        
+        # tcsc wanda status
+        elif arguments.wanda_commands == 'status':
+            sys.exit(0) if wanda_status(backends.wanda) else sys.exit(4)
+
+    elif arguments.selectors == 'hosts': 
+        
+        # tcsc hosts create ...
+        if arguments.host_commands == 'create':
+            wanda_must_run(backends.wanda, config.wanda_autostart)
+            if arguments.run_checks:
+                import_modules('tcsc_supportfiles')
+                sys.exit(0) if hosts_create_run_checks(backends.wanda, backends.hosts, ResultCache(config), FactStore(config),
+                                                       arguments.hostgroup, 
+                                                       arguments.envpairs, 
+                                                       arguments.supportfiles,
+                                                       arguments.failure_only
+                                                      ) else sys.exit(5)
+            sys.exit(0) if hosts_create(backends.hosts, arguments.hostgroup, arguments.envpairs, arguments.supportfiles, arguments.multi_host) else sys.exit(5)
+
+        # tcsc hosts start ...
+        if arguments.host_commands == 'start':
+            wanda_must_run(backends.wanda, config.wanda_autostart)
+            sys.exit(0) if hosts_start(backends.hosts, arguments.hostgroup) else sys.exit(5)
+                            
+        # tcsc hosts status ...
+        elif arguments.host_commands == 'status':
+            sys.exit(0) if hosts_status(backends.hosts, arguments.hostgroup, arguments.host_details) else sys.exit(5)
+
+        # tcsc hosts stop ...
+        elif arguments.host_commands == 'stop':
+                sys.exit(0) if hosts_stop(backends.hosts, arguments.hostgroup) else sys.exit(5)
+                
+        # tcsc hosts rescan ...
+        elif arguments.host_commands == 'rescan':
+                sys.exit(0) if hosts_rescan(backends.hosts, arguments.hostgroup, ResultCache(config), FactStore(config)) else sys.exit(5)
+                
+        # tcsc hosts remove ...
+        elif arguments.host_commands == 'remove':
+                sys.exit(0) if hosts_remove(backends.hosts, arguments.hostgroup) else sys.exit(5)
+
+        # tcsc hosts logs ...
+        elif arguments.host_commands == 'logs':
+            hosts_logs(backends.hosts, arguments.containername, arguments.last_lines, arguments.follow)
+            sys.exit(0) 
+    
+    elif arguments.selectors == 'checks': 
+        
+        # Checks get executed by Wanda, the catalog is read from the checks volume if possible.
+        if arguments.checks_commands == 'run' or not backends.wanda.local_catalog:
+            wanda_must_run(backends.wanda, config.wanda_autostart)
+                        
+        # tcsc checks list ...
+        if arguments.checks_commands == 'list':
+            checks_list(backends.wanda, arguments.check_details, arguments.show_all)
+            sys.exit(0)  
+            
+        # tcsc checks show ...
+        if arguments.checks_commands == 'show':
+            checks_show(backends.wanda, arguments.check)
+            sys.exit(0) 
+            
+        # tcsc checks evaluate ...
+        if arguments.checks_commands == 'evaluate':
+            import_modules('tcsc_supportfiles', 'tcsc_gatherers')
+            sys.exit(0) if checks_evaluate(backends.wanda,
+                                           arguments.supportfiles,
+                                           arguments.envpairs,
+                                           arguments.check_groups,
+                                           arguments.requested_checks,
+                                           arguments.show_skipped,
+                                           arguments.failure_only
+                                          ) else sys.exit(6)
+            
+        # tcsc checks run ...
+        if arguments.checks_commands == 'run':
+            results_cache = ResultCache(config)
+            results_cache.bypass = arguments.no_cache
+            fact_store = FactStore(config)
+            fact_store.bypass = arguments.no_cache
+            import_modules('tcsc_history', 'tcsc_export')
+            checkpoint = RunCheckpoint(config, arguments.resume)
+            if arguments.resume:
+                checkpoint.load()
+            sys.exit(0) if checks_run(backends.wanda, backends.hosts, results_cache, fact_store, RunHistory(config),
+                                      results_exporter(config, arguments.export),
+                                      checkpoint,
+                                      arguments.hostgroup, 
+                                      arguments.envpairs, 
+                                      arguments.check_groups,
+                                      arguments.requested_checks,
+                                      arguments.show_skipped,
+                                      arguments.failure_only,
+                                      arguments.wait_on_failure,
+                                      arguments.deadline
+                                     ) else sys.exit(6)
+
+    elif arguments.selectors == 'fleet':
+        
+        # tcsc fleet run ...
+        if arguments.fleet_commands == 'run':
+            wanda_must_run(backends.wanda, config.wanda_autostart)
+            import_modules('tcsc_fleet', 'tcsc_history', 'tcsc_export')
+            results_cache = ResultCache(config)
+            results_cache.bypass = arguments.no_cache
+            fact_store = FactStore(config)
+            fact_store.bypass = arguments.no_cache
+            sys.exit(0) if fleet_run(backends.wanda, backends.hosts, results_cache, fact_store, RunHistory(config),
+                                     results_exporter(config, arguments.export),
+                                     arguments.directory,
+                                     arguments.envpairs,
+                                     arguments.check_groups,
+                                     arguments.requested_checks,
+                                     arguments.parallel or config.fleet_parallel,
+                                     arguments.report_file,
+                                     arguments.failure_only,
+                                     arguments.keep,
+                                     arguments.deadline
+                                    ) else sys.exit(5)
+
+    elif arguments.selectors == 'results':
+        import_modules('tcsc_history')
+
+        # tcsc results query ...
+        if arguments.results_commands == 'query':
+            results_query(RunHistory(config),
+                          arguments.hostgroup,
+                          arguments.check,
+                          arguments.result,
+                          arguments.run_id,
+                          arguments.since,
+                          arguments.until,
+                          arguments.limit,
+                          arguments.runs)
+            sys.exit(0)
+
+        # tcsc results diff ...
+        if arguments.results_commands == 'diff':
+            results_diff(RunHistory(config), arguments.run_id, arguments.other_run_id)
+            sys.exit(0)
+
+        # tcsc results export ...
+        if arguments.results_commands == 'export':
+            import_modules('tcsc_export')
+            results_export(RunHistory(config),
+                           results_exporter(config, arguments.directory),
+                           arguments.hostgroup,
+                           arguments.since,
+                           arguments.until)
+            sys.exit(0)
+
+                
+
+
+def daemon_main() -> None:
+    """Entry point of a daemon worker: runs `main` with fresh timings."""
+    
+    global _start_time, _import_time
+    
+    _start_time = time.perf_counter()
+    _import_time = 0.0
+    Timings.phases = []
+    try:
+        main()
+    finally:
+        # Workers end with `os._exit()`, which skips the exit handlers.
+        atexit.unregister(Timings.print)
+        Timings.print()
+    
+
 def main() -> None:
         
     global json_output
@@ -945,107 +2508,75 @@ def main() -> None:
     signal.signal(signal.SIGINT, signal_handler)
 
     arguments = argument_parse()  
+    
+    Timings.enabled = arguments.timings
+    Timings.start = _start_time
+    Timings.add('imports', _import_time)
+    atexit.register(Timings.print)
+
+    # The daemon commands do not need a configuration.
+    if arguments.selectors == 'daemon':
+        CLI.no_color = arguments.plain_output
+        CLI.json = arguments.json_output
+        
+        # tcsc daemon run
+        if arguments.daemon_commands == 'run':
+            sys.exit(0) if daemon_run(arguments.idle_timeout, arguments.config_file) else sys.exit(7)
+            
+        # tcsc daemon status
+        elif arguments.daemon_commands == 'status':
+            sys.exit(0) if daemon_status() else sys.exit(7)
+            
+        # tcsc daemon stop
+        elif arguments.daemon_commands == 'stop':
+            sys.exit(0) if daemon_stop() else sys.exit(7)
 
     try:
-        config = Config(arguments.config_file)
+        with Timings.measure('config'):
+            config = Config(arguments.config_file)
         if arguments.plain_output:
             config.colored_output = False
+        if arguments.no_status_cache:
+            config.status_cache_ttl = 0
       
-        wanda = WandaStack(config)
+        backends = Backends.for_config(config)
 
         CLI.no_color = not config.colored_output
         CLI.json = arguments.json_output
 
-        if arguments.selectors == 'wanda':
-            
-            # tcsc wanda start
-            if arguments.wanda_commands == 'start':
-                sys.exit(0) if wanda_start(wanda) else sys.exit(4)
-
-            # tcsc wanda stop                
-            elif arguments.wanda_commands == 'stop':
-                sys.exit(0) if wanda_stop(wanda) else sys.exit(4)
-            
-            # tcsc wanda status
-            elif arguments.wanda_commands == 'status':
-                sys.exit(0) if wanda_status(wanda) else sys.exit(4)
+        with Timings.measure('command'):
+            run_command(arguments, config, backends)
 
-        elif arguments.selectors == 'hosts': 
-            
-            hosts = HostsStack(config)
-            
-            # tcsc hosts create ...
-            if arguments.host_commands == 'create':
-                wanda_must_run(wanda, config.wanda_autostart)
-                sys.exit(0) if hosts_create(hosts, arguments.hostgroup, arguments.envpairs, arguments.supportfiles) else sys.exit(5)
-
-            # tcsc hosts start ...
-            if arguments.host_commands == 'start':
-                wanda_must_run(wanda, config.wanda_autostart)
-                sys.exit(0) if hosts_start(hosts, arguments.hostgroup) else sys.exit(5)
-                                
-            # tcsc hosts status ...
-            elif arguments.host_commands == 'status':
-                sys.exit(0) if hosts_status(hosts, arguments.hostgroup, arguments.host_details) else sys.exit(5)
-
-            # tcsc hosts stop ...
-            elif arguments.host_commands == 'stop':
-                    sys.exit(0) if hosts_stop(hosts, arguments.hostgroup) else sys.exit(5)
-                    
-            # tcsc hosts rescan ...
-            elif arguments.host_commands == 'rescan':
-                    sys.exit(0) if hosts_rescan(hosts, arguments.hostgroup) else sys.exit(5)
-                    
-            # tcsc hosts remove ...
-            elif arguments.host_commands == 'remove':
-                    sys.exit(0) if hosts_remove(hosts, arguments.hostgroup) else sys.exit(5)
-
-            # tcsc hosts logs ...
-            elif arguments.host_commands == 'logs':
-                hosts_logs(hosts, arguments.containername, arguments.last_lines)
-                sys.exit(0) 
-        
-        elif arguments.selectors == 'checks': 
-            wanda_must_run(wanda, config.wanda_autostart)
-            hosts = HostsStack(config)
-                            
-            # tcsc checks list ...
-            if arguments.checks_commands == 'list':
-                checks_list(wanda, arguments.check_details, arguments.show_all)
-                sys.exit(0)  
-                
-            # tcsc checks show ...
-            if arguments.checks_commands == 'show':
-                checks_show(wanda, arguments.check)
-                sys.exit(0) 
-                
-            # tcsc checks run ...
-            if arguments.checks_commands == 'run':
-                sys.exit(0) if checks_run(wanda, hosts, 
-                                          arguments.hostgroup, 
-                                          arguments.envpairs, 
-                                          arguments.check_groups,
-                                          arguments.requested_checks,
-                                          arguments.show_skipped,
-                                          arguments.failure_only,
-                                          arguments.wait_on_failure
-                                         ) else sys.exit(6)
-    
     except ConfigException as err:
         CLI.print_fail(err, file=sys.stderr)
         sys.exit(1)
-    except docker.errors.DockerException as err:
+    except loaded('docker.errors', 'DockerException') as err:
         CLI.print_fail(f'Docker error: {err}', file=sys.stderr)
         sys.exit(2)
-    except WandaException as err:
+    except loaded('tcsc_wanda', 'WandaException') as err:
         CLI.print_fail(f'Wanda error: {err}', file=sys.stderr)
         sys.exit(3)
-    except HostsException as err:
+    except loaded('tcsc_hosts', 'HostsException') as err:
         CLI.print_fail(f'Hosts error: {err}', file=sys.stderr)
         sys.exit(5)
-    except CheckException as err:
+    except loaded('tcsc_wanda', 'CheckException') as err:
         CLI.print_fail(f'Check error: {err}', file=sys.stderr)
         sys.exit(6) 
+    except loaded('tcsc_fleet', 'FleetException') as err:
+        CLI.print_fail(f'Fleet error: {err}', file=sys.stderr)
+        sys.exit(5)
+    except loaded('tcsc_history', 'HistoryException') as err:
+        CLI.print_fail(f'History error: {err}', file=sys.stderr)
+        sys.exit(8)
+    except loaded('tcsc_export', 'ExportException') as err:
+        CLI.print_fail(f'Export error: {err}', file=sys.stderr)
+        sys.exit(8)
+    except CheckpointException as err:
+        CLI.print_fail(f'Checkpoint error: {err}', file=sys.stderr)
+        sys.exit(8)
+    except loaded('tcsc_gatherers', 'GathererException') as err:
+        CLI.print_fail(f'Gatherer error: {err}', file=sys.stderr)
+        sys.exit(6) 
     except BrokenPipeError:  # https://docs.python.org/3/library/signal.html#note-on-sigpipe
         devnull = os.open(os.devnull, os.O_WRONLY)
         os.dup2(devnull, sys.stdout.fileno())
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Contains classes to read the Trento check catalog directly from the checks volume.
+"""
+
+import concurrent.futures
+import hashlib
+import io
+import json
+import os
+import tarfile
+from typing import List, Dict, Any
+try:
+    import yaml
+except ImportError:   # the catalog gets requested from Wanda then
+    yaml = None
+
+
+class CheckCatalog():
+    """Represents the check catalog read from the YAML files in the volume of
+    the Trento checks container.
+
+    Wanda's HTTP catalog serializes every check definition on each call and
+    requires Wanda to run. The checks container only provides the volume and
+    may be stopped, Docker hands out the files nevertheless. The definitions
+    are converted into the format of the catalog API and cached in the state
+    directory by the hash of their YAML file, so only new or changed files get
+    parsed (in parallel). Files no longer present drop out of the cache.
+
+        - self._container (docker.Container):  The Trento checks container.
+        - self._path (str):  Directory of the check files inside the container.
+        - self._cache_file (str):  JSON file with the parsed definitions (hash -> definition).
+        - self._definitions (List[Dict[str, Any]]):  Loaded definitions.
+    """
+
+    # Files to parse before a process pool pays off.
+    _parallel_threshold = 16
+
+    def __init__(self, container: Any, state_dir: str, path: str = '/usr/share/trento/checks') -> None:
+        self._container = container
+        self._path = path
+        self._cache_file = os.path.join(state_dir, 'catalog.json')
+        self._definitions: List[Dict[str, Any]] = None
+
+    def definitions(self) -> List[Dict[str, Any]]:
+        """Returns the check definitions like the 'items' of the Wanda catalog, sorted by id."""
+
+        if self._definitions is None:
+            if not yaml:
+                raise CatalogException('Python module "yaml" is not available.')
+            files = self._read_files()
+            try:
+                with open(self._cache_file) as f:
+                    cache = json.load(f)
+            except (OSError, ValueError):
+                cache = {}
+
+            digests = {hashlib.sha256(content).hexdigest(): content for content in files.values()}
+            missing = {digest: content for digest, content in digests.items() if digest not in cache}
+            if len(missing) >= CheckCatalog._parallel_threshold:
+                with concurrent.futures.ProcessPoolExecutor() as executor:
+                    parsed = dict(zip(missing.keys(), executor.map(CheckCatalog.parse, missing.values(), chunksize=8)))
+            else:
+                parsed = {digest: CheckCatalog.parse(content) for digest, content in missing.items()}
+
+            if parsed or cache.keys() != digests.keys():
+                cache = {digest: parsed[digest] if digest in parsed else cache[digest] for digest in digests}
+                try:
+                    os.makedirs(os.path.dirname(self._cache_file), exist_ok=True)
+                    with open(f'{self._cache_file}.tmp', 'w') as f:
+                        json.dump(cache, f)
+                    os.replace(f'{self._cache_file}.tmp', self._cache_file)
+                except OSError:
+                    pass   # the definitions get parsed again next time
+            self._definitions = sorted((definition for definition in cache.values() if definition), key=lambda d: d['id'])
+        return self._definitions
+
+    def _read_files(self) -> Dict[str, bytes]:
+        """Returns the content of all YAML files of the checks directory (name -> content)."""
+
+        try:
+            stream, _ = self._container.get_archive(self._path)
+            archive = io.BytesIO(b''.join(stream))
+        except Exception as err:
+            raise CatalogException(f'Could not read "{self._path}" from "{self._container.name}": {err}')
+        files = {}
+        with tarfile.open(fileobj=archive) as tar:
+            for member in tar:
+                if member.isfile() and member.name.endswith(('.yaml', '.yml')):
+                    files[member.name] = tar.extractfile(member).read()
+        if not files:
+            raise CatalogException(f'No check files found in "{self._path}" of "{self._container.name}".')
+        return files
+
+    @staticmethod
+    def parse(content: bytes) -> Dict[str, Any]:
+        """Parses a check YAML file and returns the definition in the format of the
+        catalog API or None, if the file is no valid check (Wanda skips those too)."""
+
+        try:
+            document = yaml.load(content, Loader=getattr(yaml, 'CSafeLoader', yaml.SafeLoader))
+            return CheckCatalog.convert(document)
+        except (yaml.YAMLError, KeyError, TypeError, AttributeError, StopIteration):
+            return None
+
+    @staticmethod
+    def convert(document: Dict[str, Any]) -> Dict[str, Any]:
+        """Converts a check definition from its YAML structure into the one of the catalog API:
+        expectations get 'type' and 'expression', value conditions 'expression'."""
+
+        def expectation(entry: Dict[str, Any]) -> Dict[str, Any]:
+            expectation_type = next(key for key in ('expect', 'expect_same', 'expect_enum') if key in entry)
+            converted = {'name': entry['name'], 'type': expectation_type, 'expression': entry[expectation_type]}
+            for message in 'failure_message', 'warning_message':
+                if message in entry:
+                    converted[message] = entry[message]
+            return converted
+
+        definition = {'id': str(document['id']),
+                      'name': document['name'],
+                      'group': document['group'],
+                      'description': document['description'],
+                      'remediation': document['remediation'],
+                      'metadata': document.get('metadata') or {},
+                      'severity': document.get('severity', 'critical'),
+                      'premium': document.get('premium', False),
+                      'facts': [{'name': fact['name'], 'gatherer': fact['gatherer'], 'argument': fact.get('argument', '')}
+                                for fact in document['facts']],
+                      'values': [{'name': value['name'],
+                                  'default': value['default'],
+                                  'conditions': [{'value': condition['value'], 'expression': condition['when']}
+                                                 for condition in value.get('conditions') or []]}
+                                 for value in document.get('values') or []],
+                      'expectations': [expectation(entry) for entry in document['expectations']]}
+        if 'when' in document:
+            definition['when'] = document['when']
+        return definition
+
+
+class CatalogException(Exception):
+    pass
@@ -5,11 +5,13 @@
 Contains classes to handle CLI handling.
 """
 
-import shlex
+import contextlib
+import re
 import sys
 import termcolor
+import time
 import json
-from typing import TextIO, List, Dict
+from typing import TextIO, List, Dict, Iterator
        
                    
 class CLI():
@@ -21,6 +23,11 @@ class CLI():
     error = 2
     colors = {error: 'red', warn: 'yellow', ok: 'green'}
     json = False
+    
+    # A log line consists of the key-value pairs time, level and msg. Values
+    # can be quoted with backslash escapes inside.
+    _logline_pattern = re.compile(r' *\w+=("(?:[^"\\]|\\.)*"|[^\s"]*) +\w+=("(?:[^"\\]|\\.)*"|[^\s"]*) +\w+=("(?:[^"\\]|\\.)*"|[^\s"]*) *')
+    _logline_widths = [0, 0]
 
     @classmethod
     def print(cls, text: str = '', file: TextIO = sys.stdout) -> None:
@@ -171,24 +178,75 @@ class CLI():
             return
         
         loglines_processed = []
-        columns_width = [0, 0, 0]
         for line in loglines:
             entry = []
             try:
                 if not line:   # empty lines can happen
                     raise()
-                for index, component in enumerate(shlex.split(line)):
-                    _, value = component.split('=')
-                    columns_width[index] = max(len(value), columns_width[index])
-                    entry.append(value)
+                entry = cls.parse_logline(line)
+                for index, value in enumerate(entry[:2]):
+                    cls._logline_widths[index] = max(len(value), cls._logline_widths[index])
                 
             except:    # Some log entries (coming from commands running in the container) are not key-value pairs
                 entry = ['????-??-?? ??:??:??', 'output', line]
             loglines_processed.append(entry)    
             
         for line in loglines_processed:
-            print(termcolor.colored(f'{line[0]:<{columns_width[0]}}', 'grey', no_color=cls.no_color),
-                  termcolor.colored(f'{line[1]:<{columns_width[1]}}', level_color.get(line[1], 'white'), no_color=cls.no_color),
+            print(termcolor.colored(f'{line[0]:<{cls._logline_widths[0]}}', 'grey', no_color=cls.no_color),
+                  termcolor.colored(f'{line[1]:<{cls._logline_widths[1]}}', level_color.get(line[1], 'white'), no_color=cls.no_color),
                   termcolor.colored(line[2], level_color.get(line[1], 'white'), attrs=level_attributes.get(line[1], []), no_color=cls.no_color),
                   file=file
                  )
+
+    @classmethod
+    def parse_logline(cls, line: str) -> List[str]:
+        """Returns the three values of a log line consisting of key-value pairs.
+        Raises a ValueError, if the line is not made of exactly three pairs."""
+        
+        match = cls._logline_pattern.fullmatch(line)
+        if not match:
+            raise ValueError('Not a log line made of three key-value pairs.')
+        values = []
+        for value in match.groups():
+            if value.startswith('"'):
+                value = re.sub(r'\\(.)', r'\1', value[1:-1])
+            values.append(value)
+        return values
+
+
+class Timings():
+    """Collects the durations of named phases of a tcsc run for `--timings`."""
+
+    enabled = False
+    start = None
+    phases = []
+
+    @classmethod
+    @contextlib.contextmanager
+    def measure(cls, phase: str) -> Iterator[None]:
+        """Context manager measuring the duration of the enclosed block as the given phase."""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            cls.phases.append((phase, time.perf_counter() - start))
+
+    @classmethod
+    def add(cls, phase: str, duration: float) -> None:
+        cls.phases.append((phase, duration))
+
+    @classmethod
+    def print(cls, file: TextIO = sys.stderr) -> None:
+        """Prints the collected durations, if enabled."""
+
+        if not cls.enabled:
+            return
+        if cls.start is not None:
+            cls.phases.append(('total', time.perf_counter() - cls.start))
+        if CLI.json:
+            print(json.dumps({'timings': {phase: round(duration, 4) for phase, duration in cls.phases}}), file=file)
+            return
+        width = max([len(phase) for phase, _ in cls.phases] + [0])
+        for phase, duration in cls.phases:
+            print(termcolor.colored(f'{phase:<{width}}  {duration * 1000:8.1f} ms', 'grey', no_color=CLI.no_color), file=file)
@@ -54,6 +54,79 @@ class Config():
         - self.colored_output (bool):
             Determines if the output should be colored or not.
             default: true
+            
+        - self.state_dir (str):
+            Directory for persistent tcsc data (optional).
+            default: ${HOME}/.local/state/tcsc
+            
+        - self.pool_size (int):
+            Amount of idle, pre-started host containers to keep (optional).
+            default: 0 (no pool)
+            
+        - self.pool_idle_ttl (int):
+            Time in seconds after which an idle pooled host container gets removed (optional).
+            default: 3600
+            
+        - self.pool_memory_limit (str):
+            Docker memory limit for pooled host containers, e.g. "2g" (optional).
+            default: None (no limit)
+            
+        - self.image_cache_size (int):
+            Maximum amount of cached host images with processed supportfiles (optional).
+            With the cache `hosts create` waits for the processing and commits the containers.
+            default: 0 (disabled)
+            
+        - self.fact_store_ttl (int):
+            Time in seconds gathered facts of host containers are kept to evaluate
+            checks locally without gathering them again (optional).
+            default: 86400 (0 disables the store)
+            
+        - self.result_cache_ttl (int):
+            Time in seconds check results are reused for unchanged checks, hosts
+            and environments (optional).
+            default: 86400 (0 disables the cache)
+            
+        - self.history_ttl (int):
+            Time in seconds the results of `checks run` and `fleet run` are kept in
+            the run history (optional).
+            default: 31536000 (0 disables the history)
+
+        - self.checkpoint_ttl (int):
+            Time in seconds the checkpoint of an interrupted `checks run` is kept
+            to resume it (optional).
+            default: 604800 (7 days, 0 disables checkpoints)
+
+        - self.hedge_margin (int):
+            Seconds a Wanda execution may take longer than the 95th percentile of
+            its earlier executions, before a duplicate execution gets started and
+            the first one finishing is taken (optional).
+            default: 2 (0 disables hedging)
+
+        - self.check_timeout_factor (int):
+            Multiple of the 95th percentile of the earlier executions of a check
+            (or of checks with the same gatherer) used as timeout of its execution,
+            at least 5 seconds (optional).
+            default: 3 (0 uses `docker_timeout` for all checks)
+
+        - self.check_timeout_max (int):
+            Upper limit in seconds of the timeout derived by `check_timeout_factor`
+            (optional).
+            default: 300
+
+        - self.export_format (str):
+            Format of exported results: parquet, arrow (Arrow IPC) or csv (optional).
+            Parquet and Arrow IPC require the Python module `pyarrow`, without it
+            the results get exported as CSV.
+            default: parquet
+
+        - self.fleet_parallel (int):
+            Amount of host groups `fleet run` processes concurrently (optional).
+            default: 4
+            
+        - self.status_cache_ttl (int):
+            Time in seconds an operational Wanda status is reused without asking 
+            the Wanda containers again (optional).
+            default: 10 (0 disables the cache)
     """
 
     def __init__(self, configfile: str, create: bool = True) -> None:
@@ -67,15 +140,7 @@ class Config():
                                         if the config file is missing. Defaults to True.
         """
 
-        configfile = os.path.expandvars(os.path.expanduser(configfile))
-        
-        # If HOST_ROOT_FS is set, we run inside a container and all paths
-        # need to be prefixed with the content of that variable: the mount
-        # point of the host's rootfs.
-        # Also we have to prefix relative paths with the (imported) $PWD
-        # to be correct first.
-        if 'HOST_ROOT_FS' in os.environ:
-            configfile = f'''{os.getenv('HOST_ROOT_FS')}{configfile}''' if configfile.startswith('/') else  f'''{os.getenv('HOST_ROOT_FS')}/{os.getenv('PWD')}/{configfile}'''   
+        configfile = Config.hostfs_path(configfile)
       
         try:
             with open(configfile) as f:
@@ -90,9 +155,40 @@ class Config():
                 self.startup_timeout = config['startup_timeout']
                 self.wanda_autostart = config['wanda_autostart']
                 self.colored_output = config['colored_output']
+                self.state_dir = Config.hostfs_path(config.get('state_dir', '${HOME}/.local/state/tcsc'))
+                self.pool_size = abs(int(config.get('pool_size', 0)))
+                self.pool_idle_ttl = abs(int(config.get('pool_idle_ttl', 3600)))
+                self.pool_memory_limit = config.get('pool_memory_limit')
+                self.image_cache_size = abs(int(config.get('image_cache_size', 0)))
+                self.status_cache_ttl = abs(int(config.get('status_cache_ttl', 10)))
+                self.result_cache_ttl = abs(int(config.get('result_cache_ttl', 86400)))
+                self.fact_store_ttl = abs(int(config.get('fact_store_ttl', 86400)))
+                self.history_ttl = abs(int(config.get('history_ttl', 31536000)))
+                self.checkpoint_ttl = abs(int(config.get('checkpoint_ttl', 604800)))
+                self.hedge_margin = abs(int(config.get('hedge_margin', 2)))
+                self.check_timeout_factor = abs(int(config.get('check_timeout_factor', 3)))
+                self.check_timeout_max = abs(int(config.get('check_timeout_max', 300)))
+                self.export_format = config.get('export_format', 'parquet')
+                self.fleet_parallel = max(1, int(config.get('fleet_parallel', 4)))
         except Exception as err:
             raise ConfigException(f'Error accessing configuration: {err}')
 
+    @staticmethod
+    def hostfs_path(path: str) -> str:
+        """Expands variables and `~` in the given path and returns it.
+        
+        If HOST_ROOT_FS is set, we run inside a container and all paths
+        need to be prefixed with the content of that variable: the mount
+        point of the host's rootfs.
+        Also we have to prefix relative paths with the (imported) $PWD
+        to be correct first.
+        """
+        
+        path = os.path.expandvars(os.path.expanduser(path))
+        if 'HOST_ROOT_FS' in os.environ:
+            path = f'''{os.getenv('HOST_ROOT_FS')}{path}''' if path.startswith('/') else  f'''{os.getenv('HOST_ROOT_FS')}/{os.getenv('PWD')}/{path}'''   
+        return path
+
 
 class ConfigException(Exception):
     pass
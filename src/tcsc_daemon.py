@@ -0,0 +1,241 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Contains the tcsc daemon and the thin client talking to it over a Unix socket.
+
+The daemon has all modules imported and forks a worker for each request.
+The client passes its stdin, stdout and stderr together with the command line,
+the environment and the working directory, so the worker writes directly to
+the terminal of the client and returns the exit code.
+
+This module gets imported by the client before anything else, so the client
+part must only use light standard modules.
+"""
+
+
+import json
+import os
+import socket
+import struct
+import sys
+from typing import List, Dict, Any
+
+
+def socket_path() -> str:
+    """Returns the path of the daemon socket. It can be set with TCSC_SOCKET and
+    resides in the default state directory otherwise."""
+
+    path = os.path.expandvars(os.path.expanduser(os.getenv('TCSC_SOCKET', '${HOME}/.local/state/tcsc/tcsc.sock')))
+    if 'HOST_ROOT_FS' in os.environ and 'TCSC_SOCKET' not in os.environ:
+        path = f'''{os.getenv('HOST_ROOT_FS')}{path}'''
+    return path
+
+
+def _selector(argv: List[str]) -> str:
+    """Returns the first positional argument (the selector) of the command line."""
+
+    arguments = iter(argv)
+    for argument in arguments:
+        if argument in ['-c', '--config']:
+            next(arguments, None)
+        elif not argument.startswith('-'):
+            return argument
+    return None
+
+
+def _connect() -> socket.socket:
+    """Returns a socket connected to the daemon or None, if no daemon is listening."""
+
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(path)
+    except OSError:
+        connection.close()
+        return None
+    return connection
+
+
+def _send(connection: socket.socket, request: Dict[str, Any], fds: List[int] = []) -> None:
+    """Sends the request as length-prefixed JSON with the given file descriptors attached."""
+
+    data = json.dumps(request).encode()
+    data = struct.pack('!I', len(data)) + data
+    sent = socket.send_fds(connection, [data], fds)
+    connection.sendall(data[sent:])
+
+
+def _receive_int(connection: socket.socket) -> int:
+    """Receives a 4 byte integer. Returns None if the connection got closed."""
+
+    data = b''
+    while len(data) < 4:
+        chunk = connection.recv(4 - len(data))
+        if not chunk:
+            return None
+        data += chunk
+    return struct.unpack('!i', data)[0]
+
+
+def forward(argv: List[str]) -> int:
+    """Executes the command line by the daemon and returns the exit code.
+    If no daemon is running or the command manages the daemon itself,
+    None is returned and the command must be executed in-process."""
+
+    if _selector(argv) == 'daemon':
+        return None
+    connection = _connect()
+    if not connection:
+        return None
+
+    with connection:
+        try:
+            _send(connection, {'argv': argv, 'env': dict(os.environ), 'cwd': os.getcwd()}, [0, 1, 2])
+        except OSError:
+            return None
+        while True:
+            try:
+                exit_code = _receive_int(connection)
+            except KeyboardInterrupt:
+                connection.sendall(b'I')   # the worker raises SIGINT itself
+                continue
+            return 9 if exit_code is None else exit_code
+
+
+def status() -> Dict[str, Any]:
+    """Returns the status of the running daemon or None, if no daemon is running."""
+
+    connection = _connect()
+    if not connection:
+        return None
+    with connection:
+        _send(connection, {'control': 'status'})
+        length = _receive_int(connection)
+        data = b''
+        while length is not None and len(data) < length:
+            chunk = connection.recv(length - len(data))
+            if not chunk:
+                return None
+            data += chunk
+    return json.loads(data) if data else None
+
+
+def stop() -> bool:
+    """Requests the daemon to terminate and returns True if a daemon was running."""
+
+    connection = _connect()
+    if not connection:
+        return False
+    with connection:
+        _send(connection, {'control': 'stop'})
+        _receive_int(connection)
+    return True
+
+
+def serve(main: Any, idle_timeout: int = 0) -> None:
+    """Runs the daemon in the foreground until it gets stopped or, if `idle_timeout`
+    is set, no request arrived for that many seconds and no worker is active anymore. 
+    Each request is executed by calling `main` in a forked worker. Workers end 
+    without running the exit handlers, so `main` must clean up itself."""
+
+    import signal
+    import socketserver
+    import threading
+    import time
+
+    path = socket_path()
+    started = time.time()
+
+    class Handler(socketserver.BaseRequestHandler):
+
+        def handle(self) -> None:
+            """Runs in the forked worker."""
+
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            message, fds, _, _ = socket.recv_fds(self.request, 65536, 3)
+            length = struct.unpack('!I', message[:4])[0]
+            message = message[4:]
+            while len(message) < length:
+                message += self.request.recv(length - len(message))
+            request = json.loads(message)
+
+            if request.get('control') == 'status':
+                answer = json.dumps({'pid': os.getppid(), 'socket': path, 'uptime': int(time.time() - started)}).encode()
+                self.request.sendall(struct.pack('!i', len(answer)) + answer)
+                return
+            if request.get('control') == 'stop':
+                os.kill(os.getppid(), signal.SIGTERM)
+                self.request.sendall(struct.pack('!i', 0))
+                return
+
+            # Take over the terminal and the environment of the client.
+            for fd, target in zip(fds, [0, 1, 2]):
+                os.dup2(fd, target)
+                os.close(fd)
+            sys.stdout.reconfigure(line_buffering=os.isatty(1))   # keep the objects, they are bound as default arguments
+            sys.stderr.reconfigure(line_buffering=True)
+            os.environ.clear()
+            os.environ.update(request['env'])
+            try:
+                os.chdir(request['cwd'])
+            except OSError:
+                pass
+            sys.argv = [sys.argv[0]] + request['argv']
+
+            # An interrupted client asks us to interrupt the command.
+            def watch() -> None:
+                if self.request.recv(1) == b'I':
+                    os.kill(os.getpid(), signal.SIGINT)
+            threading.Thread(target=watch, daemon=True).start()
+
+            exit_code = 0
+            try:
+                main()
+            except SystemExit as exit:
+                if isinstance(exit.code, str):
+                    print(exit.code, file=sys.stderr)
+                exit_code = exit.code if isinstance(exit.code, int) else (0 if exit.code is None else 1)
+            except BaseException as err:
+                print(err, file=sys.stderr)
+                exit_code = 9
+            sys.stdout.flush()
+            sys.stderr.flush()
+            self.request.sendall(struct.pack('!i', exit_code))
+
+    class Server(socketserver.ForkingMixIn, socketserver.UnixStreamServer):
+        
+        idle = False
+        
+        def handle_timeout(self) -> None:
+            super().handle_timeout()   # reaps finished workers
+            if not self.active_children:
+                self.idle = True
+
+    if os.path.exists(path):
+        connection = _connect()
+        if connection:
+            connection.close()
+            raise DaemonException(f'A daemon is already listening on {path}.')
+        os.remove(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    signal.signal(signal.SIGTERM, lambda sig, frame: sys.exit(0))
+    sys.stdout.flush()
+    sys.stderr.flush()
+    with Server(path, Handler) as server:
+        try:
+            if idle_timeout:
+                server.timeout = idle_timeout
+                while not server.idle:
+                    server.handle_request()
+                    server.collect_children()   # `serve_forever()` reaps finished workers in `service_actions()`
+            else:
+                server.serve_forever()
+        finally:
+            os.remove(path)
+
+
+class DaemonException(Exception):
+    pass
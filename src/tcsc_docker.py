@@ -0,0 +1,34 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Contains the Docker client shared by all tcsc stacks.
+"""
+
+
+import docker
+from tcsc_cli import Timings
+
+
+_client: docker.DockerClient = None
+
+
+def docker_client(max_pool_size: int = 10) -> docker.DockerClient:
+    """Returns the Docker client of this process. The client gets created on first use
+    and keeps a pool of `max_pool_size` connections, which allows concurrent requests.
+    The low-level API is available as `docker_client().api`."""
+
+    global _client
+    
+    if not _client:
+        with Timings.measure('docker client'):
+            _client = docker.from_env(max_pool_size=max_pool_size)
+    return _client
+
+
+def release_connections() -> None:
+    """Closes the pooled connections of the client, if it has been created. Forked
+    processes must not share them, the client opens new ones on its next request."""
+
+    if _client:
+        _client.api.close()
@@ -0,0 +1,1538 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Contains classes to evaluate Trento checks locally.
+
+Wanda evaluates the `values` and `expectations` of a check with the scripting
+language Rhai (https://rhai.rs). `Rhai` implements the part of the language
+used by checks: literals, arrays, object maps, template strings, variables,
+operators, `if`, `switch`, loops, closures and the common methods of strings,
+arrays and maps. Anything else raises an `EvaluatorException`, so the caller
+can fall back to Wanda.
+
+`CheckEvaluator` evaluates a check definition against facts and creates the
+same responses as a Wanda execution, which can be processed by
+`rabbiteer.evaluate_check_results()`.
+"""
+
+
+import copy
+import math
+import re
+from typing import List, Dict, Any, Tuple
+
+
+class EvaluatorException(Exception):
+    pass
+
+
+class _Break(Exception):
+    def __init__(self, value: Any = None) -> None:
+        self.value = value
+
+
+class _Continue(Exception):
+    pass
+
+
+class _Return(Exception):
+    def __init__(self, value: Any = None) -> None:
+        self.value = value
+
+
+class Closure():
+    """Represents a Rhai closure or function with the scopes it has been created in."""
+
+    def __init__(self, params: List[str], body: Tuple, scopes: List[Dict[str, Any]]) -> None:
+        self.params = params
+        self.body = body
+        self.scopes = scopes
+
+
+class Rhai():
+    """Parses and evaluates Rhai scripts. Parsed scripts are cached, so evaluating
+    the same expression again only walks the syntax tree."""
+
+    _cache: Dict[str, Tuple] = {}
+
+    _token_pattern = re.compile(r'''
+        (?P<space>\s+|//[^\n]*|/\*.*?\*/)
+        |(?P<number>0x[0-9a-fA-F_]+|0o[0-7_]+|0b[01_]+|\d[\d_]*(?:\.\d[\d_]*(?![\w.]))?(?:[eE][+-]?\d+)?)
+        |(?P<string>"(?:[^"\\]|\\.|\\\n)*")
+        |(?P<char>'(?:[^'\\]|\\.)+')
+        |(?P<template>`)
+        |(?P<name>[A-Za-z_]\w*)
+        |(?P<op>\.\.=|\.\.|\?\.|\?\?|\?\[|=>|::|\*\*=|<<=|>>=|\*\*|==|!=|<=|>=|&&|\|\||\+=|-=|\*=|/=|%=|&=|\|=|\^=|<<|>>|[-+*/%=<>!&|^()\[\]{},;:.#?@])
+        ''', re.VERBOSE | re.DOTALL)
+
+    _escapes = {'n': '\n', 't': '\t', 'r': '\r', '0': '\0', '\\': '\\', '"': '"', "'": "'", '`': '`', '$': '$'}
+
+    # Binary operators with their precedence (higher binds stronger).
+    _precedence = {'||': 30, '|': 30, '^': 30,
+                   '&&': 60, '&': 60,
+                   '==': 90, '!=': 90,
+                   'in': 110,
+                   '<': 130, '<=': 130, '>': 130, '>=': 130,
+                   '??': 135,
+                   '..': 140, '..=': 140,
+                   '+': 150, '-': 150,
+                   '*': 180, '/': 180, '%': 180,
+                   '**': 190,
+                   '<<': 210, '>>': 210}
+
+    _assignments = ['=', '+=', '-=', '*=', '/=', '%=', '**=', '&=', '|=', '^=', '<<=', '>>=']
+
+    _keywords = ['let', 'const', 'if', 'else', 'for', 'in', 'while', 'loop', 'do', 'until',
+                 'break', 'continue', 'return', 'fn', 'switch', 'true', 'false']
+
+    @classmethod
+    def evaluate(cls, script: str, variables: Dict[str, Any] = None) -> Any:
+        """Evaluates the script with the given variables and returns the result."""
+
+        tree = cls._cache.get(script)
+        if tree is None:
+            tree = cls._cache[script] = _Parser(cls._tokenize(script)).parse()
+        interpreter = _Interpreter(dict(variables or {}))
+        try:
+            return interpreter.run(tree)
+        except _Return as result:
+            return result.value
+        except (_Break, _Continue):
+            raise EvaluatorException('Break or continue outside of a loop.')
+        except RecursionError:
+            raise EvaluatorException('Script nested too deeply.')
+
+    @classmethod
+    def template(cls, text: str, variables: Dict[str, Any] = None) -> str:
+        """Evaluates the text as template string (`${...}` gets replaced)."""
+
+        if '${' not in text:
+            return text
+        return cls.evaluate('`' + text.replace('`', '\\`') + '`', variables)
+
+    @classmethod
+    def _tokenize(cls, script: str) -> List[Tuple[str, Any]]:
+        """Returns the list of tokens as tuples of kind and value."""
+
+        tokens = []
+        position = 0
+        while position < len(script):
+            match = cls._token_pattern.match(script, position)
+            if not match:
+                raise EvaluatorException(f'Unexpected character {script[position]!r} at position {position}.')
+            kind, text = match.lastgroup, match.group()
+            position = match.end()
+            if kind == 'space':
+                continue
+            if kind == 'number':
+                text = text.replace('_', '')
+                if text[:2] in ('0x', '0o', '0b'):
+                    tokens.append(('number', int(text, {'0x': 16, '0o': 8, '0b': 2}[text[:2]])))
+                elif '.' in text or 'e' in text or 'E' in text:
+                    tokens.append(('number', float(text)))
+                else:
+                    tokens.append(('number', int(text)))
+            elif kind == 'string':
+                tokens.append(('string', cls._unescape(text[1:-1])))
+            elif kind == 'char':
+                tokens.append(('string', cls._unescape(text[1:-1])))
+            elif kind == 'template':
+                parts, position = cls._template(script, position)
+                tokens.append(('template', parts))
+            elif kind == 'name':
+                tokens.append(('keyword' if text in cls._keywords else 'name', text))
+            else:
+                tokens.append(('op', text))
+        tokens.append(('end', None))
+        return tokens
+
+    @classmethod
+    def _unescape(cls, text: str) -> str:
+        """Resolves the escape sequences of a string literal."""
+
+        if '\\' not in text:
+            return text
+        result = []
+        index = 0
+        while index < len(text):
+            char = text[index]
+            if char != '\\':
+                result.append(char)
+                index += 1
+                continue
+            escape = text[index + 1]
+            if escape == '\n':   # line continuation
+                index += 2
+                while index < len(text) and text[index] in ' \t':
+                    index += 1
+                continue
+            if escape in 'xuU':
+                length = {'x': 2, 'u': 4, 'U': 8}[escape]
+                result.append(chr(int(text[index + 2:index + 2 + length], 16)))
+                index += 2 + length
+                continue
+            if escape not in cls._escapes:
+                raise EvaluatorException(f'Unknown escape sequence \\{escape}.')
+            result.append(cls._escapes[escape])
+            index += 2
+        return ''.join(result)
+
+    @classmethod
+    def _template(cls, script: str, position: int) -> Tuple[List[Any], int]:
+        """Splits a template string starting at position into text and parsed expressions.
+        Returns the parts and the position after the closing backtick."""
+
+        parts = []
+        text = []
+        while True:
+            if position >= len(script):
+                raise EvaluatorException('Unterminated template string.')
+            char = script[position]
+            if char == '`':
+                break
+            if char == '\\' and position + 1 < len(script):
+                text.append(cls._unescape(script[position:position + 2]))
+                position += 2
+                continue
+            if script.startswith('${', position):
+                depth = 1
+                end = position + 2
+                while depth:
+                    if end >= len(script):
+                        raise EvaluatorException('Unterminated interpolation in template string.')
+                    depth += {'{': 1, '}': -1}.get(script[end], 0)
+                    end += 1
+                if text:
+                    parts.append(''.join(text))
+                    text = []
+                parts.append(_Parser(cls._tokenize(script[position + 2:end - 1])).parse())
+                position = end
+                continue
+            text.append(char)
+            position += 1
+        if text:
+            parts.append(''.join(text))
+        return parts, position + 1
+
+
+class _Parser():
+    """Creates the syntax tree (nested tuples) from the tokens."""
+
+    def __init__(self, tokens: List[Tuple[str, Any]]) -> None:
+        self.tokens = tokens
+        self.position = 0
+
+    def parse(self) -> Tuple:
+        return self._statements('end')
+
+    # Helpers
+
+    def _peek(self, offset: int = 0) -> Tuple[str, Any]:
+        return self.tokens[min(self.position + offset, len(self.tokens) - 1)]
+
+    def _next(self) -> Tuple[str, Any]:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def _is(self, value: Any, kind: str = None) -> bool:
+        token = self._peek()
+        return token[1] == value and (kind is None or token[0] == kind) and token[0] not in ('string', 'number', 'template')
+
+    def _accept(self, value: Any) -> bool:
+        if self._is(value):
+            self.position += 1
+            return True
+        return False
+
+    def _expect(self, value: Any) -> None:
+        if not self._accept(value):
+            raise EvaluatorException(f'Expected {value!r}, got {self._peek()[1]!r}.')
+
+    def _name(self) -> str:
+        kind, value = self._next()
+        if kind != 'name':
+            raise EvaluatorException(f'Expected a name, got {value!r}.')
+        return value
+
+    # Statements
+
+    def _statements(self, terminator: str) -> Tuple:
+        """Parses statements until the terminator (closing brace or end).
+        The value of a block is the value of its last statement, if it is not
+        terminated by a semicolon."""
+
+        statements = []
+        has_value = False
+        while True:
+            if terminator == 'end' and self._peek()[0] == 'end':
+                break
+            if terminator == '}' and self._is('}'):
+                break
+            if self._accept(';'):
+                has_value = False
+                continue
+            statement, needs_semicolon = self._statement()
+            statements.append(statement)
+            has_value = True
+            if self._accept(';'):
+                has_value = False
+            elif needs_semicolon and not (self._is('}') or self._peek()[0] == 'end'):
+                raise EvaluatorException(f'Expected ";", got {self._peek()[1]!r}.')
+        return ('block', statements, has_value)
+
+    def _statement(self) -> Tuple[Tuple, bool]:
+        """Returns the statement and if it requires a terminating semicolon."""
+
+        kind, value = self._peek()
+        if kind == 'keyword':
+            if value in ('let', 'const'):
+                self._next()
+                name = self._name()
+                expression = self._expression() if self._accept('=') else ('unit',)
+                return ('let', name, expression), True
+            if value == 'fn':
+                self._next()
+                name = self._name()
+                params = self._params('(', ')')
+                self._expect('{')
+                body = self._statements('}')
+                self._expect('}')
+                return ('fn', name, params, body), False
+            if value in ('for', 'while', 'loop', 'do', 'if', 'switch'):
+                return self._expression(), False
+            if value == 'break':
+                self._next()
+                expression = None if self._is(';') or self._is('}') or self._peek()[0] == 'end' else self._expression()
+                return ('break', expression), True
+            if value == 'continue':
+                self._next()
+                return ('continue',), True
+            if value == 'return':
+                self._next()
+                expression = None if self._is(';') or self._is('}') or self._peek()[0] == 'end' else self._expression()
+                return ('return', expression), True
+        if self._is('{'):
+            return self._expression(), False
+        return self._expression(), True
+
+    def _params(self, opening: str, closing: str) -> List[str]:
+        self._expect(opening)
+        params = []
+        while not self._accept(closing):
+            params.append(self._name())
+            if not self._is(closing):
+                self._expect(',')
+        return params
+
+    # Expressions
+
+    def _expression(self, min_precedence: int = 0) -> Tuple:
+        left = self._unary()
+        while True:
+            kind, operator = self._peek()
+            if kind == 'op' and operator in Rhai._assignments and min_precedence == 0:
+                self._next()
+                if left[0] not in ('var', 'prop', 'index'):
+                    raise EvaluatorException('Invalid assignment target.')
+                left = ('assign', operator, left, self._expression())
+                continue
+            if kind not in ('op', 'keyword') or operator not in Rhai._precedence:
+                return left
+            precedence = Rhai._precedence[operator]
+            if precedence < min_precedence or (precedence == min_precedence and operator != '**'):
+                return left
+            self._next()
+            right = self._expression(precedence if operator == '**' else precedence + 1)
+            if operator == '&&':
+                left = ('and', left, right)
+            elif operator == '||':
+                left = ('or', left, right)
+            elif operator == '??':
+                left = ('coalesce', left, right)
+            elif operator in ('..', '..='):
+                left = ('range', left, right, operator == '..=')
+            else:
+                left = ('binary', operator, left, right)
+
+    def _unary(self) -> Tuple:
+        if self._is('-', 'op') or self._is('+', 'op') or self._is('!', 'op'):
+            operator = self._next()[1]
+            return ('unary', operator, self._unary())
+        return self._postfix(self._primary())
+
+    def _postfix(self, expression: Tuple) -> Tuple:
+        while True:
+            if self._is('.') or self._is('?.'):
+                safe = self._next()[1] == '?.'
+                name = self._next()[1]
+                if self._is('('):
+                    expression = ('method', expression, name, self._arguments(), safe)
+                else:
+                    expression = ('prop', expression, name, safe)
+            elif self._is('[') or self._is('?['):
+                safe = self._next()[1] == '?['
+                index = self._expression()
+                self._expect(']')
+                expression = ('index', expression, index, safe)
+            elif self._is('(') and expression[0] in ('closure', 'index', 'prop'):
+                expression = ('invoke', expression, self._arguments())
+            else:
+                return expression
+
+    def _arguments(self) -> List[Tuple]:
+        self._expect('(')
+        arguments = []
+        while not self._accept(')'):
+            arguments.append(self._expression())
+            if not self._is(')'):
+                self._expect(',')
+        return arguments
+
+    def _primary(self) -> Tuple:
+        kind, value = self._next()
+        if kind == 'number':
+            return ('value', value)
+        if kind == 'string':
+            return ('value', value)
+        if kind == 'template':
+            return ('template', value)
+        if kind == 'name':
+            if self._is('('):
+                return ('call', value, self._arguments())
+            if self._is('::'):
+                raise EvaluatorException(f'Namespaces are not supported ({value}::).')
+            return ('var', value)
+        if kind == 'keyword':
+            if value in ('true', 'false'):
+                return ('value', value == 'true')
+            if value == 'if':
+                return self._if()
+            if value == 'switch':
+                return self._switch()
+            if value == 'while':
+                condition = self._expression()
+                return ('while', condition, self._block())
+            if value == 'loop':
+                return ('loop', self._block())
+            if value == 'do':
+                body = self._block()
+                if self._accept('while'):
+                    return ('do', body, self._expression(), False)
+                self._expect('until')
+                return ('do', body, self._expression(), True)
+            if value == 'for':
+                return self._for()
+        if kind == 'op':
+            if value == '(':
+                if self._accept(')'):
+                    return ('value', None)
+                expression = self._expression()
+                self._expect(')')
+                return expression
+            if value == '[':
+                items = []
+                while not self._accept(']'):
+                    items.append(self._expression())
+                    if not self._is(']'):
+                        self._expect(',')
+                return ('array', items)
+            if value == '#':
+                self._expect('{')
+                items = []
+                while not self._accept('}'):
+                    key_kind, key = self._next()
+                    if key_kind not in ('name', 'string', 'keyword'):
+                        raise EvaluatorException(f'Invalid object map key {key!r}.')
+                    self._expect(':')
+                    items.append((key, self._expression()))
+                    if not self._is('}'):
+                        self._expect(',')
+                return ('map', items)
+            if value == '{':
+                block = self._statements('}')
+                self._expect('}')
+                return block
+            if value == '|':
+                params = []
+                while not self._accept('|'):
+                    params.append(self._name())
+                    if not self._is('|'):
+                        self._expect(',')
+                return ('closure', params, self._expression())
+            if value == '||':
+                return ('closure', [], self._expression())
+        raise EvaluatorException(f'Unexpected token {value!r}.')
+
+    def _block(self) -> Tuple:
+        self._expect('{')
+        block = self._statements('}')
+        self._expect('}')
+        return block
+
+    def _if(self) -> Tuple:
+        condition = self._expression()
+        then = self._block()
+        otherwise = None
+        if self._accept('else'):
+            otherwise = self._if() if self._accept('if') else self._block()
+        return ('if', condition, then, otherwise)
+
+    def _switch(self) -> Tuple:
+        subject = self._expression()
+        self._expect('{')
+        cases = []
+        default = None
+        while not self._accept('}'):
+            if self._is('_') or self._peek() == ('name', '_'):
+                self._next()
+                self._expect('=>')
+                default = self._statement()[0]
+            else:
+                # Patterns bind stronger than `|`, which separates the alternatives of an arm.
+                patterns = [self._expression(Rhai._precedence['|'] + 1)]
+                while self._accept('|'):
+                    patterns.append(self._expression(Rhai._precedence['|'] + 1))
+                condition = self._expression() if self._accept('if') else None
+                self._expect('=>')
+                cases.append((patterns, condition, self._statement()[0]))
+            self._accept(',')
+        return ('switch', subject, cases, default)
+
+    def _for(self) -> Tuple:
+        if self._accept('('):
+            variable = self._name()
+            self._expect(',')
+            counter = self._name()
+            self._expect(')')
+        else:
+            variable, counter = self._name(), None
+        self._expect('in')
+        iterable = self._expression()
+        return ('for', variable, counter, iterable, self._block())
+
+
+class _Interpreter():
+    """Walks the syntax tree. Rhai values are mapped to Python values: () is None,
+    integers are int, floating point numbers float, arrays lists, object maps dicts."""
+
+    _type_names = {type(None): '()', bool: 'bool', int: 'i64', float: 'f64', str: 'string',
+                   list: 'array', dict: 'map', Closure: 'Fn', range: 'range'}
+
+    def __init__(self, variables: Dict[str, Any]) -> None:
+        self.scopes: List[Dict[str, Any]] = [variables]
+        self.functions: Dict[str, Closure] = {}
+
+    def run(self, tree: Tuple) -> Any:
+        return self.eval(tree)
+
+    def eval(self, node: Tuple) -> Any:
+        return getattr(self, f'_eval_{node[0]}')(node)
+
+    # Literals and variables
+
+    def _eval_value(self, node: Tuple) -> Any:
+        return node[1]
+
+    def _eval_template(self, node: Tuple) -> str:
+        return ''.join(part if isinstance(part, str) else self._to_string(self.eval(part)) for part in node[1])
+
+    def _eval_array(self, node: Tuple) -> list:
+        return [self.eval(item) for item in node[1]]
+
+    def _eval_map(self, node: Tuple) -> dict:
+        return {key: self.eval(value) for key, value in node[1]}
+
+    def _eval_var(self, node: Tuple) -> Any:
+        for scope in reversed(self.scopes):
+            if node[1] in scope:
+                return scope[node[1]]
+        if node[1] in self.functions:
+            return self.functions[node[1]]
+        raise EvaluatorException(f'Variable not found: {node[1]}')
+
+    def _eval_closure(self, node: Tuple) -> Closure:
+        return Closure(node[1], node[2], list(self.scopes))
+
+    def _eval_fn(self, node: Tuple) -> None:
+        self.functions[node[1]] = Closure(node[2], node[3], self.scopes[:1])
+
+    def _eval_let(self, node: Tuple) -> None:
+        value = self.eval(node[2])
+        self.scopes[-1][node[1]] = copy.deepcopy(value) if isinstance(value, (list, dict)) else value
+
+    # Blocks and control flow
+
+    def _eval_block(self, node: Tuple) -> Any:
+        self.scopes.append({})
+        try:
+            value = None
+            for statement in node[1]:
+                value = self.eval(statement)
+            return value if node[2] else None
+        finally:
+            self.scopes.pop()
+
+    def _eval_if(self, node: Tuple) -> Any:
+        if self._bool(self.eval(node[1]), 'if'):
+            return self.eval(node[2])
+        return self.eval(node[3]) if node[3] else None
+
+    def _eval_switch(self, node: Tuple) -> Any:
+        subject = self.eval(node[1])
+        for patterns, condition, body in node[2]:
+            for pattern in patterns:
+                if pattern[0] == 'range':
+                    matched = self._contains(self.eval(pattern), subject)
+                else:
+                    matched = self._equal(subject, self.eval(pattern))
+                if matched and (condition is None or self._bool(self.eval(condition), 'switch')):
+                    return self.eval(body)
+        return self.eval(node[3]) if node[3] else None
+
+    def _eval_while(self, node: Tuple) -> Any:
+        while self._bool(self.eval(node[1]), 'while'):
+            try:
+                self.eval(node[2])
+            except _Break as result:
+                return result.value
+            except _Continue:
+                pass
+        return None
+
+    def _eval_loop(self, node: Tuple) -> Any:
+        while True:
+            try:
+                self.eval(node[1])
+            except _Break as result:
+                return result.value
+            except _Continue:
+                pass
+
+    def _eval_do(self, node: Tuple) -> Any:
+        while True:
+            try:
+                self.eval(node[1])
+            except _Break as result:
+                return result.value
+            except _Continue:
+                pass
+            if self._bool(self.eval(node[2]), 'do') == node[3]:
+                return None
+
+    def _eval_for(self, node: Tuple) -> Any:
+        iterable = self.eval(node[3])
+        if isinstance(iterable, dict):
+            raise EvaluatorException('Object maps cannot be iterated, use keys() or values().')
+        if not isinstance(iterable, (list, str, range)):
+            raise EvaluatorException(f'Cannot iterate over {self._type(iterable)}.')
+        for counter, item in enumerate(list(iterable)):
+            self.scopes.append({node[1]: item})
+            if node[2]:
+                self.scopes[-1][node[2]] = counter
+            try:
+                self.eval(node[4])
+            except _Break as result:
+                return result.value
+            except _Continue:
+                pass
+            finally:
+                self.scopes.pop()
+        return None
+
+    def _eval_break(self, node: Tuple) -> None:
+        raise _Break(self.eval(node[1]) if node[1] else None)
+
+    def _eval_continue(self, node: Tuple) -> None:
+        raise _Continue()
+
+    def _eval_return(self, node: Tuple) -> None:
+        raise _Return(self.eval(node[1]) if node[1] else None)
+
+    # Operators
+
+    def _eval_unary(self, node: Tuple) -> Any:
+        value = self.eval(node[2])
+        if node[1] == '!':
+            return not self._bool(value, '!')
+        if not self._is_number(value):
+            raise EvaluatorException(f'Function not found: {node[1]} ({self._type(value)})')
+        return -value if node[1] == '-' else value
+
+    def _eval_and(self, node: Tuple) -> bool:
+        return self._bool(self.eval(node[1]), '&&') and self._bool(self.eval(node[2]), '&&')
+
+    def _eval_or(self, node: Tuple) -> bool:
+        return self._bool(self.eval(node[1]), '||') or self._bool(self.eval(node[2]), '||')
+
+    def _eval_coalesce(self, node: Tuple) -> Any:
+        value = self.eval(node[1])
+        return self.eval(node[2]) if value is None else value
+
+    def _eval_range(self, node: Tuple) -> range:
+        start, end = self.eval(node[1]), self.eval(node[2])
+        if not (self._is_int(start) and self._is_int(end)):
+            raise EvaluatorException('Ranges require integers.')
+        return range(start, end + 1 if node[3] else end)
+
+    def _eval_binary(self, node: Tuple) -> Any:
+        return self._operate(node[1], self.eval(node[2]), self.eval(node[3]))
+
+    def _operate(self, operator: str, left: Any, right: Any) -> Any:
+        if operator == '==':
+            return self._equal(left, right)
+        if operator == '!=':
+            return not self._equal(left, right)
+        if operator == 'in':
+            return self._contains(right, left)
+        if operator in ('<', '<=', '>', '>='):
+            if (self._is_number(left) and self._is_number(right)) or (isinstance(left, str) and isinstance(right, str)):
+                return {'<': left < right, '<=': left <= right, '>': left > right, '>=': left >= right}[operator]
+            return False
+        if operator == '+':
+            if isinstance(left, str) or isinstance(right, str):
+                return self._to_string(left) + self._to_string(right)
+            if isinstance(left, list) and isinstance(right, list):
+                return left + right
+            if isinstance(left, dict) and isinstance(right, dict):
+                return {**left, **right}
+        if operator in ('&', '|', '^') and isinstance(left, bool) and isinstance(right, bool):
+            return {'&': left and right, '|': left or right, '^': left != right}[operator]
+        if operator in ('+', '-', '*', '/', '%', '**') and self._is_number(left) and self._is_number(right):
+            if operator == '+':
+                return self._int(left + right)
+            if operator == '-':
+                return self._int(left - right)
+            if operator == '*':
+                return self._int(left * right)
+            if operator == '/':
+                if right == 0 and self._is_int(left) and self._is_int(right):
+                    raise EvaluatorException('Division by zero.')
+                if self._is_int(left) and self._is_int(right):
+                    return int(left / right) if (left < 0) != (right < 0) else left // right
+                return left / right if right else math.copysign(math.inf, left) if left else math.nan
+            if operator == '%':
+                if right == 0 and self._is_int(right):
+                    raise EvaluatorException('Division by zero.')
+                return math.fmod(left, right) if isinstance(left, float) or isinstance(right, float) else int(math.fmod(left, right))
+            if operator == '**':
+                if self._is_int(left) and self._is_int(right):
+                    if right < 0:
+                        raise EvaluatorException('Negative exponent for integer power.')
+                    return self._int(left ** right)
+                return float(left) ** right
+        if operator in ('&', '|', '^', '<<', '>>') and self._is_int(left) and self._is_int(right):
+            return {'&': lambda: left & right, '|': lambda: left | right, '^': lambda: left ^ right,
+                    '<<': lambda: self._int(left << right), '>>': lambda: left >> right}[operator]()
+        if operator == '*' and isinstance(left, str) and self._is_int(right):
+            return left * right
+        raise EvaluatorException(f'Function not found: {operator} ({self._type(left)}, {self._type(right)})')
+
+    # Member access
+
+    def _eval_prop(self, node: Tuple) -> Any:
+        target = self.eval(node[1])
+        if target is None and node[3]:
+            return None
+        return self._property(target, node[2])
+
+    def _property(self, target: Any, name: str) -> Any:
+        if isinstance(target, dict):
+            return target.get(name)
+        if name in ('len', 'is_empty') or name in _Builtins.properties:
+            return _Builtins.call(self, name, [target])
+        raise EvaluatorException(f'Property {name} not found for {self._type(target)}.')
+
+    def _eval_index(self, node: Tuple) -> Any:
+        target = self.eval(node[1])
+        if target is None and node[3]:
+            return None
+        return self._index(target, self.eval(node[2]))
+
+    def _index(self, target: Any, index: Any) -> Any:
+        if isinstance(target, dict):
+            if not isinstance(index, str):
+                raise EvaluatorException(f'Object maps can only be indexed by strings, not {self._type(index)}.')
+            return target.get(index)
+        if isinstance(target, (list, str)):
+            if not self._is_int(index):
+                raise EvaluatorException(f'Arrays and strings can only be indexed by integers, not {self._type(index)}.')
+            if not -len(target) <= index < len(target):
+                raise EvaluatorException(f'Index {index} out of bounds.')
+            return target[index]
+        if self._is_int(target) and self._is_int(index):   # bit field
+            return bool(target >> index & 1)
+        raise EvaluatorException(f'Cannot index {self._type(target)}.')
+
+    def _eval_assign(self, node: Tuple) -> None:
+        operator, target, value = node[1], node[2], self.eval(node[3])
+        if operator != '=':
+            value = self._operate(operator[:-1], self.eval(target), value)
+        self._store(target, value)
+        return None
+
+    def _store(self, target: Tuple, value: Any) -> None:
+        """Writes the value to the variable, property or index described by target."""
+
+        if target[0] == 'var':
+            for scope in reversed(self.scopes):
+                if target[1] in scope:
+                    scope[target[1]] = value
+                    return
+            raise EvaluatorException(f'Variable not found: {target[1]}')
+        if target[0] == 'prop':
+            container = self.eval(target[1])
+            if not isinstance(container, dict):
+                raise EvaluatorException(f'Cannot set property {target[2]} of {self._type(container)}.')
+            container[target[2]] = value
+            return
+        if target[0] == 'index':
+            container, index = self.eval(target[1]), self.eval(target[2])
+            if isinstance(container, str):
+                if not isinstance(value, str) or len(value) != 1:
+                    raise EvaluatorException('Only characters can be assigned to a string index.')
+                self._index(container, index)
+                index = index % len(container)
+                self._store(target[1], container[:index] + value + container[index + 1:])
+                return
+            if isinstance(container, list):
+                self._index(container, index)
+            elif not isinstance(container, dict):
+                raise EvaluatorException(f'Cannot index {self._type(container)}.')
+            container[index] = value
+            return
+        raise EvaluatorException('Invalid assignment target.')
+
+    # Calls
+
+    def _eval_call(self, node: Tuple) -> Any:
+        name = node[1]
+        arguments = [self.eval(argument) for argument in node[2]]
+        for scope in reversed(self.scopes):
+            if isinstance(scope.get(name), Closure):
+                return self.call(scope[name], arguments)
+        if name in self.functions:
+            return self.call(self.functions[name], arguments)
+        if name == 'Fn':
+            if len(arguments) != 1 or arguments[0] not in self.functions:
+                raise EvaluatorException(f'Function not found: {arguments}')
+            return self.functions[arguments[0]]
+        return _Builtins.call(self, name, arguments)
+
+    def _eval_invoke(self, node: Tuple) -> Any:
+        function = self.eval(node[1])
+        if not isinstance(function, Closure):
+            raise EvaluatorException(f'{self._type(function)} is not a function.')
+        return self.call(function, [self.eval(argument) for argument in node[2]])
+
+    def _eval_method(self, node: Tuple) -> Any:
+        target = self.eval(node[1])
+        if target is None and node[4]:
+            return None
+        name = node[2]
+        arguments = [self.eval(argument) for argument in node[3]]
+        if name == 'call' and isinstance(target, Closure):
+            return self.call(target, arguments)
+        if name in self.functions:
+            return self.call(self.functions[name], [target] + arguments)
+        if isinstance(target, str) and name in _Builtins.string_mutators:
+            value, result = _Builtins.call(self, name, [target] + arguments)
+            if node[1][0] in ('var', 'prop', 'index'):
+                self._store(node[1], value)
+            return result
+        return _Builtins.call(self, name, [target] + arguments)
+
+    def call(self, function: Closure, arguments: List[Any]) -> Any:
+        """Calls the closure or function with the given arguments."""
+
+        if len(arguments) != len(function.params):
+            raise EvaluatorException(f'Function expects {len(function.params)} arguments, got {len(arguments)}.')
+        scopes, self.scopes = self.scopes, function.scopes + [dict(zip(function.params, arguments))]
+        try:
+            return self.eval(function.body)
+        except _Return as result:
+            return result.value
+        finally:
+            self.scopes = scopes
+
+    # Value helpers
+
+    def _type(self, value: Any) -> str:
+        return self._type_names.get(type(value), type(value).__name__)
+
+    @staticmethod
+    def _is_int(value: Any) -> bool:
+        return isinstance(value, int) and not isinstance(value, bool)
+
+    @staticmethod
+    def _is_number(value: Any) -> bool:
+        return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+    @staticmethod
+    def _int(value: Any) -> Any:
+        if isinstance(value, int) and not -2**63 <= value < 2**63:
+            raise EvaluatorException('Arithmetic overflow.')
+        return value
+
+    def _bool(self, value: Any, context: str) -> bool:
+        if not isinstance(value, bool):
+            raise EvaluatorException(f'Boolean expected for {context}, got {self._type(value)}.')
+        return value
+
+    def _equal(self, left: Any, right: Any) -> bool:
+        if self._is_number(left) and self._is_number(right):
+            return left == right
+        if type(left) != type(right):
+            return False
+        if isinstance(left, list):
+            return len(left) == len(right) and all(self._equal(a, b) for a, b in zip(left, right))
+        if isinstance(left, dict):
+            return left.keys() == right.keys() and all(self._equal(left[key], right[key]) for key in left)
+        return left == right
+
+    def _contains(self, container: Any, item: Any) -> bool:
+        if isinstance(container, list):
+            return any(self._equal(element, item) for element in container)
+        if isinstance(container, dict):
+            return isinstance(item, str) and item in container
+        if isinstance(container, str):
+            if not isinstance(item, str):
+                raise EvaluatorException(f'Function not found: contains (string, {self._type(item)})')
+            return item in container
+        if isinstance(container, range):
+            return self._is_int(item) and item in container
+        raise EvaluatorException(f'Function not found: contains ({self._type(container)})')
+
+    def _to_string(self, value: Any) -> str:
+        if value is None:
+            return ''
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+        if isinstance(value, float):
+            return repr(value) if not value.is_integer() or abs(value) >= 1e16 else f'{value:.1f}'
+        if isinstance(value, str):
+            return value
+        if isinstance(value, list):
+            return '[' + ', '.join(self._debug(item) for item in value) + ']'
+        if isinstance(value, dict):
+            return '#{' + ', '.join(f'"{key}": {self._debug(item)}' for key, item in value.items()) + '}'
+        if isinstance(value, Closure):
+            return 'Fn(<closure>)'
+        return str(value)
+
+    def _debug(self, value: Any) -> str:
+        if isinstance(value, str):
+            return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        if value is None:
+            return '()'
+        return self._to_string(value)
+
+
+class _Builtins():
+    """The functions and methods of the Rhai standard packages used by checks."""
+
+    # Methods modifying a string in place. They return the new string and the result.
+    string_mutators = ['trim', 'trim_start', 'trim_end', 'make_upper', 'make_lower', 'replace', 'crop', 'truncate', 'pad', 'clear', 'remove', 'pop']
+
+    # Methods which can be used as properties.
+    properties = ['len', 'is_empty', 'tag']
+
+    @classmethod
+    def call(cls, interpreter: _Interpreter, name: str, arguments: List[Any]) -> Any:
+        if not arguments:
+            raise EvaluatorException(f'Function not found: {name} ()')
+        target = arguments[0]
+        if isinstance(target, str):
+            kind = 'string'
+        elif isinstance(target, list):
+            kind = 'array'
+        elif isinstance(target, dict):
+            kind = 'map'
+        elif interpreter._is_number(target):
+            kind = 'number'
+        else:
+            kind = 'any'
+        for candidate in (f'_{kind}_{name}', f'_any_{name}'):
+            function = getattr(cls, candidate, None)
+            if function:
+                try:
+                    return function(interpreter, *arguments)
+                except TypeError as err:
+                    raise EvaluatorException(f'Function not found: {name} ({", ".join(interpreter._type(a) for a in arguments)}): {err}')
+        raise EvaluatorException(f'Function not found: {name} ({", ".join(interpreter._type(a) for a in arguments)})')
+
+    @staticmethod
+    def _call(interpreter: _Interpreter, function: Any, *arguments: Any) -> Any:
+        if isinstance(function, str):
+            return _Builtins.call(interpreter, function, list(arguments))
+        if not isinstance(function, Closure):
+            raise EvaluatorException(f'{interpreter._type(function)} is not a function.')
+        return interpreter.call(function, list(arguments)[:len(function.params)])
+
+    # Any type
+
+    @staticmethod
+    def _any_type_of(interpreter: _Interpreter, value: Any) -> str:
+        return interpreter._type(value) if not isinstance(value, str) else 'string'
+
+    @staticmethod
+    def _any_to_string(interpreter: _Interpreter, value: Any) -> str:
+        return interpreter._to_string(value) if value is not None else '()'
+
+    @staticmethod
+    def _any_to_debug(interpreter: _Interpreter, value: Any) -> str:
+        return interpreter._debug(value)
+
+    @staticmethod
+    def _any_print(interpreter: _Interpreter, value: Any) -> None:
+        return None
+
+    _any_debug = _any_print
+
+    @staticmethod
+    def _any_is_string(interpreter: _Interpreter, value: Any) -> bool:
+        return isinstance(value, str)
+
+    @staticmethod
+    def _any_is_int(interpreter: _Interpreter, value: Any) -> bool:
+        return interpreter._is_int(value)
+
+    @staticmethod
+    def _any_is_float(interpreter: _Interpreter, value: Any) -> bool:
+        return isinstance(value, float)
+
+    @staticmethod
+    def _any_is_array(interpreter: _Interpreter, value: Any) -> bool:
+        return isinstance(value, list)
+
+    @staticmethod
+    def _any_is_map(interpreter: _Interpreter, value: Any) -> bool:
+        return isinstance(value, dict)
+
+    @staticmethod
+    def _any_is_unit(interpreter: _Interpreter, value: Any) -> bool:
+        return value is None
+
+    @staticmethod
+    def _any_is_bool(interpreter: _Interpreter, value: Any) -> bool:
+        return isinstance(value, bool)
+
+    @staticmethod
+    def _any_is_def_var(interpreter: _Interpreter, name: str) -> bool:
+        return any(name in scope for scope in interpreter.scopes)
+
+    @staticmethod
+    def _any_parse_int(interpreter: _Interpreter, text: Any, radix: int = 10) -> int:
+        if not isinstance(text, str):
+            raise EvaluatorException(f'Function not found: parse_int ({interpreter._type(text)})')
+        try:
+            return int(text.strip(), radix)
+        except ValueError:
+            raise EvaluatorException(f'Error parsing integer number: {text!r}')
+
+    @staticmethod
+    def _any_parse_float(interpreter: _Interpreter, text: Any) -> float:
+        if not isinstance(text, str):
+            raise EvaluatorException(f'Function not found: parse_float ({interpreter._type(text)})')
+        try:
+            return float(text.strip())
+        except ValueError:
+            raise EvaluatorException(f'Error parsing floating-point number: {text!r}')
+
+    @staticmethod
+    def _any_parse_json(interpreter: _Interpreter, text: str) -> Any:
+        import json
+        try:
+            return json.loads(text)
+        except ValueError as err:
+            raise EvaluatorException(f'Error parsing JSON: {err}')
+
+    # Numbers
+
+    @staticmethod
+    def _number_to_int(interpreter: _Interpreter, value: Any) -> int:
+        return int(value)
+
+    @staticmethod
+    def _number_to_float(interpreter: _Interpreter, value: Any) -> float:
+        return float(value)
+
+    @staticmethod
+    def _number_abs(interpreter: _Interpreter, value: Any) -> Any:
+        return abs(value)
+
+    @staticmethod
+    def _number_sign(interpreter: _Interpreter, value: Any) -> int:
+        return (value > 0) - (value < 0)
+
+    @staticmethod
+    def _number_floor(interpreter: _Interpreter, value: Any) -> float:
+        return float(math.floor(value))
+
+    @staticmethod
+    def _number_ceiling(interpreter: _Interpreter, value: Any) -> float:
+        return float(math.ceil(value))
+
+    @staticmethod
+    def _number_round(interpreter: _Interpreter, value: Any) -> float:
+        return float(math.floor(abs(value) + 0.5) * (1 if value >= 0 else -1))
+
+    @staticmethod
+    def _number_min(interpreter: _Interpreter, left: Any, right: Any) -> Any:
+        return min(left, right)
+
+    @staticmethod
+    def _number_max(interpreter: _Interpreter, left: Any, right: Any) -> Any:
+        return max(left, right)
+
+    @staticmethod
+    def _number_is_zero(interpreter: _Interpreter, value: Any) -> bool:
+        return value == 0
+
+    # Strings (mutators return the new string and the result)
+
+    @staticmethod
+    def _string_len(interpreter: _Interpreter, text: str) -> int:
+        return len(text)
+
+    @staticmethod
+    def _string_is_empty(interpreter: _Interpreter, text: str) -> bool:
+        return not text
+
+    @staticmethod
+    def _string_contains(interpreter: _Interpreter, text: str, part: str) -> bool:
+        return interpreter._contains(text, part)
+
+    @staticmethod
+    def _string_starts_with(interpreter: _Interpreter, text: str, part: str) -> bool:
+        return text.startswith(part)
+
+    @staticmethod
+    def _string_ends_with(interpreter: _Interpreter, text: str, part: str) -> bool:
+        return text.endswith(part)
+
+    @staticmethod
+    def _string_index_of(interpreter: _Interpreter, text: str, part: str, start: int = 0) -> int:
+        return text.find(part, start if start >= 0 else max(len(text) + start, 0))
+
+    @staticmethod
+    def _string_sub_string(interpreter: _Interpreter, text: str, start: Any, length: int = None) -> str:
+        if isinstance(start, range):
+            return text[start.start:start.stop]
+        if start < 0:
+            start = max(len(text) + start, 0)
+        return text[start:] if length is None else text[start:start + max(length, 0)]
+
+    @staticmethod
+    def _string_split(interpreter: _Interpreter, text: str, separator: Any = None, limit: int = None) -> List[str]:
+        if separator is None:
+            return text.split()
+        if interpreter._is_int(separator):
+            return [text[:separator], text[separator:]]
+        if limit is not None:
+            return text.split(separator, max(limit - 1, 0))
+        return text.split(separator)
+
+    @staticmethod
+    def _string_split_rev(interpreter: _Interpreter, text: str, separator: str, limit: int = None) -> List[str]:
+        parts = text.rsplit(separator, max(limit - 1, 0)) if limit is not None else text.split(separator)
+        return list(reversed(parts))
+
+    @staticmethod
+    def _string_to_upper(interpreter: _Interpreter, text: str) -> str:
+        return text.upper()
+
+    @staticmethod
+    def _string_to_lower(interpreter: _Interpreter, text: str) -> str:
+        return text.lower()
+
+    @staticmethod
+    def _string_chars(interpreter: _Interpreter, text: str) -> List[str]:
+        return list(text)
+
+    @staticmethod
+    def _string_bytes(interpreter: _Interpreter, text: str) -> int:
+        return len(text.encode())
+
+    @staticmethod
+    def _string_to_int(interpreter: _Interpreter, text: str) -> int:
+        return _Builtins._any_parse_int(interpreter, text)
+
+    @staticmethod
+    def _string_to_float(interpreter: _Interpreter, text: str) -> float:
+        return _Builtins._any_parse_float(interpreter, text)
+
+    @staticmethod
+    def _string_trim(interpreter: _Interpreter, text: str) -> Tuple[str, None]:
+        return text.strip(), None
+
+    @staticmethod
+    def _string_trim_start(interpreter: _Interpreter, text: str) -> Tuple[str, None]:
+        return text.lstrip(), None
+
+    @staticmethod
+    def _string_trim_end(interpreter: _Interpreter, text: str) -> Tuple[str, None]:
+        return text.rstrip(), None
+
+    @staticmethod
+    def _string_make_upper(interpreter: _Interpreter, text: str) -> Tuple[str, None]:
+        return text.upper(), None
+
+    @staticmethod
+    def _string_make_lower(interpreter: _Interpreter, text: str) -> Tuple[str, None]:
+        return text.lower(), None
+
+    @staticmethod
+    def _string_replace(interpreter: _Interpreter, text: str, old: str, new: str) -> Tuple[str, None]:
+        return text.replace(old, new), None
+
+    @staticmethod
+    def _string_crop(interpreter: _Interpreter, text: str, start: int, length: int = None) -> Tuple[str, None]:
+        return _Builtins._string_sub_string(interpreter, text, start, length), None
+
+    @staticmethod
+    def _string_truncate(interpreter: _Interpreter, text: str, length: int) -> Tuple[str, None]:
+        return text[:max(length, 0)], None
+
+    @staticmethod
+    def _string_pad(interpreter: _Interpreter, text: str, length: int, character: str) -> Tuple[str, None]:
+        return text + character * max(length - len(text), 0), None
+
+    @staticmethod
+    def _string_clear(interpreter: _Interpreter, text: str) -> Tuple[str, None]:
+        return '', None
+
+    @staticmethod
+    def _string_remove(interpreter: _Interpreter, text: str, part: str) -> Tuple[str, None]:
+        return text.replace(part, ''), None
+
+    @staticmethod
+    def _string_pop(interpreter: _Interpreter, text: str) -> Tuple[str, Any]:
+        return (text[:-1], text[-1]) if text else (text, None)
+
+    # Arrays
+
+    @staticmethod
+    def _array_len(interpreter: _Interpreter, array: list) -> int:
+        return len(array)
+
+    @staticmethod
+    def _array_is_empty(interpreter: _Interpreter, array: list) -> bool:
+        return not array
+
+    @staticmethod
+    def _array_contains(interpreter: _Interpreter, array: list, item: Any) -> bool:
+        return interpreter._contains(array, item)
+
+    @staticmethod
+    def _array_index_of(interpreter: _Interpreter, array: list, item: Any, start: int = 0) -> int:
+        for index in range(start, len(array)):
+            if isinstance(item, Closure):
+                if _Builtins._call(interpreter, item, array[index], index) is True:
+                    return index
+            elif interpreter._equal(array[index], item):
+                return index
+        return -1
+
+    @staticmethod
+    def _array_get(interpreter: _Interpreter, array: list, index: int) -> Any:
+        return array[index] if -len(array) <= index < len(array) else None
+
+    @staticmethod
+    def _array_push(interpreter: _Interpreter, array: list, item: Any) -> None:
+        array.append(item)
+
+    _array_append = _array_push
+
+    @staticmethod
+    def _array_pop(interpreter: _Interpreter, array: list) -> Any:
+        return array.pop() if array else None
+
+    @staticmethod
+    def _array_shift(interpreter: _Interpreter, array: list) -> Any:
+        return array.pop(0) if array else None
+
+    @staticmethod
+    def _array_insert(interpreter: _Interpreter, array: list, index: int, item: Any) -> None:
+        array.insert(index, item)
+
+    @staticmethod
+    def _array_remove(interpreter: _Interpreter, array: list, index: int) -> Any:
+        return array.pop(index) if -len(array) <= index < len(array) else None
+
+    @staticmethod
+    def _array_clear(interpreter: _Interpreter, array: list) -> None:
+        array.clear()
+
+    @staticmethod
+    def _array_reverse(interpreter: _Interpreter, array: list) -> None:
+        array.reverse()
+
+    @staticmethod
+    def _array_sort(interpreter: _Interpreter, array: list, comparer: Any = None) -> None:
+        import functools
+        if comparer is None:
+            try:
+                array.sort()
+            except TypeError:
+                raise EvaluatorException('Array elements cannot be compared.')
+        else:
+            array.sort(key=functools.cmp_to_key(lambda a, b: _Builtins._call(interpreter, comparer, a, b)))
+
+    @staticmethod
+    def _array_dedup(interpreter: _Interpreter, array: list) -> None:
+        index = 1
+        while index < len(array):
+            if interpreter._equal(array[index], array[index - 1]):
+                del array[index]
+            else:
+                index += 1
+
+    @staticmethod
+    def _array_filter(interpreter: _Interpreter, array: list, function: Any) -> list:
+        return [item for index, item in enumerate(array) if _Builtins._call(interpreter, function, item, index) is True]
+
+    @staticmethod
+    def _array_retain(interpreter: _Interpreter, array: list, function: Any) -> list:
+        removed = [item for index, item in enumerate(array) if _Builtins._call(interpreter, function, item, index) is not True]
+        array[:] = [item for item in array if not any(item is other for other in removed)]
+        return removed
+
+    @staticmethod
+    def _array_map(interpreter: _Interpreter, array: list, function: Any) -> list:
+        return [_Builtins._call(interpreter, function, item, index) for index, item in enumerate(array)]
+
+    @staticmethod
+    def _array_reduce(interpreter: _Interpreter, array: list, function: Any, initial: Any = None) -> Any:
+        result = initial
+        for index, item in enumerate(array):
+            result = _Builtins._call(interpreter, function, result, item, index)
+        return result
+
+    @staticmethod
+    def _array_all(interpreter: _Interpreter, array: list, function: Any) -> bool:
+        return all(_Builtins._call(interpreter, function, item, index) is True for index, item in enumerate(array))
+
+    @staticmethod
+    def _array_some(interpreter: _Interpreter, array: list, function: Any) -> bool:
+        return any(_Builtins._call(interpreter, function, item, index) is True for index, item in enumerate(array))
+
+    @staticmethod
+    def _array_none(interpreter: _Interpreter, array: list, function: Any) -> bool:
+        return not _Builtins._array_some(interpreter, array, function)
+
+    @staticmethod
+    def _array_find(interpreter: _Interpreter, array: list, function: Any) -> Any:
+        for index, item in enumerate(array):
+            if _Builtins._call(interpreter, function, item, index) is True:
+                return item
+        return None
+
+    @staticmethod
+    def _array_find_map(interpreter: _Interpreter, array: list, function: Any) -> Any:
+        for index, item in enumerate(array):
+            result = _Builtins._call(interpreter, function, item, index)
+            if result is not None:
+                return result
+        return None
+
+    @staticmethod
+    def _array_extract(interpreter: _Interpreter, array: list, start: Any, length: int = None) -> list:
+        if isinstance(start, range):
+            return array[start.start:start.stop]
+        if start < 0:
+            start = max(len(array) + start, 0)
+        return array[start:] if length is None else array[start:start + max(length, 0)]
+
+    @staticmethod
+    def _array_split(interpreter: _Interpreter, array: list, index: int) -> list:
+        tail = array[index:]
+        del array[index:]
+        return tail
+
+    @staticmethod
+    def _array_zip(interpreter: _Interpreter, array: list, other: list, function: Any) -> list:
+        return [_Builtins._call(interpreter, function, a, b) for a, b in zip(array, other)]
+
+    @staticmethod
+    def _array_max(interpreter: _Interpreter, array: list) -> Any:
+        return max(array) if array else None
+
+    @staticmethod
+    def _array_min(interpreter: _Interpreter, array: list) -> Any:
+        return min(array) if array else None
+
+    # Object maps
+
+    @staticmethod
+    def _map_len(interpreter: _Interpreter, map: dict) -> int:
+        return len(map)
+
+    @staticmethod
+    def _map_is_empty(interpreter: _Interpreter, map: dict) -> bool:
+        return not map
+
+    @staticmethod
+    def _map_contains(interpreter: _Interpreter, map: dict, key: str) -> bool:
+        return interpreter._contains(map, key)
+
+    @staticmethod
+    def _map_keys(interpreter: _Interpreter, map: dict) -> List[str]:
+        return list(map.keys())
+
+    @staticmethod
+    def _map_values(interpreter: _Interpreter, map: dict) -> list:
+        return list(map.values())
+
+    @staticmethod
+    def _map_get(interpreter: _Interpreter, map: dict, key: str) -> Any:
+        return map.get(key)
+
+    @staticmethod
+    def _map_set(interpreter: _Interpreter, map: dict, key: str, value: Any) -> None:
+        map[key] = value
+
+    @staticmethod
+    def _map_remove(interpreter: _Interpreter, map: dict, key: str) -> Any:
+        return map.pop(key, None)
+
+    @staticmethod
+    def _map_clear(interpreter: _Interpreter, map: dict) -> None:
+        map.clear()
+
+    @staticmethod
+    def _map_mixin(interpreter: _Interpreter, map: dict, other: dict) -> None:
+        map.update(other)
+
+    @staticmethod
+    def _map_filter(interpreter: _Interpreter, map: dict, function: Any) -> dict:
+        return {key: value for key, value in map.items() if _Builtins._call(interpreter, function, key, value) is True}
+
+    @staticmethod
+    def _map_to_json(interpreter: _Interpreter, map: dict) -> str:
+        import json
+        return json.dumps(map)
+
+
+class CheckEvaluator():
+    """Evaluates Trento checks (the catalog definition) against facts like Wanda.
+
+    The definition is expected as in the catalog of the Wanda API (expectations
+    with 'type' and 'expression', conditions with 'expression'), the keys of the
+    check YAML files ('expect', 'expect_same', 'expect_enum', 'when') are accepted
+    too. The facts of an agent are given as dictionary with the fact name as key
+    and a dictionary as value, which contains either 'value' or 'message'
+    (gathering error), like the facts of a Wanda execution response.
+    """
+
+    _results = ['passing', 'warning', 'critical']
+
+    @staticmethod
+    def expectation(expectation: Dict[str, Any]) -> Tuple[str, str]:
+        """Returns type and expression of the expectation."""
+
+        if 'type' in expectation:
+            return expectation['type'], expectation['expression']
+        for expectation_type in 'expect', 'expect_same', 'expect_enum':
+            if expectation_type in expectation:
+                return expectation_type, expectation[expectation_type]
+        raise EvaluatorException(f'''Expectation {expectation.get('name')} has no known type.''')
+
+    @classmethod
+    def evaluate(cls, check: Dict[str, Any], facts: Dict[str, Dict[str, Dict[str, Any]]], environment: Dict[str, str]) -> List[Dict[str, Any]]:
+        """Returns the list of execution responses for the check and the facts of the agents
+        (agent id -> facts) in the same way `Rabbiteer.execute_checks()` does: one response for
+        all agents for `expect_same` checks and one response per agent otherwise. Raises an
+        EvaluatorException if the check cannot be evaluated locally or its `when` condition
+        is false for the environment (Wanda does not execute it then)."""
+
+        if 'when' in check and Rhai.evaluate(check['when'], {'env': environment}) is not True:
+            raise EvaluatorException(f'''Check does not apply to the environment (when: {check['when']}).''')
+        if cls.expectation(check['expectations'][0])[0] == 'expect_same':
+            return [cls._execution(check, facts, environment)]
+        return [cls._execution(check, {agent_id: agent_facts}, environment) for agent_id, agent_facts in facts.items()]
+
+    @classmethod
+    def _values(cls, check: Dict[str, Any], environment: Dict[str, str]) -> Dict[str, Any]:
+        """Evaluates the values of the check for the environment."""
+
+        values = {}
+        for value in check.get('values') or []:
+            values[value['name']] = value.get('default')
+            for condition in value.get('conditions') or []:
+                if Rhai.evaluate(condition.get('expression', condition.get('when')), {'env': environment}) is True:
+                    values[value['name']] = condition['value']
+                    break
+        return values
+
+    @classmethod
+    def _execution(cls, check: Dict[str, Any], facts: Dict[str, Dict[str, Dict[str, Any]]], environment: Dict[str, str]) -> Dict[str, Any]:
+        """Evaluates the check for the given agents and returns the execution response."""
+
+        severity = check.get('severity') or 'critical'
+        values = cls._values(check, environment)
+        value_list = [{'name': name, 'value': value} for name, value in values.items()]
+        agents_check_results = []
+        returns: Dict[str, List[Any]] = {}
+        agent_results = []
+
+        for agent_id, agent_facts in facts.items():
+            fact_list = [{'check_id': check['id'], 'name': name, **fact} for name, fact in agent_facts.items()]
+            if any('value' not in fact for fact in agent_facts.values()):
+                agents_check_results.append({'agent_id': agent_id, 'facts': fact_list,
+                                             'type': 'fact_gathering_error', 'message': 'Fact gathering error occurred'})
+                agent_results.append('critical')
+                continue
+
+            scope = {'facts': {name: fact['value'] for name, fact in agent_facts.items()}, 'values': values, 'env': environment}
+            evaluations = []
+            agent_result = 'passing'
+            for expectation in check['expectations']:
+                expectation_type, expression = cls.expectation(expectation)
+                value = Rhai.evaluate(expression, scope)
+                evaluation = {'name': expectation['name'], 'type': expectation_type, 'return_value': value}
+                if expectation_type == 'expect':
+                    if not isinstance(value, bool):
+                        raise EvaluatorException(f'''Expectation {expectation['name']} did not return a boolean.''')
+                    if not value:
+                        agent_result = severity
+                        if expectation.get('failure_message'):
+                            evaluation['failure_message'] = Rhai.template(expectation['failure_message'], scope)
+                elif expectation_type == 'expect_enum':
+                    if value not in cls._results:
+                        raise EvaluatorException(f'''Expectation {expectation['name']} returned an invalid value: {value!r}''')
+                    agent_result = cls._worst(agent_result, value)
+                    message = {'critical': 'failure_message', 'warning': 'warning_message'}.get(value)
+                    if message and expectation.get(message):
+                        evaluation['failure_message'] = Rhai.template(expectation[message], scope)
+                else:
+                    returns.setdefault(expectation['name'], []).append(value)
+                evaluations.append(evaluation)
+            agents_check_results.append({'agent_id': agent_id, 'facts': fact_list, 'values': value_list,
+                                         'expectation_evaluations': evaluations})
+            agent_results.append(agent_result)
+
+        # `expect_same` expectations are fulfilled if all agents returned the same value.
+        expectation_results = []
+        for name, values_returned in returns.items():
+            same = all(value == values_returned[0] and type(value) == type(values_returned[0]) for value in values_returned)
+            expectation_results.append({'name': name, 'type': 'expect_same', 'result': same})
+            if not same:
+                agent_results.append(severity)
+
+        result = 'passing'
+        for agent_result in agent_results:
+            result = cls._worst(result, agent_result)
+        return {'execution_id': 'local',
+                'status': 'completed',
+                'result': result,
+                'targets': [{'agent_id': agent_id, 'checks': [check['id']]} for agent_id in facts],
+                'check_results': [{'check_id': check['id'],
+                                   'result': result,
+                                   'expectation_results': expectation_results,
+                                   'agents_check_results': agents_check_results}]}
+
+    @classmethod
+    def _worst(cls, first: str, second: str) -> str:
+        return first if cls._results.index(first) >= cls._results.index(second) else second
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Contains classes to export check results in a flat, columnar format for analytics.
+"""
+
+import csv
+import datetime
+import glob
+import os
+import threading
+import uuid
+from typing import List, Dict, Any, Set
+from tcsc_config import *
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:   # the results get exported as CSV then
+    pyarrow = None
+
+
+class ResultExport():
+    """Represents a dataset directory the results of check runs get appended to.
+
+    Each run becomes one row per check and host with a flat schema (see `columns`),
+    so analytics tools can scan the results of many runs without parsing the nested
+    JSON output. Parquet and Arrow IPC files cannot be appended, so every write adds
+    part files (`part-<time>-<id>.parquet|.arrow`) of at most `max_rows` rows and the
+    directory is read as one dataset. Without the Python module `pyarrow` the rows
+    are appended to `results.csv` in the directory instead.
+
+        - self.directory (str):  The dataset directory.
+        - self.format (str):  The effective format ('parquet', 'arrow' or 'csv').
+        - self.fallback (bool):  True, if the requested format fell back to CSV.
+        - self._lock (threading.Lock):  Serializes appending to the CSV file.
+    """
+
+    formats = ('parquet', 'arrow', 'csv')
+
+    # Rows per part file.
+    max_rows = 1000000
+
+    # Flat schema: column -> Arrow type
+    columns = {'run': 'int64',
+               'started': 'timestamp',
+               'command': 'string',
+               'hostgroup': 'string',
+               'supportconfig': 'string',
+               'hostname': 'string',
+               'agent_id': 'string',
+               'check_id': 'string',
+               'check_group': 'string',
+               'result': 'string',
+               'provider': 'string',
+               'cluster_type': 'string',
+               'architecture_type': 'string',
+               'ensa_version': 'string',
+               'filesystem_type': 'string',
+               'hana_scenario': 'string',
+               'duration': 'float64',
+               'source': 'string'}
+
+    def __init__(self, directory: str, format: str) -> None:
+        if format not in ResultExport.formats:
+            raise ExportException(f'Unsupported export format "{format}" (use {", ".join(ResultExport.formats)}).')
+        self.directory = directory
+        self.fallback = format != 'csv' and not pyarrow
+        self.format = 'csv' if self.fallback else format
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def rows(run: Dict[str, Any], run_id: int) -> List[Dict[str, Any]]:
+        """Returns the flat rows of a run (see `RunHistory.begin()`)."""
+
+        supportconfigs = {hostname: os.path.basename(supportconfig.rstrip('/')) if supportconfig else None
+                          for hostname, _, supportconfig in run['hosts']}
+        environment = {column: run['environment'].get(column) for column in
+                       ('provider', 'cluster_type', 'architecture_type', 'ensa_version', 'filesystem_type', 'hana_scenario')}
+        rows = []
+        for check_id, check_group, hostname, agent_id, result, _, duration, source, _ in run['results']:
+            rows.append({'run': run_id,
+                         'started': run['started'],
+                         'command': run['command'],
+                         'hostgroup': run['hostgroup'],
+                         'supportconfig': supportconfigs.get(hostname),
+                         'hostname': hostname,
+                         'agent_id': agent_id,
+                         'check_id': check_id,
+                         'check_group': check_group,
+                         'result': result,
+                         **environment,
+                         'duration': round(duration, 3) if duration is not None else None,
+                         'source': source})
+        return rows
+
+    def write(self, run: Dict[str, Any], run_id: int = None) -> str:
+        """Appends the results of the run to the dataset and returns the written
+        file (None, if the run has no results)."""
+
+        files = self.write_rows(ResultExport.rows(run, run_id))
+        return files[0] if files else None
+
+    def write_rows(self, rows: List[Dict[str, Any]]) -> List[str]:
+        """Appends the rows (see `rows()`) of any amount of runs to the dataset and returns
+        the written files. The rows are split into part files of at most `max_rows` rows."""
+
+        if not rows:
+            return []
+        path = Config.hostfs_path(self.directory)
+        try:
+            os.makedirs(path, exist_ok=True)
+            if self.format == 'csv':
+                return [self._write_csv(path, rows)]
+            return [self._write_arrow(path, rows[start:start + ResultExport.max_rows])
+                    for start in range(0, len(rows), ResultExport.max_rows)]
+        except (OSError, ValueError, TypeError) as err:   # the Arrow errors derive from them
+            raise ExportException(f'Error exporting results to "{self.directory}": {err}')
+
+    def exported_runs(self) -> Set[int]:
+        """Returns the ids of the runs present in the dataset. Only the column `run` of
+        the files gets read."""
+
+        path = Config.hostfs_path(self.directory)
+        runs = set()
+        try:
+            if os.path.exists(os.path.join(path, 'results.csv')):
+                with open(os.path.join(path, 'results.csv'), newline='') as f:
+                    runs.update(int(row['run']) for row in csv.DictReader(f) if row.get('run'))
+            if pyarrow:
+                for filename in glob.glob(os.path.join(path, 'part-*.parquet')):
+                    runs.update(pyarrow.parquet.read_table(filename, columns=['run']).column('run').to_pylist())
+                for filename in glob.glob(os.path.join(path, 'part-*.arrow')):
+                    with pyarrow.memory_map(filename) as source:
+                        runs.update(pyarrow.ipc.open_file(source).read_all().column('run').to_pylist())
+        except (OSError, ValueError, TypeError, KeyError) as err:   # the Arrow errors derive from them
+            raise ExportException(f'Error reading the dataset "{self.directory}": {err}')
+        runs.discard(None)
+        return runs
+
+    def _write_csv(self, path: str, rows: List[Dict[str, Any]]) -> str:
+        """Appends the rows to `results.csv` (with header, if the file is new)."""
+
+        filename = os.path.join(path, 'results.csv')
+        with self._lock:
+            new = not os.path.exists(filename) or os.path.getsize(filename) == 0
+            with open(filename, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=list(ResultExport.columns))
+                if new:
+                    writer.writeheader()
+                for row in rows:
+                    writer.writerow(dict(row, started=datetime.datetime.fromtimestamp(row['started'], datetime.timezone.utc).isoformat()))
+        return filename
+
+    def _write_arrow(self, path: str, rows: List[Dict[str, Any]]) -> str:
+        """Writes the rows as new part file. Strings are dictionary encoded, which
+        keeps the repetitive columns (check, result, environment) small."""
+
+        types = {'int64': pyarrow.int64(),
+                 'float64': pyarrow.float64(),
+                 'string': pyarrow.dictionary(pyarrow.int32(), pyarrow.string()),
+                 'timestamp': pyarrow.timestamp('ms', tz='UTC')}
+        schema = pyarrow.schema([(column, types[type]) for column, type in ResultExport.columns.items()])
+        data = {column: [row[column] for row in rows] for column in ResultExport.columns}
+        data['started'] = [int(started * 1000) for started in data['started']]
+        table = pyarrow.Table.from_pydict(data, schema=schema)
+
+        # Written to a hidden name first (ignored by dataset readers), so readers never see a partial file.
+        started = datetime.datetime.fromtimestamp(rows[0]['started']).strftime('%Y%m%d%H%M%S')
+        filename = os.path.join(path, f'part-{started}-{uuid.uuid4().hex[:8]}.{self.format}')
+        tmp_filename = os.path.join(path, f'.{os.path.basename(filename)}.tmp')
+        try:
+            if self.format == 'parquet':
+                pyarrow.parquet.write_table(table, tmp_filename, compression='zstd')
+            else:
+                options = pyarrow.ipc.IpcWriteOptions(compression='zstd')
+                with pyarrow.OSFile(tmp_filename, 'wb') as sink:
+                    with pyarrow.ipc.new_file(sink, schema, options=options) as writer:
+                        writer.write_table(table)
+            os.replace(tmp_filename, filename)
+        finally:
+            if os.path.exists(tmp_filename):
+                os.remove(tmp_filename)
+        return filename
+
+
+class ExportException(Exception):
+    pass
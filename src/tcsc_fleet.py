@@ -0,0 +1,144 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Contains classes to process a directory of supportconfigs as a fleet of host groups.
+"""
+
+import concurrent.futures
+import os
+import re
+from typing import List, Dict, Any, Iterator, Set, Tuple
+from tcsc_config import *
+from tcsc_supportfiles import SupportFiles
+
+
+class FleetGroup():
+    """Represents a host group of the fleet: the supportconfigs of all nodes of a
+    cluster (same cluster name and node list in the CIB) or a single host without
+    a cluster.
+
+        - self.name (str):  Name of the host group.
+        - self.cluster (str):  Cluster name from the CIB (None for a host without cluster).
+        - self.nodes (List[str]):  Node names from the CIB (empty for a host without cluster).
+        - self.hosts (Dict[str, Dict]):  Host descriptions like `SupportFiles.result` (hostname -> description).
+    """
+
+    def __init__(self, name: str, cluster: str, nodes: List[str]) -> None:
+        self.name = name
+        self.cluster = cluster
+        self.nodes = nodes
+        self.hosts: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def missing(self) -> List[str]:
+        """Returns the nodes of the cluster without a supportconfig."""
+
+        return [node for node in self.nodes if node not in self.hosts]
+
+    def host_descriptions(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the host descriptions for `HostsStack.create()`. The ENSA version is
+        only detectable on the node running the ERS instance and gets aligned for all
+        hosts (like `SupportFiles` does for a cluster)."""
+
+        ensa_versions = [host['ensa_version'] for host in self.hosts.values() if host['ensa_version']]
+        descriptions = {}
+        for hostname, host in self.hosts.items():
+            descriptions[hostname] = dict(host)
+            if ensa_versions and host['cluster_type'] == 'ascs_ers':
+                descriptions[hostname]['ensa_version'] = ensa_versions[0]
+        return descriptions
+
+
+class Fleet():
+    """Represents a directory tree of supportconfigs processed as host groups.
+
+    The supportconfigs get identified concurrently in worker processes. A host
+    group is handed out as soon as the supportconfigs of all nodes of its cluster
+    are identified, so its processing starts while the remaining supportconfigs
+    are still being parsed. Clusters with missing nodes are handed out at the end.
+
+        - self.directory (str):  Directory with the supportconfigs.
+        - self.parallel (int):  Maximum of supportconfigs identified concurrently.
+        - self.prefix (str):  Prefix of the host group names.
+        - self.issues (List[Dict[str, str]]):  Supportconfigs which could not be used with the reason.
+        - self._names (Set[str]):  Host group names already in use.
+    """
+
+    # Supportconfig tarballs, directories are recognized by their `basic-environment.txt`.
+    suffixes = ('.txz', '.tbz', '.tgz', '.tar', '.tar.xz', '.tar.bz2', '.tar.gz')
+
+    def __init__(self, directory: str, parallel: int, hostgroups: Set[str], prefix: str = 'fleet') -> None:
+        self.directory = directory
+        self.parallel = parallel
+        self.prefix = prefix
+        self.issues: List[Dict[str, str]] = []
+        self._names = set(hostgroups)
+
+    def supportfiles(self) -> List[str]:
+        """Returns all supportconfigs (tarballs and directories) below the directory.
+        The paths are the ones `SupportFiles` expects (without HOST_ROOT_FS)."""
+
+        root = Config.hostfs_path(self.directory)
+        if not os.path.isdir(root):
+            raise FleetException(f'"{self.directory}" is not a directory.')
+        supportfiles = []
+        for path, dirs, files in os.walk(root):
+            if 'basic-environment.txt' in files:
+                supportfiles.append(path)
+                dirs.clear()
+                continue
+            supportfiles.extend(os.path.join(path, file) for file in files if file.endswith(Fleet.suffixes))
+            dirs.sort()
+        if 'HOST_ROOT_FS' in os.environ:
+            supportfiles = [path.removeprefix(os.getenv('HOST_ROOT_FS')) for path in supportfiles]
+        return sorted(supportfiles)
+
+    def groups(self, supportfiles: List[str]) -> Iterator[FleetGroup]:
+        """Identifies the supportconfigs and yields the host groups as soon as they are complete."""
+
+        pending: Dict[Tuple[str, Tuple[str, ...]], FleetGroup] = {}
+        with concurrent.futures.ProcessPoolExecutor(max_workers=self.parallel) as executor:
+            # The cluster environment gets detected even for a single node of a cluster.
+            futures = {executor.submit(SupportFiles.identify, supportfile, True): supportfile for supportfile in supportfiles}
+            for future in concurrent.futures.as_completed(futures):
+                try:
+                    hostname, host = future.result()
+                except Exception as err:
+                    self.issues.append({'supportfile': futures[future], 'error': str(err)})
+                    continue
+
+                if not host['cluster_nodes']:
+                    group = FleetGroup(self._name(hostname), None, [])
+                    group.hosts[hostname] = host
+                    yield group
+                    continue
+
+                key = (host['cluster_name'], tuple(host['cluster_nodes']))
+                if key not in pending:
+                    pending[key] = FleetGroup(self._name(host['cluster_name'] or hostname), host['cluster_name'], host['cluster_nodes'])
+                group = pending[key]
+                if hostname in group.hosts:
+                    self.issues.append({'supportfile': futures[future],
+                                        'error': f'''Host "{hostname}" of host group "{group.name}" is already provided by "{group.hosts[hostname]['supportconfig']}".'''})
+                    continue
+                group.hosts[hostname] = host
+                if not group.missing:
+                    yield pending.pop(key)
+
+        yield from pending.values()
+
+    def _name(self, base: str) -> str:
+        """Returns an unused host group name for the given cluster or host name."""
+
+        base = re.sub(r'[^a-zA-Z0-9_.-]+', '-', f'{self.prefix}-{base}')
+        name, index = base, 1
+        while name in self._names:
+            index += 1
+            name = f'{base}-{index}'
+        self._names.add(name)
+        return name
+
+
+class FleetException(Exception):
+    pass
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Contains classes to gather Trento facts directly from a supportconfig.
+
+The gatherers mimic the ones of the Trento agent, but read the configuration
+files and command outputs from the supportconfig instead of the system.
+Only gatherers whose data is part of the supportconfig and whose output format
+is plain enough are implemented (see `LocalFacts.gatherers`). Results should be
+compared with Wanda (`utils/validate_evaluation`) whenever the checks or the
+agent change.
+"""
+
+import json
+import os
+import re
+import sys
+import tarfile
+from typing import List, Dict, Any
+
+
+class Supportconfig():
+    """Represents the sections of a supportconfig (tarball or directory).
+
+    A supportconfig consists of text files with sections starting with a line
+    like `#==[ Configuration File ]===#` or `#==[ Command ]===#` followed by a
+    line with the file name or command (`# /etc/os-release`).
+
+    The path must be usable as is (see `SupportFiles` for paths inside the container).
+
+        - self.path (str):  Path of the supportconfig.
+        - self._files (Dict[str, List[str]]):  Loaded text files (name -> lines).
+    """
+
+    # Text files used by the gatherers. A tarball gets read only once for all of them.
+    txt_files = ['basic-environment.txt', 'env.txt', 'ha.txt', 'fs-diskio.txt', 'plugin-ha_sap.txt', 'plugin-saptune.txt']
+
+    def __init__(self, path: str) -> None:
+        if not os.path.exists(path):
+            raise GathererException(f'Supportconfig "{path}" does not exist.')
+        self.path = path
+        self._files: Dict[str, List[str]] = {}
+
+    def lines(self, txt_file: str) -> List[str]:
+        """Returns the lines (without line breaks) of the given text file of the supportconfig
+        or an empty list, if the file is not present."""
+
+        if txt_file not in self._files:
+            try:
+                if os.path.isdir(self.path):
+                    lines = []
+                    if os.path.exists(os.path.join(self.path, txt_file)):
+                        with open(os.path.join(self.path, txt_file), errors='replace') as f:
+                            lines = f.read().splitlines()
+                    self._files[txt_file] = lines
+                else:
+                    wanted = set(Supportconfig.txt_files) | {txt_file}
+                    with tarfile.open(self.path) as sc:
+                        for member in sc:
+                            name = os.path.basename(member.name)
+                            if member.isfile() and name in wanted and name not in self._files:
+                                self._files[name] = str(sc.extractfile(member).read(), sys.getdefaultencoding(), errors='replace').splitlines()
+                    for name in wanted - self._files.keys():
+                        self._files[name] = []
+            except (OSError, tarfile.TarError) as err:
+                raise GathererException(f'Error reading "{txt_file}" of "{self.path}": {err}')
+        return self._files[txt_file]
+
+    def section(self, txt_file: str, header: str, stop_at_blank: bool = False) -> List[str]:
+        """Returns the lines of the section with the given header (e.g. `/etc/os-release`)
+        up to the next section or None, if the section does not exist. With `stop_at_blank`
+        the section ends at the first empty line too."""
+
+        lines = self.lines(txt_file)
+        try:
+            start = lines.index(f'# {header}') + 1
+        except ValueError:
+            return None
+        section = []
+        for line in lines[start:]:
+            if line.startswith('#==[') or (stop_at_blank and not line.strip()):
+                break
+            section.append(line)
+        while section and not section[-1].strip():
+            section.pop()
+        return section
+
+    def file(self, filename: str, txt_files: List[str]) -> List[str]:
+        """Returns the content of the configuration file as included in one of the given text files
+        of the supportconfig or None, if it is not included."""
+
+        for txt_file in txt_files:
+            content = self.section(txt_file, filename)
+            if content is not None and not (content and content[0].strip().endswith('File not found')):
+                return content
+        return None
+
+
+class LocalFacts():
+    """Gathers facts for a supportconfig like the Trento agent does for a host.
+
+    Facts are returned like in a Wanda execution response: a dictionary with
+    'value' or in case of an error with 'type' and 'message'.
+    """
+
+    # Gatherer -> method name. Versions other than v1 are not supported.
+    gatherers = {'corosync.conf': '_corosync_conf',
+                 'os-release': '_os_release',
+                 'sbd_config': '_sbd_config',
+                 'sysctl': '_sysctl',
+                 'fstab': '_fstab',
+                 'sapservices': '_sapservices',
+                 'saptune': '_saptune'}
+
+    _saptune_commands = {'status': 'status',
+                         'note-verify': 'note verify',
+                         'note-list': 'note list',
+                         'solution-list': 'solution list',
+                         'check': 'check'}
+
+    def __init__(self, supportconfig: Supportconfig) -> None:
+        self.supportconfig = supportconfig
+        self._facts: Dict[str, Dict[str, Any]] = {}   # gathered facts ('gatherer:argument' -> fact)
+
+    @classmethod
+    def supports(cls, gatherer: str) -> bool:
+        """Returns True if the gatherer (with optional version) can be run locally."""
+
+        name, _, version = gatherer.partition('@')
+        return name in cls.gatherers and version in ('', 'v1')
+
+    def fact(self, gatherer: str, argument: str) -> Dict[str, Any]:
+        """Returns the fact for the gatherer and argument."""
+
+        if not LocalFacts.supports(gatherer):
+            return {'type': 'fact_gathering_error', 'message': f'Gatherer {gatherer} is not supported locally.'}
+        key = f'''{gatherer.partition('@')[0]}:{argument or ''}'''
+        if key not in self._facts:
+            try:
+                self._facts[key] = {'value': getattr(self, LocalFacts.gatherers[gatherer.partition('@')[0]])(argument or '')}
+            except GathererException as err:
+                self._facts[key] = {'type': 'fact_gathering_error', 'message': str(err)}
+        return self._facts[key]
+
+    @staticmethod
+    def parse_value(value: str) -> Any:
+        """Converts a string into an integer, float or boolean if possible
+        (like `ParseStringToFactValue()` of the agent)."""
+
+        if re.fullmatch(r'[+-]?\d+', value):
+            return int(value)
+        if re.fullmatch(r'[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?', value):
+            return float(value)
+        if value in ('t', 'T', 'TRUE', 'true', 'True'):
+            return True
+        if value in ('f', 'F', 'FALSE', 'false', 'False'):
+            return False
+        return value
+
+    @staticmethod
+    def _lookup(data: Any, argument: str, gatherer: str) -> Any:
+        """Walks along the dot-separated argument through nested maps and lists."""
+
+        if not argument:
+            return data
+        for component in argument.split('.'):
+            if isinstance(data, dict) and component in data:
+                data = data[component]
+            elif isinstance(data, list) and component.isdigit() and int(component) < len(data):
+                data = data[int(component)]
+            else:
+                raise GathererException(f'{gatherer}: requested field value not found: {argument}')
+        return data
+
+    @staticmethod
+    def _env_file(lines: List[str]) -> Dict[str, str]:
+        """Parses a shell environment file (KEY=value) into a dictionary."""
+
+        entries = {}
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#') or '=' not in line:
+                continue
+            key, value = line.split('=', 1)
+            value = value.strip()
+            if len(value) > 1 and value[0] == value[-1] and value[0] in '"\'':
+                value = value[1:-1]
+            else:
+                value = value.split(' #')[0].strip()
+            entries[key.strip().removeprefix('export ').strip()] = value
+        return entries
+
+    def _corosync_conf(self, argument: str) -> Any:
+        """corosync.conf: The configuration as nested map, repeated sections become lists."""
+
+        lines = self.supportconfig.file('/etc/corosync/corosync.conf', ['ha.txt'])
+        if lines is None:
+            raise GathererException('corosync.conf: file not found in supportconfig')
+        root: Dict[str, Any] = {}
+        stack = [root]
+        for line in lines:
+            line = line.split('#')[0].strip()
+            if not line:
+                continue
+            if line.endswith('{'):
+                name = line[:-1].strip()
+                section: Dict[str, Any] = {}
+                parent = stack[-1]
+                if name in parent:
+                    if not isinstance(parent[name], list):
+                        parent[name] = [parent[name]]
+                    parent[name].append(section)
+                else:
+                    parent[name] = section
+                stack.append(section)
+            elif line == '}':
+                if len(stack) == 1:
+                    raise GathererException('corosync.conf: unbalanced braces')
+                stack.pop()
+            elif ':' in line:
+                key, value = line.split(':', 1)
+                stack[-1][key.strip()] = LocalFacts.parse_value(value.strip())
+        return LocalFacts._lookup(root, argument, 'corosync.conf')
+
+    def _os_release(self, argument: str) -> Any:
+        """os-release: All entries as map of strings."""
+
+        lines = self.supportconfig.file('/etc/os-release', ['basic-environment.txt', 'env.txt'])
+        if lines is None:
+            raise GathererException('os-release: file not found in supportconfig')
+        return LocalFacts._lookup(LocalFacts._env_file(lines), argument, 'os-release')
+
+    def _sbd_config(self, argument: str) -> Any:
+        """sbd_config: The value of the given SBD configuration entry."""
+
+        lines = self.supportconfig.file('/etc/sysconfig/sbd', ['ha.txt'])
+        if lines is None:
+            raise GathererException('sbd_config: file not found in supportconfig')
+        config = LocalFacts._env_file(lines)
+        if argument not in config:
+            raise GathererException(f'sbd_config: requested field value not found: {argument}')
+        return LocalFacts.parse_value(config[argument])
+
+    def _sysctl(self, argument: str) -> Any:
+        """sysctl: The value of the given key or a nested map for a partial key."""
+
+        lines = self.supportconfig.section('env.txt', '/sbin/sysctl -a')
+        if lines is None:
+            raise GathererException('sysctl: output of "sysctl -a" not found in supportconfig')
+        values: Dict[str, Any] = {}
+        for line in lines:
+            if ' = ' in line:
+                key, value = line.split(' = ', 1)
+                values[key.strip()] = value.strip()
+        if argument in values:
+            return LocalFacts.parse_value(values[argument])
+        partial: Dict[str, Any] = {}
+        for key, value in values.items():
+            if key.startswith(argument + '.'):
+                node = partial
+                components = key[len(argument) + 1:].split('.')
+                for component in components[:-1]:
+                    node = node.setdefault(component, {})
+                node[components[-1]] = LocalFacts.parse_value(value)
+        if not partial:
+            raise GathererException(f'sysctl: requested value not found: {argument}')
+        return partial
+
+    def _fstab(self, argument: str) -> Any:
+        """fstab: List of all entries."""
+
+        lines = self.supportconfig.file('/etc/fstab', ['fs-diskio.txt', 'basic-environment.txt'])
+        if lines is None:
+            raise GathererException('fstab: file not found in supportconfig')
+        entries = []
+        for line in lines:
+            fields = line.split('#')[0].split()
+            if not fields:
+                continue
+            if len(fields) < 4:
+                raise GathererException(f'fstab: invalid entry: {line}')
+            entries.append({'device': fields[0],
+                            'mount_point': fields[1],
+                            'file_system_type': fields[2],
+                            'options': fields[3].split(','),
+                            'backup': int(fields[4]) if len(fields) > 4 and fields[4].isdigit() else 0,
+                            'check_order': int(fields[5]) if len(fields) > 5 and fields[5].isdigit() else 0})
+        return entries
+
+    def _sapservices(self, argument: str) -> Any:
+        """sapservices: List of all entries with SID, kind and content."""
+
+        lines = self.supportconfig.section('plugin-ha_sap.txt', '/usr/bin/cat /usr/sap/sapservices', stop_at_blank=True)
+        if lines is None:
+            raise GathererException('sapservices: file not found in supportconfig')
+        entries = []
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            if line.startswith('systemctl'):
+                match = re.search(r'SAP(\w{3})_\d{2}', line)
+                kind = 'systemctl'
+            else:
+                match = re.search(r'pf=\S*/(\w{3})_\w+', line) or re.search(r'/usr/sap/(\w{3})/', line)
+                kind = 'sapstartsrv'
+            if match:
+                entries.append({'sid': match.group(1), 'kind': kind, 'content': line})
+        return entries
+
+    def _saptune(self, argument: str) -> Any:
+        """saptune: The JSON output of the saptune command given as argument."""
+
+        if argument not in LocalFacts._saptune_commands:
+            raise GathererException(f'saptune: unsupported argument: {argument}')
+        lines = self.supportconfig.section('plugin-saptune.txt', f'saptune --format json {LocalFacts._saptune_commands[argument]}', stop_at_blank=True)
+        documents = [line for line in lines or [] if line.startswith('{"$schema"')]
+        if not documents:
+            raise GathererException(f'saptune: output of "saptune {argument}" not found in supportconfig')
+        try:
+            return json.loads(documents[0])
+        except ValueError as err:
+            raise GathererException(f'saptune: invalid JSON output of "saptune {argument}": {err}')
+
+
+class GathererException(Exception):
+    pass
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Contains classes to keep the history of check runs in a local SQLite database.
+"""
+
+
+import hashlib
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Dict, Any, Tuple
+from tcsc_config import *
+
+
+class RunHistory():
+    """Represents the history of check runs.
+
+    A run gets collected in memory while the checks are executed and written
+    with a single transaction at the end, so recording does not slow down the
+    run. The supportconfigs are identified by the SHA-256 of their content. The
+    hashes are kept per path, size and modification time, so each supportconfig
+    gets read only once. Runs older than the time to live are purged on saving,
+    together with the hashes of supportconfigs no remaining run refers to.
+
+        - self.ttl (int):  Time in seconds runs are kept (0 disables the history).
+        - self._db_file (str):  The SQLite database.
+        - self._connection (sqlite3.Connection):  Connection to the database (None until first use).
+        - self._lock (threading.Lock):  Serializes the use of the connection (host groups of `fleet run` save concurrently).
+    """
+
+    _schema = '''
+        CREATE TABLE IF NOT EXISTS runs (id INTEGER PRIMARY KEY, command TEXT, hostgroup TEXT, environment TEXT, started REAL, finished REAL);
+        CREATE TABLE IF NOT EXISTS hosts (run_id INTEGER, hostname TEXT, agent_id TEXT, supportconfig TEXT, supportconfig_hash TEXT);
+        CREATE TABLE IF NOT EXISTS results (run_id INTEGER, check_id TEXT, check_group TEXT, hostname TEXT, agent_id TEXT,
+                                            result TEXT, messages TEXT, duration REAL, source TEXT, timed_out INTEGER DEFAULT 0);
+        CREATE TABLE IF NOT EXISTS supportconfigs (path TEXT PRIMARY KEY, size INTEGER, mtime REAL, hash TEXT);
+        CREATE INDEX IF NOT EXISTS runs_hostgroup ON runs (hostgroup, started);
+        CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+        CREATE INDEX IF NOT EXISTS hosts_run ON hosts (run_id);
+        CREATE INDEX IF NOT EXISTS hosts_hash ON hosts (supportconfig_hash);
+        CREATE INDEX IF NOT EXISTS results_run ON results (run_id, check_id, hostname);
+        CREATE INDEX IF NOT EXISTS results_check ON results (check_id, run_id);
+        CREATE INDEX IF NOT EXISTS results_result ON results (result, run_id);
+    '''
+
+    # Version of `_schema` (kept as `user_version` in the database).
+    _schema_version = 2
+
+    def __init__(self, config: Config) -> None:
+        self.ttl = config.history_ttl
+        self._db_file = os.path.join(config.state_dir, 'history.db')
+        self._connection: sqlite3.Connection = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Returns the connection to the database. It gets opened on first use and the
+        schema is created, if the database does not have the current one yet."""
+
+        if self._connection is None:
+            try:
+                os.makedirs(os.path.dirname(self._db_file), exist_ok=True)
+                connection = sqlite3.connect(self._db_file, timeout=30, check_same_thread=False)
+                connection.row_factory = sqlite3.Row
+                if connection.execute('PRAGMA user_version').fetchone()[0] < RunHistory._schema_version:
+                    connection.execute('PRAGMA journal_mode=WAL')   # persistent, readers do not block a run being saved
+                    connection.executescript(RunHistory._schema)
+                    with connection:
+                        # Databases of version 1 lack the column `timed_out`, their timeouts are known by the message.
+                        if 'timed_out' not in [row['name'] for row in connection.execute('PRAGMA table_info(results)')]:
+                            connection.execute('ALTER TABLE results ADD COLUMN timed_out INTEGER DEFAULT 0')
+                            connection.execute("UPDATE results SET timed_out = 1 WHERE result = 'error' AND messages LIKE '%in time (within%'")
+                        connection.execute(f'PRAGMA user_version = {RunHistory._schema_version}')
+            except sqlite3.Error as err:
+                raise HistoryException(f'Error opening "{self._db_file}": {err}')
+            self._connection = connection
+        return self._connection
+
+    def begin(self, command: str, hostgroup: str, environment: Dict[str, str], hosts: List[Any]) -> Dict[str, Any]:
+        """Returns a new run for the given hosts (`Host` records) to collect the results."""
+
+        return {'command': command,
+                'hostgroup': hostgroup,
+                'environment': environment,
+                'started': time.time(),
+                'hosts': [(host['hostname'], host['agent_id'], host['supportconfig']) for host in hosts],
+                'results': []}
+
+    def add(self, run: Dict[str, Any], check_id: str, check_group: str, check_results: str, err: bool,
+            duration: float, source: str, agent2host: Dict[str, str], timed_out: bool = False) -> None:
+        """Adds the results of `WandaStack.execute_check()` for a check to the run. An error
+        gets recorded as result 'error' for all hosts. `timed_out` marks an error caused by
+        the timeout of the execution, its duration is a lower limit (see `latencies()`)."""
+
+        if err:
+            for agent_id, hostname in agent2host.items():
+                run['results'].append((check_id, check_group, hostname, agent_id, 'error', json.dumps([str(check_results)]), duration, source,
+                                       int(timed_out)))
+            return
+        for check_result in json.loads(check_results):
+            run['results'].append((check_id, check_group, agent2host.get(check_result['agent_id']), check_result['agent_id'],
+                                   check_result['result'], json.dumps(check_result.get('messages') or []), duration, source, 0))
+
+    def save(self, run: Dict[str, Any]) -> int:
+        """Writes the run with one transaction and returns its id."""
+
+        if not self.ttl:
+            return None
+        with self._lock:
+            connection = self._connect()
+            try:
+                with connection:
+                    hosts = [(hostname, agent_id, supportconfig, self._supportconfig_hash(connection, supportconfig))
+                             for hostname, agent_id, supportconfig in run['hosts']]
+                    run_id = connection.execute('INSERT INTO runs (command, hostgroup, environment, started, finished) VALUES (?, ?, ?, ?, ?)',
+                                                (run['command'], run['hostgroup'], json.dumps(run['environment']), run['started'], time.time())).lastrowid
+                    connection.executemany('INSERT INTO hosts VALUES (?, ?, ?, ?, ?)', [(run_id, *host) for host in hosts])
+                    connection.executemany('INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', [(run_id, *result) for result in run['results']])
+                    expired = 'SELECT id FROM runs WHERE started < ?'
+                    for table in 'results', 'hosts':
+                        connection.execute(f'DELETE FROM {table} WHERE run_id IN ({expired})', (time.time() - self.ttl,))
+                    if connection.execute('DELETE FROM runs WHERE started < ?', (time.time() - self.ttl,)).rowcount:
+                        connection.execute('''DELETE FROM supportconfigs WHERE hash NOT IN
+                                              (SELECT supportconfig_hash FROM hosts WHERE supportconfig_hash IS NOT NULL)''')
+            except sqlite3.Error as err:
+                raise HistoryException(f'Error writing run to "{self._db_file}": {err}')
+        return run_id
+
+    def _supportconfig_hash(self, connection: sqlite3.Connection, supportconfig: str) -> str:
+        """Returns the SHA-256 of the supportconfig (file or directory) or None, if it is
+        not accessible. Known hashes are taken from the database if size and modification
+        time are unchanged."""
+
+        path = Config.hostfs_path(supportconfig)
+        try:
+            if os.path.isdir(path):
+                files = sorted(os.path.join(root, file) for root, _, filenames in os.walk(path) for file in filenames)
+            else:
+                files = [path]
+            stats = [os.stat(file) for file in files]
+        except OSError:
+            return None
+        size, mtime = sum(stat.st_size for stat in stats), max((stat.st_mtime for stat in stats), default=0)
+        known = connection.execute('SELECT hash FROM supportconfigs WHERE path = ? AND size = ? AND mtime = ?', (path, size, mtime)).fetchone()
+        if known:
+            return known['hash']
+
+        digest = hashlib.sha256()
+        try:
+            for file in files:
+                digest.update(os.path.relpath(file, path).encode())
+                with open(file, 'rb') as f:
+                    for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(chunk)
+        except OSError:
+            return None
+        connection.execute('INSERT OR REPLACE INTO supportconfigs VALUES (?, ?, ?, ?)', (path, size, mtime, digest.hexdigest()))
+        return digest.hexdigest()
+
+    def query(self, check_id: str = None, result: str = None, hostgroup: str = None, run_id: int = None,
+              since: float = None, until: float = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Returns the recorded results matching all given filters, newest run first."""
+
+        conditions, parameters = RunHistory._conditions(hostgroup, since, until)
+        for column, value in ('results.check_id', check_id), ('results.result', result), ('results.run_id', run_id):
+            if value is not None:
+                conditions.append(f'{column} = ?')
+                parameters.append(value)
+        statement = f'''SELECT runs.id AS run, runs.started, runs.hostgroup, results.hostname, results.agent_id, results.check_id,
+                               results.check_group, results.result, results.messages, results.duration, results.source
+                        FROM results JOIN runs ON runs.id = results.run_id
+                        {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                        ORDER BY runs.started DESC, results.check_id, results.hostname LIMIT ?'''
+        return [dict(row, messages=json.loads(row['messages'])) for row in self._fetch(statement, parameters + [limit])]
+
+    def runs(self, hostgroup: str = None, since: float = None, until: float = None, limit: int = 100) -> List[Dict[str, Any]]:
+        """Returns the recorded runs with the amount of results per result type, newest first."""
+
+        conditions, parameters = RunHistory._conditions(hostgroup, since, until)
+        selected = f'''SELECT runs.id FROM runs {'WHERE ' + ' AND '.join(conditions) if conditions else ''}
+                       ORDER BY runs.started DESC LIMIT ?'''
+        statement = f'''SELECT runs.id AS run, runs.command, runs.hostgroup, runs.environment, runs.started, runs.finished,
+                               (SELECT COUNT(*) FROM hosts WHERE hosts.run_id = runs.id) AS hosts
+                        FROM runs WHERE runs.id IN ({selected})
+                        ORDER BY runs.started DESC'''
+        runs = [dict(row, environment=json.loads(row['environment']), results={}) for row in self._fetch(statement, parameters + [limit])]
+        counts = {run['run']: run['results'] for run in runs}
+        for row in self._fetch(f'''SELECT run_id, result, COUNT(*) AS count FROM results WHERE run_id IN ({selected})
+                                   GROUP BY run_id, result''', parameters + [limit]):
+            counts[row['run_id']][row['result']] = row['count']
+        return runs
+
+    def load(self, hostgroup: str = None, since: float = None, until: float = None) -> Dict[int, Dict[str, Any]]:
+        """Returns the recorded runs matching the filters in the format of `begin()` (e.g. for
+        `ResultExport`) with the run id as key, oldest first. All runs are read with three queries."""
+
+        conditions, parameters = RunHistory._conditions(hostgroup, since, until)
+        selected = f'''SELECT runs.id FROM runs {'WHERE ' + ' AND '.join(conditions) if conditions else ''}'''
+        runs = {row['id']: {'command': row['command'],
+                            'hostgroup': row['hostgroup'],
+                            'environment': json.loads(row['environment']),
+                            'started': row['started'],
+                            'hosts': [],
+                            'results': []}
+                for row in self._fetch(f'''SELECT id, command, hostgroup, environment, started FROM runs
+                                          WHERE id IN ({selected}) ORDER BY started''', parameters)}
+        for row in self._fetch(f'SELECT run_id, hostname, agent_id, supportconfig FROM hosts WHERE run_id IN ({selected})', parameters):
+            runs[row['run_id']]['hosts'].append(tuple(row)[1:])
+        for row in self._fetch(f'''SELECT run_id, check_id, check_group, hostname, agent_id, result, messages, duration, source, timed_out
+                                   FROM results WHERE run_id IN ({selected}) ORDER BY run_id, check_id, hostname''', parameters):
+            runs[row['run_id']]['results'].append(tuple(row)[1:])
+        return runs
+
+    def diff(self, run_id: int, other_run_id: int = None) -> Tuple[int, int, List[Dict[str, Any]]]:
+        """Compares the results of two runs per check and host. Without `other_run_id` the
+        previous run of the same host group is used. Returns the ids of both runs and the
+        differences (a missing result is None)."""
+
+        rows = self._fetch('SELECT hostgroup, started FROM runs WHERE id = ?', [run_id])
+        if not rows:
+            raise HistoryException(f'Run {run_id} does not exist.')
+        if other_run_id is None:
+            previous = self._fetch('SELECT id FROM runs WHERE hostgroup = ? AND started < ? ORDER BY started DESC LIMIT 1',
+                                   [rows[0]['hostgroup'], rows[0]['started']])
+            if not previous:
+                raise HistoryException(f'''Run {run_id} is the first run of host group "{rows[0]['hostgroup']}".''')
+            run_id, other_run_id = previous[0]['id'], run_id
+        elif not self._fetch('SELECT id FROM runs WHERE id = ?', [other_run_id]):
+            raise HistoryException(f'Run {other_run_id} does not exist.')
+
+        def results(run: int) -> Dict[Tuple[str, str], str]:
+            return {(row['check_id'], row['hostname']): row['result'] for row in
+                    self._fetch('SELECT check_id, hostname, result FROM results WHERE run_id = ?', [run])}
+
+        before, after = results(run_id), results(other_run_id)
+        differences = []
+        for check_id, hostname in sorted(before.keys() | after.keys(), key=lambda key: (key[0], key[1] or '')):
+            if before.get((check_id, hostname)) != after.get((check_id, hostname)):
+                differences.append({'check_id': check_id,
+                                    'hostname': hostname,
+                                    'before': before.get((check_id, hostname)),
+                                    'after': after.get((check_id, hostname))})
+        return run_id, other_run_id, differences
+
+    def latencies(self, runs: int = 200, samples: int = 5) -> Tuple[Dict[str, float], Dict[str, float]]:
+        """Returns two statistics of the durations of the Wanda executions per check within
+        the last `runs` runs: the 95th percentile of the completed executions (checks with
+        less than `samples` of them are left out) and the duration a timeout is derived from.
+        That is the 95th percentile as well, unless executions of the check timed out and no
+        completed execution took longer. Then it is the longest timed out duration, a lower
+        limit of the real duration, which lets the timeout grow until the check fits."""
+
+        if not self.ttl:
+            return {}, {}
+        completed, timed_out = {}, {}
+        for row in self._fetch('''SELECT check_id, MAX(duration) AS duration, timed_out FROM results
+                                   WHERE source = 'wanda' AND (result != 'error' OR timed_out)
+                                     AND duration IS NOT NULL
+                                     AND run_id > (SELECT COALESCE(MAX(id), 0) FROM runs) - ?
+                                   GROUP BY run_id, check_id, timed_out''', [runs]):
+            (timed_out if row['timed_out'] else completed).setdefault(row['check_id'], []).append(row['duration'])
+        percentiles = {check_id: sorted(values)[math.ceil(len(values) * .95) - 1]    # nearest rank
+                       for check_id, values in completed.items() if len(values) >= samples}
+        limits = dict(percentiles)
+        for check_id, values in timed_out.items():
+            if max(completed.get(check_id, []), default=0) <= max(values):
+                limits[check_id] = max(limits.get(check_id, 0), max(values))
+        return percentiles, limits
+
+    @staticmethod
+    def _conditions(hostgroup: str, since: float, until: float) -> Tuple[List[str], List[Any]]:
+        """Returns the conditions and parameters for the run filters."""
+
+        conditions, parameters = [], []
+        for condition, value in ('runs.hostgroup = ?', hostgroup), ('runs.started >= ?', since), ('runs.started < ?', until):
+            if value is not None:
+                conditions.append(condition)
+                parameters.append(value)
+        return conditions, parameters
+
+    def _fetch(self, statement: str, parameters: List[Any]) -> List[sqlite3.Row]:
+        """Executes the query and returns all rows."""
+
+        with self._lock:
+            connection = self._connect()
+            try:
+                return connection.execute(statement, parameters).fetchall()
+            except sqlite3.Error as err:
+                raise HistoryException(f'Error querying "{self._db_file}": {err}')
+
+
+class HistoryException(Exception):
+    pass
@@ -6,34 +6,140 @@ Contains classes to handle the hosts container stack.
 """
 
 
+import concurrent.futures
 import docker
+import hashlib
+import io
+import json
+import shlex
 import sys
+import tarfile
+import threading
 import time
 import subprocess
-from typing import List, Dict, Any, Tuple, Set
+import uuid
+from typing import List, Dict, Any, Tuple, Set, Callable, Iterator
 
 import docker.models
 import docker.models.containers
+import docker.models.images
 from tcsc_config import *
+from tcsc_docker import docker_client
+
+
+class Host():
+    """Represents a host container as seen by a single (sparse) Docker list call.
+    
+    The record is a compact snapshot of the container labels and state. For claimed pool 
+    containers the labels from the pool registry are given. Multi-host containers provide
+    one record per host root. Item access (`host['name']`) is supported, so the record can 
+    be used like the former dictionary.
+    
+        - self.name (str):  Name of the container or "CONTAINER/ROOT" for a host root.
+        - self.container_name (str):  Name of the container.
+        - self.root (str):  Name of the host root below /hosts/ (None for single-host containers).
+        - self.container (docker.models.containers.Container):  The (sparse) container object.
+        - self.manifest (Dict[str, str]):  The manifest, if it has been retrieved.
+    """
+
+    __slots__ = ('name', 'container_name', 'root', 'container_id', 'container_short_id', 'supportfiles', 'supportconfig',
+                 'provider', 'cluster_type', 'architecture_type', 'ensa_version', 'filesystem_type',
+                 'hana_scenario', 'hostgroup', 'hostname', 'status', 'agent_id', 'cache_key', 'container', 'manifest')
+
+    # Maps attribute names to the label and the default used if the label is missing or empty.
+    _labels = {'supportfiles': ('com.suse.tcsc.supportfiles', '-'),
+               'supportconfig': ('com.suse.tcsc.supportconfig', '-'),
+               'provider': ('com.suse.tcsc.env.provider', 'default'),
+               'cluster_type': ('com.suse.tcsc.env.cluster_type', None),
+               'architecture_type': ('com.suse.tcsc.env.architecture_type', None),
+               'ensa_version': ('com.suse.tcsc.env.ensa_version', None),
+               'filesystem_type': ('com.suse.tcsc.env.filesystem_type', None),
+               'hana_scenario': ('com.suse.tcsc.env.hana_scenario', None),
+               'hostgroup': ('com.suse.tcsc.hostgroup', '-'),
+               'hostname': ('com.suse.tcsc.hostname', '-'),
+               'agent_id': ('com.suse.tcsc.agent_id', '-'),
+               'cache_key': ('com.suse.tcsc.cache_key', None)
+              }
+
+    def __init__(self, container: docker.models.containers.Container, labels: Dict[str, str] = None, root: str = None) -> None:
+        
+        # Sparse container objects only carry the data of the list call,
+        # which differs from the inspect data (e.g. 'Names' instead of 'Name').
+        attrs = container.attrs
+        labels = labels or attrs.get('Labels') or {}
+        names = attrs.get('Names') or []
+        self.container_name = names[0].lstrip('/') if names else container.name or '-'
+        self.name = f'{self.container_name}/{root}' if root else self.container_name
+        self.root = root
+        self.container_id = container.id
+        self.container_short_id = container.short_id
+        for attribute, (label, default) in Host._labels.items():
+            setattr(self, attribute, labels.get(label) or default)
+        self.status = attrs.get('State') or 'unknown'
+        self.container = container
+        self.manifest = None
+
+    @staticmethod
+    def from_container(container: docker.models.containers.Container, labels: Dict[str, str] = None) -> List['Host']:
+        """Returns the host records of the given container. A multi-host container (label 
+        `com.suse.tcsc.roots`) has the host specific labels prefixed with `com.suse.tcsc.root.ROOT.`
+        and results in one record per host root."""
+        
+        labels = labels or container.attrs.get('Labels') or {}
+        if not labels.get('com.suse.tcsc.roots'):
+            return [Host(container, labels)]
+        hosts = []
+        for root in labels['com.suse.tcsc.roots'].split(','):
+            prefix = f'com.suse.tcsc.root.{root}.'
+            root_labels = dict(labels)
+            root_labels.update({f'com.suse.tcsc.{k.removeprefix(prefix)}': v for k, v in labels.items() if k.startswith(prefix)})
+            hosts.append(Host(container, root_labels, root))
+        return hosts
+
+    def __getitem__(self, key: str) -> Any:
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        try:
+            setattr(self, key, value)
+        except AttributeError:
+            raise KeyError(key)
 
 
 class HostsStack():
     """Represents a Hosts container stack.
     
+        - parallel_operations (int):  Maximum of concurrent Docker requests (matches the
+                                      connection pool size of the Docker client).
+    
         - self._docker (docker.DockerClient):  Instance of DockerClient.
         - self.timeout (int):  Timeout for Docker and host operations.
         - self.start_timeout (int):  Timeout for containers to start and stay alive.
         - self.id (str):  UUID of this tcsc installation.
         - self.image (str):  Image used for hosts container.
+        - self.pool (HostPool):  Pool of idle, pre-started host containers.
+        - self.image_cache (HostImageCache):  Cache of images with processed supportfiles.
+        - self._snapshot (List[Host]):  Snapshot of all host containers (None if not yet retrieved).
+        - self._group_snapshots (Dict[Tuple, List[Host]]):  Snapshots of filtered requests (host group, name)
+                                                            retrieved with server-side filters.
     """
+    
+    parallel_operations = 10
 
     def __init__(self, config: Config) -> None:
-        self._docker: docker.DockerClient = docker.from_env()
+        self._docker: docker.DockerClient = docker_client(HostsStack.parallel_operations)
         self.timeout = config.docker_timeout
         self.start_timeout = config.startup_timeout
         self.id = config.id
         self.image = config.hosts_image
         self.host_label = config.hosts_label
+        self._snapshot: List[Host] = None
+        self._group_snapshots: Dict[Tuple[str, str], List[Host]] = {}
+        self.pool = HostPool(config, self._docker)
+        self.image_cache = HostImageCache(config, self._docker)
 
     def _wait4start(self, host: docker.models.containers.Container):
         """Waits until given container is running and stays running."""
@@ -55,78 +161,242 @@ class HostsStack():
             time.sleep(.2)
 
     def create(self, hostgroup: str, name: str, host_description: Dict, environment: Dict[str, str]) -> str:
-        """Creates and starts a new host container for the requested group and returns its name."""
+        """Creates and starts a new host container for the requested group and returns its name.
+        If an idle container is available in the pool, it gets claimed instead of creating a new one."""
 
         dbus_uuid, agent_id = self._generate_id()
-
-        supportconfig_path = os.path.abspath(host_description['supportconfig'])
+        supportconfig_local_path, supportconfig_path = self._supportconfig_paths(host_description['supportconfig'])
         supportconfig_name = os.path.basename(supportconfig_path)
         
-        # If HOST_ROOT_FS is set, we run inside a container and usually all
-        # paths need to be prefixed with the content of that variable: the 
-        # mount point of the host's rootfs.
-        # This has to be removed from `supportconfig_path` because it is
-        # referenced from inside the container!
-        if 'HOST_ROOT_FS' in os.environ:
-            supportconfig_path = supportconfig_path.removeprefix(os.getenv('HOST_ROOT_FS'))
+        container_name = f'tcsc-host-{hostgroup}-{name}-{self.id}'
+        startup_environment = {'SUPPORTCONFIG' : f'/{supportconfig_name}',
+                               'MACHINE_ID': dbus_uuid
+                              }
+        labels = {'com.suse.tcsc.stack': 'host',
+                  'com.suse.tcsc.hostgroup': hostgroup,
+                  'com.suse.tcsc.uuid': self.id
+                 }
+        labels.update(self._host_labels(name, host_description, environment, supportconfig_path, agent_id))
+
+        # A cached image for the supportconfig already contains the processed supportfiles,
+        # otherwise an idle pool container or a fresh one is used.
+        cache_key = self.image_cache.key(supportconfig_local_path)
+        if cache_key:
+            labels['com.suse.tcsc.cache_key'] = cache_key
+        cached_image = self.image_cache.get(cache_key)
+        if cached_image:
+            host = self._docker.containers.run(
+                image = cached_image.id,
+                name = container_name,
+                command = '/sc/startup_cached',
+                environment = startup_environment,
+                volumes = [f'{supportconfig_path}:/{supportconfig_name}'],
+                network = 'tcsc_default',
+                labels = labels,
+                detach = True)
+        else:
+            host = self.pool.claim(container_name, labels, startup_environment, supportconfig_local_path)
+        if not host:
+            host = self._docker.containers.run(
+                image = self.image,
+                name = container_name,
+                command = '/sc/startup',
+                environment = startup_environment,
+                volumes = [f'{supportconfig_path}:/{supportconfig_name}'],
+                network = 'tcsc_default',
+                labels = labels,
+                detach = True)
+        self.invalidate()
+        self._wait4start(host)
+        
+        return host.name
+
+    def create_multi(self, hostgroup: str, host_descriptions: Dict[str, Dict], environment: Dict[str, str]) -> str:
+        """Creates and starts one container for all hosts of the requested group and returns its name.
+        Each host gets its own root below /hosts/ with an own machine id and trento-agent.
+        The host specific labels are prefixed with `com.suse.tcsc.root.HOSTNAME.`."""
+
+        container_name = f'tcsc-host-{hostgroup}-multi-{self.id}'
+        startup_environment = {'HOSTS': str(len(host_descriptions))}
+        volumes = []
+        labels = {'com.suse.tcsc.stack': 'host',
+                  'com.suse.tcsc.hostgroup': hostgroup,
+                  'com.suse.tcsc.uuid': self.id,
+                  'com.suse.tcsc.roots': ','.join(host_descriptions)
+                 }
+        for index, (name, host_description) in enumerate(host_descriptions.items()):
+            dbus_uuid, agent_id = self._generate_id()
+            _, supportconfig_path = self._supportconfig_paths(host_description['supportconfig'])
+            supportconfig_name = os.path.basename(supportconfig_path)
+            startup_environment.update({f'HOST_{index}_NAME': name,
+                                        f'HOST_{index}_SUPPORTCONFIG': f'/{supportconfig_name}',
+                                        f'HOST_{index}_MACHINE_ID': dbus_uuid
+                                       })
+            volumes.append(f'{supportconfig_path}:/hosts/{name}/{supportconfig_name}')
+            for key, value in self._host_labels(name, host_description, environment, supportconfig_path, agent_id).items():
+                labels[key.replace('com.suse.tcsc.', f'com.suse.tcsc.root.{name}.', 1)] = value
         
         host = self._docker.containers.run(
             image = self.image,
-            name = f'tcsc-host-{hostgroup}-{name}-{self.id}',
-            command = '/sc/startup',
-            environment = {'SUPPORTCONFIG' : f'/{supportconfig_name}',
-                           'MACHINE_ID': dbus_uuid
-                          },
-            volumes = [f'{supportconfig_path}:/{supportconfig_name}'],
+            name = container_name,
+            command = '/sc/startup_multi',
+            environment = startup_environment,
+            volumes = volumes,
+            cap_add = ['SYS_ADMIN'],                # bind mounts of /proc and /sys into the host roots
+            security_opt = ['apparmor=unconfined'],
             network = 'tcsc_default',
-            labels = {'com.suse.tcsc.stack': 'host',
-                      'com.suse.tcsc.hostgroup': hostgroup,
-                      'com.suse.tcsc.hostname': name,
-                      'com.suse.tcsc.supportfiles': supportconfig_path,
-                      'com.suse.tcsc.supportconfig': supportconfig_path,
-                      'com.suse.tcsc.env.provider': environment['provider'] if 'provider' in environment else host_description['provider'],
-                      'com.suse.tcsc.env.cluster_type': environment['cluster_type'] if 'cluster_type' in environment else host_description['cluster_type'],
-                      'com.suse.tcsc.env.architecture_type': environment['architecture_type'] if 'architecture_type' in environment else host_description['architecture_type'],
-                      'com.suse.tcsc.env.ensa_version': environment['ensa_version'] if 'ensa_version' in environment else host_description['ensa_version'],
-                      'com.suse.tcsc.env.filesystem_type': environment['filesystem_type'] if 'filesystem_type' in environment else host_description['filesystem_type'],
-                      'com.suse.tcsc.env.hana_scenario': environment['hana_scenario'] if 'hana_scenario' in environment else host_description['hana_scenario'],
-                      'com.suse.tcsc.uuid': self.id,
-                      'com.suse.tcsc.agent_id': agent_id
-                     },
+            labels = labels,
             detach = True)
+        self.invalidate()
         self._wait4start(host)
         
         return host.name
 
-    def start_hostgroup(self, hostgroup: str) -> bool:
-        """Starts all hosts of given host group and returns the success."""
+    @staticmethod
+    def _supportconfig_paths(supportconfig: str) -> Tuple[str, str]:
+        """Returns a tuple with the local path of the supportconfig and the path on the host,
+        which has to be used for the volume."""
 
-        for container in self.filter_containers(filter={'hostgroup': hostgroup}):
-            if container['container'].status == 'running':
-                return True
-            container['container'].start()
-            self._wait4start(container['container'])
+        local_path = os.path.abspath(supportconfig)
+        path = local_path
 
-        return True
+        # If HOST_ROOT_FS is set, we run inside a container and usually all
+        # paths need to be prefixed with the content of that variable: the 
+        # mount point of the host's rootfs.
+        # This has to be removed from `supportconfig_path` because it is
+        # referenced from inside the container!
+        if 'HOST_ROOT_FS' in os.environ:
+            path = path.removeprefix(os.getenv('HOST_ROOT_FS'))
+        return local_path, path
 
-    def stop_hostgroup(self, hostgroup) -> List[str]:
-        """Stops all running host containers of the given host group and returns the names of the stopped containers."""
+    @staticmethod
+    def _host_labels(name: str, host_description: Dict, environment: Dict[str, str], supportconfig_path: str, agent_id: str) -> Dict[str, str]:
+        """Returns the host specific labels. Environment entries given by the user override the 
+        detected ones of the host description."""
+        
+        labels = {'com.suse.tcsc.hostname': name,
+                  'com.suse.tcsc.supportfiles': supportconfig_path,
+                  'com.suse.tcsc.supportconfig': supportconfig_path,
+                  'com.suse.tcsc.agent_id': agent_id
+                 }
+        for env in 'provider', 'cluster_type', 'architecture_type', 'ensa_version', 'filesystem_type', 'hana_scenario':
+            labels[f'com.suse.tcsc.env.{env}'] = environment[env] if env in environment else host_description[env]
+        return labels
 
-        stopped: List[str] = []
-        for container in [c for c in self.filter_containers(filter={'hostgroup': hostgroup}) if c['status'] in ['running']]:
-            stopped.append(container['name'])
-            container['container'].stop(timeout=self.timeout)
+    def cache_hostgroup(self, hostgroup: str) -> List[str]:
+        """Stores the processed state of all host containers of the given host group in the 
+        image cache, which are not cached yet. The manifest marks the end of the processing,
+        so containers without a manifest within the timeout are skipped.
+        Returns the names of the cached containers."""
+        
+        if not self.image_cache.size:
+            return []
         
-        return stopped     
+        def cache(host: Host) -> bool:
+            if not self.wait4manifest(host):
+                return False
+            return self.image_cache.store(host['container'], host['cache_key'])
+
+        candidates = [h for h in self.filter_containers(filter={'hostgroup': hostgroup}) 
+                      if h['cache_key'] and h['status'] == 'running' and not self.image_cache.get(h['cache_key'], touch=False)]
+        if not candidates:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(candidates), self.parallel_operations)) as executor:
+            results = list(executor.map(cache, candidates))
+        self.image_cache.collect()
+        return [host['name'] for host, cached in zip(candidates, results) if cached]
+
+    def wait4manifest(self, host: Host) -> bool:
+        """Waits until the manifest of the host is available, which marks the end of
+        processing the supportfiles. Returns False if the timeout has been reached."""
+
+        start_time = time.time()
+        while self.get_manifest(host['container'], host['root'])[0]:
+            if (time.time() - start_time) > self.timeout:
+                return False
+            time.sleep(.5)
+        return True
+
+    def start_hostgroup(self, hostgroup: str) -> Dict[str, Tuple[bool, str]]:
+        """Starts all not running hosts of given host group concurrently and waits for all 
+        of them together. Returns a dictionary with the container name as key and a tuple 
+        with the success and an error message as value."""
+
+        stopped = [c for c in self.filter_containers(filter={'hostgroup': hostgroup}) if c['status'] != 'running']
+        outcomes = self._run_parallel(lambda container: container.start(), stopped)
+        self.invalidate()
+        started = [name for name, outcome in outcomes.items() if outcome[0]]
+        outcomes.update(self._wait4start_hostgroup(hostgroup, started))
+        return outcomes
+
+    def stop_hostgroup(self, hostgroup) -> Dict[str, Tuple[bool, str]]:
+        """Stops all running host containers of the given host group concurrently. 
+        Returns a dictionary with the container name as key and a tuple with the success 
+        and an error message as value."""
+
+        running = [c for c in self.filter_containers(filter={'hostgroup': hostgroup}) if c['status'] in ['running']]
+        outcomes = self._run_parallel(lambda container: container.stop(timeout=self.timeout), running)
+        self.invalidate()
+        return outcomes
             
-    def remove_hostgroup(self, hostgroup) -> List[str]:
-        """Removes all host containers of the given host group and returns the names of the destroyed containers."""
+    def remove_hostgroup(self, hostgroup) -> Dict[str, Tuple[bool, str]]:
+        """Removes all host containers of the given host group concurrently. 
+        Returns a dictionary with the container name as key and a tuple with the success 
+        and an error message as value."""
         
-        removed: List[str] = []
-        for container in [c for c in self.filter_containers(filter={'hostgroup': hostgroup})]:
-            removed.append(container['name'])
-            container['container'].remove(v=True, force=True)        
-        return removed    
+        outcomes = self._run_parallel(lambda container: container.remove(v=True, force=True), 
+                                      self.filter_containers(filter={'hostgroup': hostgroup}))
+        self.invalidate()
+        return outcomes
+
+    def _run_parallel(self, operation: Callable[[docker.models.containers.Container], Any], hosts: List[Host]) -> Dict[str, Tuple[bool, str]]:
+        """Runs the operation concurrently on the containers of the given hosts. Returns a dictionary
+        with the container name as key and a tuple with the success and an error message as value."""
+
+        def run(host: Host) -> Tuple[bool, str]:
+            try:
+                operation(host['container'])
+            except Exception as err:
+                return False, str(err)
+            return True, ''
+            
+        # Host roots of multi-host containers share the container.
+        hosts = list({host['container_id']: host for host in hosts}.values())
+        if not hosts:
+            return {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(hosts), self.parallel_operations)) as executor:
+            results = executor.map(run, hosts)
+        return {host['container_name']: result for host, result in zip(hosts, results)}
+
+    def _wait4start_hostgroup(self, hostgroup: str, names: List[str]) -> Dict[str, Tuple[bool, str]]:
+        """Waits until the given containers of the host group are running and stay running.
+        All containers are polled together with one list call. Returns a dictionary with the 
+        container name as key and a tuple with the success and an error message as value."""
+
+        outcomes = {}
+        pending = set(names)
+        start_time = time.time()
+        while pending:
+            status = {host['container_name']: host['status'] for host in self._list(hostgroup=hostgroup)}
+            pending = {name for name in pending if status.get(name) != 'running'}
+            if not pending or (time.time() - start_time) > self.start_timeout:
+                break
+            time.sleep(.2)
+        for name in pending:
+            outcomes[name] = (False, f'Start timeout of {self.start_timeout}s reached. "{name}" did not became operational.')
+
+        running = set(names) - pending
+        start_time = time.time()    
+        while running and (time.time() - start_time) <= self.start_timeout:
+            status = {host['container_name']: host['status'] for host in self._list(hostgroup=hostgroup)}
+            for name in [n for n in running if status.get(n) != 'running']:
+                outcomes[name] = (False, f'Start timeout of {self.start_timeout}s reached. "{name}" stopped running.')
+                running.remove(name)
+            time.sleep(.2)
+        for name in running:
+            outcomes[name] = (True, '')
+
+        return outcomes
 
     def rescan_hostgroup(self, hostgroup: str) -> Dict[str, Tuple[bool, str]]:
         """Initiates a re-processing of the supportfiles on all host containers for
@@ -137,7 +407,12 @@ class HostsStack():
             if container['status'] != 'running':
                 state = (False, f'''Container status: {container['status']}''')
             else:
-                for cmd in ['rm', '-f', '/manifest'], ['sc/process_supportfiles']:
+                if container['root']:
+                    root = f"/hosts/{container['root']}"
+                    commands = ['rm', '-f', f'{root}/manifest'], ['chroot', root, '/sc/process_supportfiles']
+                else:
+                    commands = ['rm', '-f', '/manifest'], ['sc/process_supportfiles']
+                for cmd in commands:
                     error, _, stderr = self._run_cmd(container['container'], cmd, exception_on_error=True)
                     if error == 0:
                         state = (True, '')
@@ -146,70 +421,137 @@ class HostsStack():
             scanned_hosts[container['name']] = state
         return scanned_hosts
 
-    def logs(self, containername: str) -> List[str]:
-        """Retrieves log for given container name."""
+    def logs(self, containername: str, lines: int = None, follow: bool = False) -> Iterator[str]:
+        """Retrieves the log lines of the given container name. If `lines` is given, Docker
+        sends only the last lines. With `follow` the lines are streamed as they come in
+        until the container stops. Returns None if the container does not exist."""
         
         container = self.filter_containers(filter={'name': containername})
-        if container:
-            return container[0]['container'].logs().decode("utf-8").strip().split(os.linesep)
-        return None
+        if not container:
+            return None
+        chunks = container[0]['container'].logs(stream=True, follow=follow, tail=lines if lines else 'all')
+        return HostsStack._split_lines(chunks)
+
+    @staticmethod
+    def _split_lines(chunks: Iterator[bytes]) -> Iterator[str]:
+        """Returns the lines of the streamed log chunks."""
+        
+        buffer = b''
+        for chunk in chunks:
+            *lines, buffer = (buffer + chunk).split(b'\n')
+            for line in lines:
+                yield line.decode('utf-8', errors='replace').rstrip('\r')
+        if buffer.strip():
+            yield buffer.decode('utf-8', errors='replace')
+
+    def invalidate(self) -> None:
+        """Drops all container snapshots. Must be called after each operation which
+        changes containers (create, start, stop, remove)."""
+        
+        self._snapshot = None
+        self._group_snapshots = {}
+
+    def _list(self, hostgroup: str = None, name: str = None) -> List[Host]:
+        """Retrieves the host containers from Docker with a single sparse list call.
+        If given, hostgroup and name are passed as server-side filters."""
+        
+        filters = {'label': [self.host_label, f'com.suse.tcsc.uuid={self.id}']}
+        if hostgroup:
+            filters['label'].append(f'com.suse.tcsc.hostgroup={hostgroup}')
+        if name:
+            filters['name'] = name.split('/')[0]   # substring match of the container, exact match is done by the caller
+        hosts = [host for container in self._docker.containers.list(all=True, sparse=True, filters=filters) 
+                      for host in Host.from_container(container)]
+        
+        # Claimed pool containers carry their host labels in the pool registry.
+        if self.pool.claimed:
+            for container in self.pool.containers(name=name):
+                labels = self.pool.claimed.get(container.id)
+                if labels and (not hostgroup or labels.get('com.suse.tcsc.hostgroup') == hostgroup):
+                    hosts.append(Host(container, labels))
+        return hosts
 
     @property
-    def containers(self) -> List[Dict[str, str]]:
-        """Retrieves all current host containers from Docker and returns a data dictionary.""" 
-        
-        return [{'name': container.name or '-', 
-                 'container_id': container.id,
-                 'container_short_id': container.short_id,
-                 'supportfiles': container.labels.get('com.suse.tcsc.supportfiles') or '-',
-                 'supportconfig': container.labels.get('com.suse.tcsc.supportconfig') or '-',
-                 'provider': container.labels.get('com.suse.tcsc.env.provider') or 'default',
-                 'cluster_type': container.labels.get('com.suse.tcsc.env.cluster_type') or None,
-                 'architecture_type': container.labels.get('com.suse.tcsc.env.architecture_type') or None,
-                 'ensa_version': container.labels.get('com.suse.tcsc.env.ensa_version') or None,
-                 'filesystem_type': container.labels.get('com.suse.tcsc.env.filesystem_type') or None,
-                 'hana_scenario': container.labels.get('com.suse.tcsc.env.hana_scenario') or None,
-                 'hostgroup': container.labels.get('com.suse.tcsc.hostgroup') or '-',
-                 'hostname': container.labels.get('com.suse.tcsc.hostname') or '-',
-                 'status': container.status or 'unknown',
-                 'agent_id': container.labels.get('com.suse.tcsc.agent_id') or '-',
-                 'container': container
-                } for container in
-                self._docker.containers.list(all=True, filters={'label': [self.host_label, f'com.suse.tcsc.uuid={self.id}']}) 
-               ]
-
-    def filter_containers(self, filter: Dict[str, Any] = {}, sortkey: str = 'hostgroup') -> List[Dict[str, str]]:
-        """Retrieve and return current host containers matching the filter from Docker.
+    def containers(self) -> List[Host]:
+        """Returns all current host containers. The data is retrieved from Docker 
+        only once until the snapshot gets invalidated.""" 
+        
+        snapshot = self._snapshot   # another thread may invalidate it meanwhile
+        if snapshot is None:
+            snapshot = self._snapshot = self._list()
+        return snapshot
+
+    def filter_containers(self, filter: Dict[str, Any] = {}, sortkey: str = 'hostgroup') -> List[Host]:
+        """Retrieve and return current host containers matching the filter.
         Currently supported filters: 
-            - hostgroup: List[str]
-            - name: List[str]
-        A sort key can be given to sort the results (default: hostgroup).""" 
+            - hostgroup: str
+            - name: str
+        A sort key can be given to sort the results (default: hostgroup).
+        If a snapshot of all containers exists, it gets used. Otherwise only the
+        matching containers are requested from Docker.""" 
 
-        containers: List[str, str] = []
-        for container in self.containers:
-            if filter.get('hostgroup') and container['hostgroup'] != filter.get('hostgroup'):
+        hostgroup, name = filter.get('hostgroup'), filter.get('name')
+        if self._snapshot is not None or not (hostgroup or name):
+            candidates = self.containers
+        else:
+            key = (hostgroup, name)
+            candidates = self._group_snapshots.get(key)
+            if candidates is None:
+                candidates = self._group_snapshots[key] = self._list(hostgroup=hostgroup, name=name)
+
+        containers: List[Host] = []
+        for container in candidates:
+            if hostgroup and container['hostgroup'] != hostgroup:
                 continue
-            if filter.get('name') and container['name'] != filter.get('name'):
+            if name and name not in (container['name'], container['container_name']):
                 continue
             containers.append(container)
         return sorted(containers, key=lambda x: x[sortkey])
     
     @classmethod
-    def get_manifest(self, container: docker.models.containers.Container) -> Tuple[str, str]:
-        """Retrieves the manifest of the given container object. A tuple is returned.
-        If everything went well the tuple is (True, error message) or (False, command output)
-        if not.""" 
-
-        error, stdout, stderr = self._run_cmd(container, ['cat', '/manifest'], exception_on_error=False)
-        if error != 0:
-            return True, stderr
+    def get_manifest(self, container: docker.models.containers.Container, root: str = None) -> Tuple[bool, Any]:
+        """Retrieves the manifest of the given container object (or of the given host root 
+        of a multi-host container). A tuple is returned.
+        If everything went well the tuple is (False, manifest) or (True, error message)
+        if not.
+        The manifest is read by a single archive request, which works without executing 
+        a command in the container. Only if that fails, `cat` is executed as fallback.""" 
+
+        manifest_path = f'/hosts/{root}/manifest' if root else '/manifest'
+        try:
+            stream, _ = container.get_archive(manifest_path)
+            with tarfile.open(fileobj=io.BytesIO(b''.join(stream))) as archive:
+                content = str(archive.extractfile('manifest').read(), sys.getdefaultencoding())
+        except docker.errors.NotFound:
+            return True, 'No manifest present.'
+        except Exception:
+            error, content, stderr = self._run_cmd(container, ['cat', manifest_path], exception_on_error=False)
+            if error != 0:
+                return True, stderr
+        return self._parse_manifest(content)
+
+    @classmethod
+    def get_manifests(self, hosts: List[Host]) -> Dict[str, Tuple[bool, Any]]:
+        """Retrieves the manifests of all given hosts concurrently and returns a dictionary
+        with the container name as key and the tuple returned by `get_manifest()` as value."""
+
+        if not hosts:
+            return {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(len(hosts), self.parallel_operations)) as executor:
+            results = executor.map(lambda host: self.get_manifest(host['container'], host['root']), hosts)
+        return {host['name']: result for host, result in zip(hosts, results)}
+
+    @staticmethod
+    def _parse_manifest(content: str) -> Tuple[bool, Any]:
+        """Parses the manifest text and returns the same tuple as `get_manifest()`."""
+
         manifest = {}        
         try:
-            for key, value in [line.split(':') for line in stdout.split()]:                
+            for key, value in [line.split(':') for line in content.split()]:                
                 manifest[key] = {'ok': 'ok', 'failed': 'failed'}[value]
         except:
             return True, 'Could not parse manifest. Invalid format!'
-        return False, manifest, 
+        return False, manifest
     
     @classmethod
     def _run_cmd(self, 
@@ -261,6 +603,271 @@ class HostsStack():
         return set([c['hostgroup'] for c in self.filter_containers()])
     
     
+class HostPool():
+    """Represents the pool of idle, pre-started generic host containers.
+    
+    Pooled containers run `/sc/idle` and wait to be claimed. Claiming copies the supportconfig
+    and the environment for `/sc/startup` into the container and signals it to continue.
+    Docker does not allow to change the labels of existing containers, therefore the host labels 
+    of claimed containers are kept in a registry file in the state directory.
+    
+        - self._docker (docker.DockerClient):  Instance of DockerClient.
+        - self.size (int):  Amount of idle containers to keep.
+        - self.idle_ttl (int):  Time in seconds after which idle containers get replaced.
+        - self.memory_limit (str):  Docker memory limit for pooled containers.
+        - self.id (str):  UUID of this tcsc installation.
+        - self.image (str):  Image used for hosts container.
+        - self._registry_file (str):  JSON file with the labels of the claimed containers.
+        - self._registry (Dict[str, Dict[str, str]]):  Loaded registry (container id -> labels).
+    """
+    
+    label = 'com.suse.tcsc.stack=pool'
+    _claim_lock = threading.Lock()
+    
+    def __init__(self, config: Config, docker_client: docker.DockerClient) -> None:
+        self._docker = docker_client
+        self.size = config.pool_size
+        self.idle_ttl = config.pool_idle_ttl
+        self.memory_limit = config.pool_memory_limit
+        self.id = config.id
+        self.image = config.hosts_image
+        self._registry_file = os.path.join(config.state_dir, 'pool.json')
+        self._registry: Dict[str, Dict[str, str]] = None
+    
+    @property
+    def claimed(self) -> Dict[str, Dict[str, str]]:
+        """Returns the registry of claimed containers with the container id as key 
+        and the host labels as value."""
+        
+        if self._registry is None:
+            try:
+                with open(self._registry_file) as f:
+                    self._registry = json.load(f)
+            except FileNotFoundError:
+                self._registry = {}
+            except Exception as err:
+                raise HostsException(f'Error reading pool registry "{self._registry_file}": {err}')
+        return self._registry
+    
+    def _save(self) -> None:
+        """Writes the registry atomically."""
+        
+        os.makedirs(os.path.dirname(self._registry_file), exist_ok=True)
+        with open(f'{self._registry_file}.tmp', 'w') as f:
+            json.dump(self.claimed, f)
+        os.replace(f'{self._registry_file}.tmp', self._registry_file)
+    
+    def containers(self, name: str = None) -> List[docker.models.containers.Container]:
+        """Returns all (sparse) pool containers."""
+        
+        filters = {'label': [HostPool.label, f'com.suse.tcsc.uuid={self.id}']}
+        if name:
+            filters['name'] = name
+        return self._docker.containers.list(all=True, sparse=True, filters=filters)
+    
+    def idle(self) -> List[docker.models.containers.Container]:
+        """Returns all running pool containers, which have not been claimed yet (oldest first)."""
+        
+        return sorted([c for c in self.containers() if c.status == 'running' and c.id not in self.claimed], 
+                      key=lambda c: c.attrs.get('Created', 0))
+    
+    def claim(self, name: str, labels: Dict[str, str], environment: Dict[str, str], supportconfig: str) -> docker.models.containers.Container:
+        """Claims an idle pool container for a host and returns it. If no idle container
+        is available or claiming fails, None is returned and the host container has to 
+        be created the usual way.
+        
+            - name:          Name of the host container.
+            - labels:        Host labels (as used for a regular host container).
+            - environment:   Environment for `/sc/startup`.
+            - supportconfig: Local path to the supportconfig file or directory.
+        """
+        
+        if not self.size:
+            return None
+        
+        for container in self.idle():
+            if time.time() - container.attrs.get('Created', 0) > self.idle_ttl:
+                continue
+            with HostPool._claim_lock:   # concurrent creations must not claim the same container
+                if container.id in self.claimed:
+                    continue
+                try:
+                    self.claimed[container.id] = labels
+                    self._save()
+                except Exception:
+                    self.claimed.pop(container.id, None)
+                    return None
+            try:
+                container.rename(name)
+                container.put_archive('/', HostPool._tar({os.path.basename(supportconfig): supportconfig}))
+                claim = ''.join([f'{key}={shlex.quote(value)}\n' for key, value in environment.items()])
+                container.put_archive('/', HostPool._tar({'sc_claim': claim.encode()}))
+                container.kill(signal='SIGUSR1')
+            except Exception:
+                try:
+                    container.remove(v=True, force=True)
+                except Exception:
+                    try:
+                        container.kill()   # a stopped pool container is never claimed and gets removed by `maintain()`
+                    except Exception:
+                        pass
+                try:
+                    self.claimed.pop(container.id, None)
+                    self._save()
+                except Exception:
+                    pass
+                return None
+            container.reload()
+            return container
+        
+        return None
+    
+    def maintain(self) -> Tuple[List[str], List[str]]:
+        """Removes idle containers exceeding their time to live or the pool size, starts new 
+        containers to fill up the pool and drops registry entries of gone containers. 
+        The method does not wait for the new containers. 
+        Returns a tuple with the names of the started and the removed containers."""
+        
+        started, removed = [], []
+        containers = self.containers()
+        
+        ids = {c.id for c in containers}
+        if set(self.claimed) - ids:
+            self._registry = {k: v for k, v in self.claimed.items() if k in ids}
+            self._save()
+
+        idle = [c for c in containers if c.id not in self.claimed]
+        for index, container in enumerate(sorted(idle, key=lambda c: c.attrs.get('Created', 0), reverse=True)):
+            if index >= self.size or container.status != 'running' or time.time() - container.attrs.get('Created', 0) > self.idle_ttl:
+                removed.append(container.attrs['Names'][0].lstrip('/'))
+                container.remove(v=True, force=True)
+        
+        for _ in range(self.size - (len(idle) - len(removed))):
+            container = self._docker.containers.run(
+                image = self.image,
+                name = f'tcsc-pool-{uuid.uuid4().hex[:8]}-{self.id}',
+                command = '/sc/idle',
+                network = 'tcsc_default',
+                mem_limit = self.memory_limit,
+                labels = {'com.suse.tcsc.stack': 'pool',
+                          'com.suse.tcsc.uuid': self.id
+                         },
+                detach = True)
+            started.append(container.name)
+        
+        return started, removed
+    
+    @staticmethod
+    def _tar(entries: Dict[str, Any]) -> bytes:
+        """Returns a tar archive with the given entries. The key is the name in the archive
+        and the value either the content (bytes) or a local path to a file or directory."""
+        
+        buffer = io.BytesIO()
+        with tarfile.open(fileobj=buffer, mode='w') as archive:
+            for arcname, source in entries.items():
+                if isinstance(source, bytes):
+                    info = tarfile.TarInfo(arcname)
+                    info.size = len(source)
+                    info.mtime = time.time()
+                    archive.addfile(info, io.BytesIO(source))
+                else:
+                    archive.add(source, arcname=arcname)
+        return buffer.getvalue()
+    
+
+class HostImageCache():
+    """Represents the cache of host images with already processed supportfiles.
+    
+    After the supportfiles are processed, the filesystem of a host container only depends
+    on the supportconfig and the host image. Such a container gets committed to an image
+    tagged with a key derived from both. Host containers created from such an image skip the
+    processing. Each use re-tags the image, so the tag time is used for the LRU garbage collection.
+    
+        - self._docker (docker.DockerClient):  Instance of DockerClient.
+        - self.size (int):  Maximum amount of cached images (0 disables the cache).
+        - self.id (str):  UUID of this tcsc installation.
+        - self.image (str):  Image used for hosts container.
+        - self._image_id (str):  Id of the host image (retrieved on demand).
+    """
+    
+    repository = 'tcsc_host_cache'
+    label = 'com.suse.tcsc.stack=hostcache'
+    
+    def __init__(self, config: Config, docker_client: docker.DockerClient) -> None:
+        self._docker = docker_client
+        self.size = config.image_cache_size
+        self.id = config.id
+        self.image = config.hosts_image
+        self._image_id: str = None
+        
+    def key(self, supportconfig: str) -> str:
+        """Returns the cache key for the given supportconfig (file or directory), which is
+        the SHA-256 of the content and the id of the host image. If the cache is disabled
+        or the host image is not present, None is returned."""
+        
+        if not self.size:
+            return None
+        if not self._image_id:
+            try:
+                self._image_id = self._docker.images.get(self.image).id
+            except docker.errors.ImageNotFound:
+                return None
+        
+        digest = hashlib.sha256(self._image_id.encode())
+        if os.path.isdir(supportconfig):
+            files = sorted(os.path.join(root, file) for root, _, filenames in os.walk(supportconfig) for file in filenames)
+        else:
+            files = [supportconfig]
+        for file in files:
+            digest.update(os.path.relpath(file, supportconfig).encode())
+            with open(file, 'rb') as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                    digest.update(chunk)
+        return digest.hexdigest()
+    
+    def get(self, key: str, touch: bool = True) -> docker.models.images.Image:
+        """Returns the cached image for the given key or None. If `touch` is set,
+        the image gets re-tagged to mark it as recently used."""
+        
+        if not key:
+            return None
+        try:
+            image = self._docker.images.get(f'{HostImageCache.repository}:{key}')
+        except docker.errors.ImageNotFound:
+            return None
+        if touch:
+            image.tag(HostImageCache.repository, key)
+        return image
+    
+    def store(self, container: docker.models.containers.Container, key: str) -> bool:
+        """Commits the given container as image for the key and returns the success."""
+        
+        try:
+            container.commit(repository=HostImageCache.repository, 
+                             tag=key, 
+                             changes=[f'LABEL {HostImageCache.label}', 
+                                      f'LABEL com.suse.tcsc.uuid={self.id}',
+                                      'CMD ["/sc/startup_cached"]'])
+        except docker.errors.DockerException:
+            return False
+        return True
+    
+    def collect(self) -> List[str]:
+        """Removes the least recently used images exceeding the cache size and returns their tags.
+        Images still used by containers are kept."""
+        
+        images = self._docker.images.list(filters={'label': [HostImageCache.label, f'com.suse.tcsc.uuid={self.id}']})
+        images.sort(key=lambda i: i.attrs.get('Metadata', {}).get('LastTagTime', ''), reverse=True)
+        removed = []
+        for image in images[self.size:]:
+            try:
+                self._docker.images.remove(image.id)
+            except docker.errors.APIError:   # still in use
+                continue
+            removed.extend(image.tags)
+        return removed
+        
+
 class HostsException(Exception):
     pass
 
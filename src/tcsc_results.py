@@ -0,0 +1,343 @@
+#!/usr/bin/env python3.10
+# -*- coding: utf-8 -*-
+
+"""
+Contains classes to keep check results, gathered facts and run checkpoints locally.
+"""
+
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from typing import List, Dict, Any
+from tcsc_config import *
+
+
+class ResultCache():
+    """Represents the local cache of check execution results.
+
+    An entry is identified by the check id and the hash of its definition, the
+    host containers (and roots) with their agent ids and the environment. Host
+    containers only change their data on creation or rescan, so the container
+    stands for the content of its supportfiles. A rescan invalidates all entries
+    of the affected containers, a changed check definition does not match anymore
+    and the stale entries get pruned.
+
+        - self.ttl (int):  Time in seconds an entry is valid (0 disables the cache).
+        - self.bypass (bool):  Flag if cached results shall be ignored (new results are stored nevertheless).
+        - self._cache_file (str):  JSON file with the entries.
+        - self._entries (Dict[str, Dict[str, Any]]):  Loaded entries (key -> entry).
+        - self._changed (bool):  Flag if the entries need to be saved.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.ttl = config.result_cache_ttl
+        self.bypass = False
+        self._cache_file = os.path.join(config.state_dir, 'results.json')
+        self._entries: Dict[str, Dict[str, Any]] = None
+        self._changed = False
+
+    @property
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the cache entries. Expired entries are dropped on loading."""
+
+        if self._entries is None:
+            try:
+                with open(self._cache_file) as f:
+                    self._entries = json.load(f)
+            except (OSError, ValueError):
+                self._entries = {}
+            now = time.time()
+            for key in [key for key, entry in self._entries.items() if now - entry['created'] > self.ttl]:
+                del self._entries[key]
+                self._changed = True
+        return self._entries
+
+    @staticmethod
+    def host_identity(host: Any) -> str:
+        """Returns the identity of the given host (container, root and agent id)."""
+
+        return f'''{host['container_id']}/{host['root'] or ''}/{host['agent_id']}'''
+
+    @staticmethod
+    def key(check_id: str, check_digest: str, hosts: List[str], environment: Dict[str, str]) -> str:
+        """Returns the key for the given check, host identities and environment."""
+
+        return hashlib.sha256(json.dumps([check_id, check_digest, sorted(hosts), environment], sort_keys=True).encode()).hexdigest()
+
+    def get(self, key: str) -> str:
+        """Returns the cached results (the JSON string of `WandaStack.execute_check()`)
+        for the key or None."""
+
+        if not self.ttl or self.bypass:
+            return None
+        entry = self.entries.get(key)
+        return entry['results'] if entry else None
+
+    def store(self, key: str, check_id: str, check_digest: str, hosts: List[str], results: str) -> None:
+        """Stores the results for the key."""
+
+        if not self.ttl:
+            return
+        self.entries[key] = {'check': check_id,
+                             'digest': check_digest,
+                             'hosts': hosts,
+                             'created': time.time(),
+                             'results': results}
+        self._changed = True
+
+    def prune(self, digests: Dict[str, str]) -> None:
+        """Removes the entries of checks whose definition differs from the given
+        check digests (check id -> digest)."""
+
+        for key in [key for key, entry in self.entries.items() if entry['check'] in digests and entry['digest'] != digests[entry['check']]]:
+            del self.entries[key]
+            self._changed = True
+
+    def invalidate(self, container_ids: List[str]) -> None:
+        """Removes all entries which involve one of the given host containers."""
+
+        container_ids = set(container_ids)
+        for key in [key for key, entry in self.entries.items() if container_ids & {host.split('/')[0] for host in entry['hosts']}]:
+            del self.entries[key]
+            self._changed = True
+
+    def save(self) -> None:
+        """Writes the entries atomically, if they have been changed."""
+
+        if not self.ttl or not self._changed:
+            return
+        os.makedirs(os.path.dirname(self._cache_file), exist_ok=True)
+        with open(f'{self._cache_file}.tmp', 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(f'{self._cache_file}.tmp', self._cache_file)
+        self._changed = False
+
+
+class FactStore():
+    """Represents the local store of gathered facts.
+
+    Facts are stored per host identity (see `ResultCache.host_identity()`) and
+    gatherer with its argument, so a fact gathered for one check serves all
+    other checks using the same gatherer and argument. Like the result cache,
+    a rescan invalidates all facts of the affected containers. Only successfully
+    gathered facts are stored.
+
+        - self.ttl (int):  Time in seconds facts are valid (0 disables the store).
+        - self.bypass (bool):  Flag if stored facts shall be ignored (new facts are stored nevertheless).
+        - self._store_file (str):  JSON file with the facts.
+        - self._hosts (Dict[str, Dict[str, Any]]):  Loaded facts (host identity -> {'created': ..., 'facts': {fact key -> value}}).
+        - self._changed (bool):  Flag if the facts need to be saved.
+    """
+
+    def __init__(self, config: Config) -> None:
+        self.ttl = config.fact_store_ttl
+        self.bypass = False
+        self._store_file = os.path.join(config.state_dir, 'facts.json')
+        self._hosts: Dict[str, Dict[str, Any]] = None
+        self._changed = False
+
+    @property
+    def hosts(self) -> Dict[str, Dict[str, Any]]:
+        """Returns the stored facts per host identity (see `load()`)."""
+
+        if self._hosts is None:
+            self.load()
+        return self._hosts
+
+    def load(self) -> None:
+        """Loads the stored facts, if not done yet. Expired hosts are dropped on loading.
+        Must be called before the store is used concurrently."""
+
+        if self._hosts is not None:
+            return
+        try:
+            with open(self._store_file) as f:
+                hosts = json.load(f)
+        except (OSError, ValueError):
+            hosts = {}
+        now = time.time()
+        for identity in [identity for identity, entry in hosts.items() if now - entry['created'] > self.ttl]:
+            del hosts[identity]
+            self._changed = True
+        self._hosts = hosts
+
+    @staticmethod
+    def fact_key(gatherer: str, argument: str) -> str:
+        """Returns the key of a fact for the given gatherer and argument.
+        Gatherers without version are version 1."""
+
+        if '@' not in gatherer:
+            gatherer = f'{gatherer}@v1'
+        return f'''{gatherer}:{argument or ''}'''
+
+    def facts(self, check: Dict[str, Any], identity: str) -> Dict[str, Dict[str, Any]]:
+        """Returns the facts of the check definition for the host identity like a
+        Wanda execution response has them (fact name -> {'value': ...}) or None,
+        if not all facts are stored."""
+
+        if not self.ttl or self.bypass or identity not in self.hosts:
+            return None
+        stored = self.hosts[identity]['facts']
+        facts = {}
+        for fact in check.get('facts') or []:
+            key = FactStore.fact_key(fact['gatherer'], fact.get('argument'))
+            if key not in stored:
+                return None
+            facts[fact['name']] = {'value': stored[key]}
+        return facts
+
+    def capture(self, check: Dict[str, Any], responses: List[Dict[str, Any]], identities: Dict[str, str]) -> None:
+        """Stores the facts of the execution responses for the given check definition.
+        The agent ids are mapped with `identities` to host identities."""
+
+        if not self.ttl:
+            return
+        keys = {fact['name']: FactStore.fact_key(fact['gatherer'], fact.get('argument')) for fact in check.get('facts') or []}
+        for response in responses:
+            for check_result in response.get('check_results') or []:
+                for agents_check_result in check_result.get('agents_check_results') or []:
+                    identity = identities.get(agents_check_result.get('agent_id'))
+                    if not identity:
+                        continue
+                    for fact in agents_check_result.get('facts') or []:
+                        if fact.get('name') not in keys or 'value' not in fact or 'type' in fact:
+                            continue
+                        entry = self.hosts.setdefault(identity, {'created': time.time(), 'facts': {}})
+                        entry['facts'][keys[fact['name']]] = fact['value']
+                        self._changed = True
+
+    def invalidate(self, container_ids: List[str]) -> None:
+        """Removes the facts of all hosts of the given host containers."""
+
+        container_ids = set(container_ids)
+        for identity in [identity for identity in self.hosts if identity.split('/')[0] in container_ids]:
+            del self.hosts[identity]
+            self._changed = True
+
+    def save(self) -> None:
+        """Writes the facts atomically, if they have been changed."""
+
+        if not self.ttl or not self._changed:
+            return
+        os.makedirs(os.path.dirname(self._store_file), exist_ok=True)
+        with open(f'{self._store_file}.tmp', 'w') as f:
+            json.dump(self.hosts, f)
+        os.replace(f'{self._store_file}.tmp', self._store_file)
+        self._changed = False
+
+
+class RunCheckpoint():
+    """Represents the journal of a `checks run` to resume it after an interruption.
+
+    A check gets journaled when its execution starts, with the group id of its
+    Wanda executions, and when its results are complete. Each record is appended
+    on its own, so an interruption loses at most the checks in flight.
+    Those are not lost either: Wanda keeps executing them, and on resume their
+    completed executions are looked up by the group id. A failed check (e.g. a
+    timeout) keeps its group id for the same reason. The journal is removed once
+    the run completes without errors.
+
+        - self.ttl (int):  Time in seconds a journal is kept (0 disables checkpoints).
+        - self.run_id (str):  Id of the run.
+        - self.header (Dict[str, Any]):  The run: host group, environment, checks and agents.
+        - self.completed (Dict[str, Dict[str, Any]]):  Completed checks (check id -> record).
+        - self.in_flight (Dict[str, str]):  Started checks without results (check id -> group id).
+        - self._journal_file (str):  JSON Lines file with the records.
+    """
+
+    def __init__(self, config: Config, run_id: str = None) -> None:
+        self.ttl = config.checkpoint_ttl
+        self.run_id = run_id or uuid.uuid4().hex[:8]
+        self.header: Dict[str, Any] = None
+        self.completed: Dict[str, Dict[str, Any]] = {}
+        self.in_flight: Dict[str, str] = {}
+        self._journal_file = os.path.join(config.state_dir, 'checkpoints', f'{self.run_id}.jsonl')
+
+    def load(self) -> None:
+        """Loads the journal of the run to resume it."""
+
+        try:
+            with open(self._journal_file) as f:
+                lines = f.readlines()
+        except OSError:
+            raise CheckpointException(f'Run "{self.run_id}" does not exist (anymore) or has been completed.')
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except ValueError:   # torn last record of an interruption
+                continue
+            if record['type'] == 'run':
+                self.header = record
+            elif record['type'] == 'started':
+                self.in_flight[record['check']] = record['group_id']
+            elif record['type'] == 'completed':
+                self.completed[record['check']] = record
+                self.in_flight.pop(record['check'], None)
+        if not self.header:
+            raise CheckpointException(f'Journal "{self._journal_file}" of run "{self.run_id}" is damaged.')
+
+    def begin(self, hostgroup: str, envpairs: Dict[str, str], environment: Dict[str, str],
+              check_ids: List[str], agents: Dict[str, str]) -> None:
+        """Starts the journal of a new run and removes expired journals."""
+
+        if not self.ttl:
+            return
+        directory = os.path.dirname(self._journal_file)
+        try:
+            os.makedirs(directory, exist_ok=True)
+            now = time.time()
+            for entry in os.scandir(directory):
+                if entry.name.endswith('.jsonl') and now - entry.stat().st_mtime > self.ttl:
+                    os.remove(entry.path)
+        except OSError as err:
+            raise CheckpointException(f'Error accessing "{directory}": {err}')
+        self.header = {'type': 'run',
+                       'hostgroup': hostgroup,
+                       'envpairs': envpairs,
+                       'environment': environment,
+                       'checks': check_ids,
+                       'agents': agents,
+                       'started': time.time()}
+        self._append(self.header)
+
+    def start(self, check_id: str, group_id: str) -> None:
+        """Journals the start of the executions of the check."""
+
+        self._append({'type': 'started', 'check': check_id, 'group_id': group_id})
+
+    def complete(self, check_id: str, check_results: str, duration: float, source: str) -> None:
+        """Journals the results of the check (the JSON string of `WandaStack.execute_check()`)."""
+
+        self._append({'type': 'completed', 'check': check_id, 'results': check_results, 'duration': duration, 'source': source})
+
+    def fail(self, check_id: str, error: str) -> None:
+        """Journals the failure of the check."""
+
+        self._append({'type': 'failed', 'check': check_id, 'error': error})
+
+    def remove(self) -> None:
+        """Removes the journal."""
+
+        try:
+            os.remove(self._journal_file)
+        except FileNotFoundError:
+            pass
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """Appends the record. It is flushed, but not synced: the journal has to survive
+        the process (interrupts, errors), not the machine."""
+
+        if not self.ttl:
+            return
+        try:
+            with open(self._journal_file, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        except OSError as err:
+            raise CheckpointException(f'Error writing journal "{self._journal_file}": {err}')
+
+
+class CheckpointException(Exception):
+    pass
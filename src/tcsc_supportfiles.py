@@ -9,15 +9,19 @@ import os
 import re
 import sys
 import tarfile
-from typing import List, Dict, Tuple
+from typing import List, Dict, Tuple, Any
 #import xml.etree.ElementTree as ElementTree
 import defusedxml.ElementTree as ElementTree
 
 class SupportFiles():
     """Represents supportfiles 
+    
+    A single supportfile is treated as host, multiple ones as cluster. With `cluster`
+    the type can be set explicitly, e.g. to detect the cluster environment of a
+    single node.
     """
     
-    def __init__(self, supportfiles: List[str]) -> None:
+    def __init__(self, supportfiles: List[str], cluster: bool = None) -> None:
         
         self.result = {}
         self.issues = []
@@ -25,6 +29,8 @@ class SupportFiles():
         provider = None
         overall_ensa_version = None
         type = 'host' if len(supportfiles) == 1 else 'cluster'
+        if cluster is not None:
+            type = 'cluster' if cluster else 'host'
         
         for file in supportfiles:            
             
@@ -99,6 +105,7 @@ class SupportFiles():
                     
                 # Detect environment settings.
                 cib = SupportFiles._get_cib(subfiles['ha.txt'])
+                cluster_name, cluster_nodes = SupportFiles._get_cluster_members(cib)
                 if type == 'cluster' and cib:
                     
                     # Detect cluster_type and architecture_type.
@@ -209,6 +216,8 @@ class SupportFiles():
                                          'ensa_version': ensa_version,
                                          'filesystem_type': filesystem_type,
                                          'hana_scenario': hana_scenario,
+                                         'cluster_name': cluster_name,
+                                         'cluster_nodes': cluster_nodes,
                                          'supportconfig': file
                                         }    
             
@@ -222,6 +231,17 @@ class SupportFiles():
                     data['ensa_version'] = overall_ensa_version
 
                         
+    @staticmethod
+    def identify(supportfile: str, cluster: bool) -> Tuple[str, Dict[str, Any]]:
+        """Parses a single supportfile and returns its hostname and host description.
+        With `cluster` the cluster environment gets detected too. Can be run in a 
+        worker process to parse multiple supportfiles concurrently."""
+
+        supportfiles = SupportFiles([supportfile], cluster=cluster)
+        if supportfiles.issues:
+            raise SupportFileException(str(supportfiles.issues[0]))
+        return next(iter(supportfiles.result.items()))
+
     @staticmethod                        
     def _get_virtblock(basic_env_txt: List[str]) -> Dict[str, str]:
         """Extracts virtualization information from basic-environment.txt
@@ -263,6 +283,17 @@ class SupportFiles():
         except:
             return None
 
+    @staticmethod
+    def _get_cluster_members(cib: ElementTree) -> Tuple[str, List[str]]:
+        """Returns the cluster name and the sorted node names from the CIB or
+        (None, []), if there is no CIB."""
+        
+        if cib is None:
+            return None, []
+        cluster_name = cib.find("./configuration/crm_config/cluster_property_set/nvpair[@name='cluster-name']")
+        nodes = sorted(node.get('uname') for node in cib.findall('./configuration/nodes/node') if node.get('uname'))
+        return cluster_name.get('value') if cluster_name is not None else None, nodes
+
     @staticmethod                        
     def _get_packages(packages: List[str], rpm_txt: List[str]) -> List[str]:
         """Searches for the given package names in rpm.txt provided as list of lines and 
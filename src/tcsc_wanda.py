@@ -6,11 +6,19 @@ Contains classes to handle the Wanda container stack.
 """
 
 
+import concurrent.futures
 import docker
+import hashlib
+import json
+import os
+import re
 import time
 from rabbiteer import Rabbiteer, evaluate_check_results
 from typing import List, Dict, Any, Tuple
 from tcsc_config import *
+from tcsc_docker import docker_client
+from tcsc_evaluator import CheckEvaluator
+from tcsc_catalog import CheckCatalog, CatalogException
 
 
 class WandaStack():
@@ -19,13 +27,39 @@ class WandaStack():
         - self._containers (Dict[str, Container]):  Dict with the Wanda container instances referenced by name.
         - self._docker (docker.DockerClient):  Instance of DockerClient.
         - self._rabbiteer (Rabbiteer):  Rabbiteer instance to talk to Wanda.
+        - self._catalog (CheckCatalog):  Check catalog read from the checks volume.
+        - self._label (str):  Label identifying the Wanda containers.
+        - self._status_cache (str):  File caching the last operational status.
+        - self.status_cache_ttl (int):  Time in seconds a cached operational status is valid.
         - self.timeout (int):  Timeout for Docker and Wanda operations.
+        - self.hedge_margin (int):  Seconds an execution may exceed its expected duration before it gets hedged (0 disables hedging).
+        - self.timeout_factor (int):  Multiple of the expected duration used as timeout of a check execution (0 uses `timeout`).
+        - self.timeout_max (int):  Upper limit in seconds of the timeout of a check execution.
+        - self.ready_times (Dict[str, float]):  Seconds each container needed to become ready during the last `start`.
     """
 
+    # Dependencies and readiness probe for each Wanda container. Unknown containers 
+    # have no dependencies and are ready if they reached their expected state.
+    _startup_table = {'tcsc-trento-checks': ([], '_expected_state_reached'),
+                      'tcsc-postgres': ([], '_postgres_ready'),
+                      'tcsc-rabbitmq': ([], '_amqp_ready'),
+                      'tcsc-wanda': (['tcsc-trento-checks', 'tcsc-postgres', 'tcsc-rabbitmq'], '_wanda_ready')
+                     }
+
+    # Lower limit in seconds of the timeout of a check execution (see `check_timeout()`).
+    min_check_timeout = 5
+
     def __init__(self, config: Config) -> None:
-        self._docker: docker.DockerClient = docker.from_env()
-        self._dockerAPI: docker.APIClient = docker.APIClient()
+        self._docker: docker.DockerClient = docker_client()
+        self._dockerAPI: docker.APIClient = self._docker.api
         self.timeout: int = config.docker_timeout
+        self.hedge_margin: int = config.hedge_margin
+        self.timeout_factor: int = config.check_timeout_factor
+        self.timeout_max: int = config.check_timeout_max
+        self._label: str = config.wanda_label
+        self._status_cache: str = os.path.join(config.state_dir, 'wanda_status.json')
+        self.status_cache_ttl: int = config.status_cache_ttl
+        self.ready_times: Dict[str, float] = {}
         self._containers: Dict[str, docker.Container] = {container.name: container for container in 
                                                          self._docker.containers.list(
                                                              all=True, 
@@ -34,6 +68,7 @@ class WandaStack():
         if set(self._containers.keys()) != set(config.wanda_containers):
             raise WandaException('Not all required Wanda containers are present.')
         self._rabbiteer = Rabbiteer(config.wanda_url)
+        self._catalog = CheckCatalog(self._containers['tcsc-trento-checks'], config.state_dir)
 
     @property
     def container_status(self) -> Dict[str, Tuple[str, str]]:
@@ -69,6 +104,54 @@ class WandaStack():
 
         return False
     
+    @property
+    def operational(self) -> bool:
+        """Returns the Wanda status like `status`, but reuses a cached operational
+        status if it is younger than `status_cache_ttl` and no Docker event occurred
+        for the Wanda containers since. Only a positive status gets cached, because 
+        Wanda may become ready without any further container event."""
+        
+        if self.status_cache_ttl:
+            try:
+                with open(self._status_cache) as f:
+                    timestamp = json.load(f)['timestamp']
+                now = time.time()
+                if now - timestamp < self.status_cache_ttl and not self._events(timestamp, now):
+                    return True
+            except (OSError, ValueError, KeyError, TypeError):
+                pass
+            
+        status = self.status
+        if status and self.status_cache_ttl:
+            os.makedirs(os.path.dirname(self._status_cache), exist_ok=True)
+            with open(f'{self._status_cache}.tmp', 'w') as f:
+                json.dump({'timestamp': time.time()}, f)
+            os.replace(f'{self._status_cache}.tmp', self._status_cache)
+        elif not status:
+            self.invalidate_status()
+        return status
+    
+    def invalidate_status(self) -> None:
+        """Removes the cached operational status."""
+        
+        try:
+            os.remove(self._status_cache)
+        except FileNotFoundError:
+            pass
+    
+    def _events(self, since: float, until: float) -> bool:
+        """Returns True if Docker reported any event for the Wanda containers 
+        in the given period."""
+        
+        events = self._docker.events(since=f'{since:.6f}', 
+                                     until=f'{until:.6f}', 
+                                     filters={'type': 'container', 'label': self._label}, 
+                                     decode=True)
+        try:
+            return any(True for _ in events)
+        finally:
+            events.close()
+    
     @property
     def mounts(self) -> Dict[str, List[str]]:
         """Returns dictionary with the name as key and the list of mounts as value
@@ -95,46 +178,128 @@ class WandaStack():
             status[container.name] = (expected_volumes, volumes)
         return status
         
+    @property
+    def local_catalog(self) -> bool:
+        """Returns True if the check catalog can be read from the checks volume,
+        so Wanda is not required to list the checks."""
+
+        try:
+            self._catalog.definitions()
+        except CatalogException:
+            return False
+        return True
+
+    def catalog(self) -> List[Dict[str, Any]]:
+        """Returns the check definitions read from the checks volume. If this is not
+        possible, the catalog gets requested from Wanda (content of 'items')."""
+
+        try:
+            return self._catalog.definitions()
+        except CatalogException:
+            return self._rabbiteer.list_catalog().get('items')
+
     def checks(self, attributes: List[str] = None) -> List[dict]:
-        """Returns list of Check instances for all available checks (content of 'items').
+        """Returns list of Check instances for all available checks (see `catalog()`).
         The Check instance will have only the requested attributes.""" 
 
-        return [Check(c, attributes) for c in self._rabbiteer.list_catalog().get('items')]   
+        return [Check(c, attributes) for c in self.catalog()]   
        
     def check(self, check: str, attributes: List[str] = None) -> List[dict]:
-        """Returns (first) Check instance for given check (content of 'items').
+        """Returns (first) Check instance for given check (see `catalog()`).
         The Check instance will have only the requested attributes.""" 
         try:
-            return [Check(c, attributes) for c in self._rabbiteer.list_catalog().get('items') if check == c['id']][0]   
+            return [Check(c, attributes) for c in self.catalog() if check == c['id']][0]   
         except:
             return None
        
     def start(self) -> List[str]:
         """Initiate start of Wanda containers. Only containers, which are in the states
-        'exited' or 'created' are going to be started. The method will *not* wait for 
-        the containers to be up.
+        'exited' or 'created' are going to be started. Containers without dependencies
+        are started concurrently, the others as soon as all their dependencies are ready
+        (see `_startup_table`). The method waits until all containers are ready and 
+        stores the time each container needed in `ready_times`.
         Returns the names of the started containers."""
         
         started: List[str] = []
+        futures: Dict[str, concurrent.futures.Future] = {}
+        self.invalidate_status()
+        self.ready_times = {}
         self._update()
-        for container in [c for c in self._containers.values() if c.status in ['exited', 'created']]:
-            started.append(container.name)
-            container.start()
-            
-        start_time = time.time()    
-        while not self.status:
-            if  (time.time() - start_time) > self.timeout: 
-                raise WandaException(f'''Timeout of {self.timeout}s reached. Wanda did not became operational after start of containers: {', '.join(started)}''')
-            time.sleep(1) 
+        start_time = time.time()
+        
+        def start_container(container: docker.models.containers.Container) -> float:
+            dependencies, probe = WandaStack._startup_table.get(container.name, ([], '_expected_state_reached'))
+            for dependency in dependencies:
+                if dependency in futures:
+                    futures[dependency].result()
+            # The timeout starts when the dependencies are ready, not with the stack.
+            container_start_time = time.time()
+            if container.status in ['exited', 'created']:
+                started.append(container.name)
+                container.start()
+            delay = 0.05
+            while not getattr(self, probe)(container):
+                if (time.time() - container_start_time) > self.timeout:
+                    raise WandaException(f'Timeout of {self.timeout}s reached. Container {container.name} did not became ready.')
+                time.sleep(delay)
+                delay = min(delay * 2, 1)
+            return time.time() - start_time
+        
+        with concurrent.futures.ThreadPoolExecutor(max_workers=len(self._containers)) as executor:
+            # Containers with dependencies get submitted last, so their futures exist.
+            for name, container in sorted(self._containers.items(), 
+                                          key=lambda item: len(WandaStack._startup_table.get(item[0], ([], None))[0])):
+                futures[name] = executor.submit(start_container, container)
+            failed: List[str] = []
+            for name, future in futures.items():
+                try:
+                    self.ready_times[name] = future.result()
+                except WandaException:
+                    failed.append(name)
+                except docker.errors.APIError as err:
+                    raise WandaException(f'Could not start {name}: {err}')
+        if failed:
+            raise WandaException(f'''Timeout of {self.timeout}s reached. Wanda did not became operational after start of containers: {', '.join(started)} (not ready: {', '.join(failed)})''')
         
         return started
 
+    def _expected_state_reached(self, container: docker.models.containers.Container) -> bool:
+        """Readiness probe: the container reached its expected state."""
+        
+        container.reload()
+        return container.status == container.labels.get('com.suse.tcsc.expected_state', 'running')
+    
+    def _postgres_ready(self, container: docker.models.containers.Container) -> bool:
+        """Readiness probe: PostgreSQL accepts connections."""
+        
+        container.reload()
+        if container.status != 'running':
+            return False
+        return container.exec_run(['pg_isready', '-q', '-U', 'postgres']).exit_code == 0
+
+    def _amqp_ready(self, container: docker.models.containers.Container) -> bool:
+        """Readiness probe: RabbitMQ accepts connections on its listeners."""
+        
+        container.reload()
+        if container.status != 'running':
+            return False
+        return container.exec_run(['rabbitmq-diagnostics', '-q', 'check_port_connectivity']).exit_code == 0
+    
+    def _wanda_ready(self, container: docker.models.containers.Container) -> bool:
+        """Readiness probe: Wanda reports to be ready and the database to be healthy."""
+        
+        try:
+            return self._rabbiteer.readiness()['ready'] and self._rabbiteer.health()['database'] == 'pass'
+        except:
+            return False
+
     def stop(self) -> List[str]:
         """Stops all Wanda containers. Only containers, which are in the state 'running'
         are going to be stopped.
         Returns the names of the stopped containers."""
 
         stopped: List[str] = []
+        self.invalidate_status()
         self._update()
         
         for container in [c for c in self._containers.values() if c.status in ['running']]:
@@ -153,20 +318,132 @@ class WandaStack():
         
         return stopped
 
-    def execute_check(self, environment: Dict[str, str], agent_ids: List[str], check_id: str) -> Tuple[str, bool]:
+    def execute_check(self, environment: Dict[str, str], agent_ids: List[str], check_id: str, responses: List[Dict[str, Any]] = None,
+                      group_id: str = None, in_flight: str = None, expected_duration: float = None, 
+                      deadline: float = None, timeout_duration: float = None) -> Tuple[str, bool]:
         """Executes check on the given hosts and returns tuple with the result of `rabbiteer`
-        as JSON string and False. In case of an error a tuple with the error string and True."""
+        as JSON string and False. In case of an error a tuple with the error string and True.
+        If a list is given for `responses`, the raw execution responses get appended.
         
+        The executions get started with `group_id` (random if not given). With `in_flight`,
+        the group id of executions started earlier (e.g. by an interrupted run), the completed
+        executions of this group are taken over and only the hosts without a result get executed.
+        With `expected_duration` (e.g. the 95th percentile of earlier executions) the execution
+        gets hedged (see `_execute_hedged()`) and the timeout gets derived from it (see 
+        `check_timeout()`) or from `timeout_duration`, if given. The timeout never exceeds the `deadline` (epoch time) of the run,
+        which also limits the execution calls for each host of a single-host check together.
+        Once the deadline has passed the check is not executed anymore."""
+        
+        timeout = self.check_timeout(timeout_duration or expected_duration)
+        if deadline:
+            timeout = min(timeout, deadline - time.time())
+            if timeout <= 0:
+                return 'Deadline of the run has been reached.', True
+
+        # Rabbiteer keeps the last response, so each execution gets its own instance
+        # to allow concurrent executions (`fleet run`).
+        rabbiteer = self._new_rabbiteer()
         try:
-            responses = self._rabbiteer.execute_checks(agent_ids, 
-                                                      environment, 
-                                                      [check_id], 
-                                                      timeout=self.timeout, 
-                                                      running_dots=False)
-            result = evaluate_check_results(responses, brief=False, json_output=True)  
+            execution_responses = self._collect_executions(rabbiteer, in_flight, check_id, agent_ids, timeout) if in_flight else []
+            done = {result['agent_id'] for response in execution_responses for result in response['check_results'][0]['agents_check_results']}
+            missing = [agent_id for agent_id in agent_ids if agent_id not in done]
+            if missing:
+                execution_responses += self._execute_hedged(rabbiteer, missing, environment, check_id, group_id, expected_duration, timeout, 
+                                                            deadline)
+            result = evaluate_check_results(execution_responses, brief=False, json_output=True)  
         except Exception as err:
             return err, True
 
+        if responses is not None:
+            responses.extend(execution_responses)
+        return result, False
+
+    def check_timeout(self, expected_duration: float = None) -> float:
+        """Returns the timeout in seconds for the execution of a check, which is expected
+        to take `expected_duration` seconds: `timeout_factor` times the expected duration,
+        limited by `min_check_timeout` and `timeout_max`. Without an expected duration or
+        factor the timeout of the stack is used."""
+
+        if not expected_duration or not self.timeout_factor:
+            return self.timeout
+        return min(max(expected_duration * self.timeout_factor, WandaStack.min_check_timeout), self.timeout_max)
+
+    def _new_rabbiteer(self) -> Rabbiteer:
+        """Returns a new Rabbiteer instance for the Wanda of the stack."""
+
+        return Rabbiteer(self._rabbiteer.baseurl, self._rabbiteer.access_key, self._rabbiteer.trento_credential)
+
+    def _execute_hedged(self, rabbiteer: Rabbiteer, agent_ids: List[str], environment: Dict[str, str], check_id: str, 
+                        group_id: str, expected_duration: float, timeout: float, deadline: float = None) -> List[Dict[str, Any]]:
+        """Executes the check and returns the execution responses of `Rabbiteer.execute_checks()`.
+
+        An execution can hang in Wanda (e.g. `running` or not found) until the timeout
+        is reached. If it takes `hedge_margin` seconds longer than `expected_duration`,
+        a duplicate execution gets started and the responses of the execution finishing
+        first are taken, the other one gets cancelled. An error is only raised, if both
+        fail. The duplicate has a group id of its own, so a resumed run does not take
+        over the results twice. It gets only the time left of the timeout, so hedging
+        never extends the execution of the check. All execution calls end with the
+        `deadline` (epoch time) of the run."""
+
+        hedge_after = expected_duration + self.hedge_margin if expected_duration and self.hedge_margin else None
+        if not hedge_after or hedge_after >= timeout:
+            return rabbiteer.execute_checks(agent_ids, environment, [check_id], timeout=timeout, running_dots=False, 
+                                            group_id=group_id, deadline=deadline)
+
+        def execute(instance: Rabbiteer, group_id: str, deadline: float = None) -> List[Dict[str, Any]]:
+            return instance.execute_checks(agent_ids, environment, [check_id], timeout=timeout, running_dots=False, 
+                                           group_id=group_id, deadline=deadline)
+
+        end = min(time.time() + timeout, deadline or float('inf'))
+
+        instances = [rabbiteer]
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=2)
+        try:
+            done, pending = concurrent.futures.wait({executor.submit(execute, rabbiteer, group_id, deadline)}, timeout=hedge_after)
+            if not done:
+                instances.append(self._new_rabbiteer())
+                pending.add(executor.submit(execute, instances[-1], None, end))
+            while True:
+                for future in done:
+                    if future.exception() is None:
+                        return future.result()
+                    error = future.exception()
+                if not pending:
+                    raise error
+                done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+        finally:
+            for instance in instances:
+                instance.cancelled = True
+            executor.shutdown(wait=False)
+
+    def _collect_executions(self, rabbiteer: Rabbiteer, group_id: str, check_id: str, agent_ids: List[str], timeout: float) -> List[Dict[str, Any]]:
+        """Returns the completed executions of the check for the given agents in the group.
+        Running executions are awaited until the timeout, afterwards they are ignored."""
+
+        start_time = time.time()
+        while True:
+            executions = [execution for execution in rabbiteer.list_executions(group_id).get('items', [])
+                          if {target['agent_id'] for target in execution.get('targets', [])} <= set(agent_ids)]
+            if not any(execution['status'] == 'running' for execution in executions) or time.time() - start_time > timeout:
+                break
+            time.sleep(1)
+        return [execution for execution in executions 
+                if execution['status'] == 'completed' and execution.get('check_results') 
+                and execution['check_results'][0]['check_id'] == check_id]
+
+    @staticmethod
+    def evaluate_check(environment: Dict[str, str], facts: Dict[str, Dict[str, Dict[str, Any]]], check: 'Check') -> Tuple[str, bool]:
+        """Evaluates the check locally against the given facts (agent id -> facts) and returns
+        the same tuple as `execute_check()`. In case of an error (e.g. the check uses something
+        the local evaluator does not support) a tuple with the error string and True."""
+
+        try:
+            responses = CheckEvaluator.evaluate(check.definition, facts, environment)
+            result = evaluate_check_results(responses, brief=False, json_output=True)
+        except Exception as err:
+            return str(err), True
+
         return result, False
 
     def _update(self) -> None:
@@ -260,6 +537,29 @@ class Check():
               }
         return map[gatherer] if gatherer in map else None
     
+    def missing_data(self, manifest: Dict[str, str]) -> List[str]:
+        """Returns the manifest entries required by the gatherers of the check, which 
+        are marked as failed in the given manifest. Entries not present in the manifest
+        are not considered missing. Requires the attribute 'facts[].gatherer'."""
+        
+        missing = []
+        for gatherer in self.gatherer:
+            for entry in Check.gatherer2manifest(gatherer) or []:
+                if manifest.get(entry) == 'failed' and entry not in missing:
+                    missing.append(entry)
+        return missing
+    
+    def refers_to_environment(self) -> bool:
+        """Returns True if the `when` condition of the check or a condition of its values 
+        refers to the environment (`env`), so the result depends on the environment of the
+        entire host group."""
+        
+        expressions = [self.definition.get('when') or '']
+        for value in self.definition.get('values') or []:
+            for condition in value.get('conditions') or []:
+                expressions.append(condition.get('expression', condition.get('when')) or '')
+        return any(re.search(r'\benv\b', expression) for expression in expressions)
+    
     @staticmethod
     def _retrieve_attributes(dictionary: Dict, keys: List[str]):
         """Retrieves key-value pairs in a nested dictionary. The result is always a flat dictionary.
@@ -294,6 +594,9 @@ class Check():
 
         if not attributes:
             attributes = Check._attribute_table.keys()
+        
+        self.digest = hashlib.sha256(json.dumps(check, sort_keys=True).encode()).hexdigest()   # identifies the definition
+        self.definition = check   # required to evaluate the check locally
 
         if not set(attributes).issubset(Check._attribute_table.keys()):
             raise CheckException(f'Unsupported attributes: {set(attributes) - Check._attribute_table.keys()}')